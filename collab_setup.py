@@ -1,5 +1,6 @@
 import os
 import subprocess
+import sys
 import zipfile
 
 def install_requirements():
@@ -12,7 +13,11 @@ def install_requirements():
         print("⚠️ No requirements.txt found!")
 
 def extract_zip_files():
-    """Extract Posts.zip and Comments.zip inside data/"""
+    """Extract Posts.zip and Comments.zip inside data/
+
+    Not needed by the analysis scripts, which stream rows straight out of the
+    archives (see src/dump_reader.py); only run with --extract.
+    """
     data_dir = os.path.join(project_dir, "data")
     if not os.path.exists(data_dir):
         print("⚠️ No data directory found!")
@@ -43,6 +48,9 @@ if __name__ == "__main__":
 
     # Run setup steps
     install_requirements()
-    extract_zip_files()
+    if "--extract" in sys.argv:
+        extract_zip_files()
+    else:
+        print("📦 Skipping extraction: scripts read data/Posts.zip and data/Comments.zip directly.")
 
     print("✅ Setup complete. You can now run your analysis scripts.")
@@ -0,0 +1,137 @@
+# analyzer.py
+# The one tokenizer shared by every indexer and by query parsing, so that
+# index-time and query-time terms always match.
+#
+#   from analyzer import Analyzer
+#   analyzer = Analyzer()
+#   analyzer.analyze("Can I download PlayStation 3 games?")  # ['download', 'playstation', 'games']
+#
+# Text is lower-cased, ASCII punctuation is deleted (so "don't" -> "dont"),
+# whitespace-split, and only purely alphabetic non-stopword tokens are kept.
+import hashlib
+import string
+
+import numpy as np
+
+# NLTK's English stopword list. Entries containing an apostrophe are left out:
+# punctuation is deleted before the stopword check, so they could never match.
+ENGLISH_STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you your yours yourself yourselves he him
+his himself she her hers herself it its itself they them their theirs
+themselves what which who whom this that these those am is are was were be
+been being have has had having do does did doing a an the and but if or
+because as until while of at by for with about against between into through
+during before after above below to from up down in out on off over under
+again further then once here there when where why how all any both each few
+more most other some such no nor not only own same so than too very s t can
+will just don should now d ll m o re ve y ain aren couldn didn doesn hadn
+hasn haven isn ma mightn mustn needn shan shouldn wasn weren won wouldn
+""".split())
+
+
+class TermMemo(dict):
+    """Cache of raw token -> analyzed term, filled on first sight of each token."""
+
+    MAX_SIZE = 2_000_000
+
+    def __init__(self, analyzer):
+        super().__init__()
+        self.analyzer = analyzer
+
+    def __missing__(self, token):
+        if len(self) >= self.MAX_SIZE:
+            self.clear()
+        term = self[token] = self.analyzer.term(token)
+        return term
+
+
+class Analyzer:
+    """Lower-case, strip punctuation, drop non-alphabetic tokens and stopwords, optionally stem."""
+
+    def __init__(self, stop_words=ENGLISH_STOP_WORDS, stem=False):
+        self.stop_words = frozenset(stop_words)
+        # Precompiled byte table: ASCII lower-casing and punctuation deletion in one translate()
+        self.table = bytes.maketrans(string.ascii_uppercase.encode(), string.ascii_lowercase.encode())
+        self.delete = string.punctuation.encode()
+        self.stemmer = None
+        if stem:
+            from nltk.stem import PorterStemmer
+
+            self.stemmer = PorterStemmer().stem
+        # raw token -> term ("" when dropped); memoizes isalpha/stopword/stem per distinct token
+        self.terms = TermMemo(self)
+
+    def term(self, token):
+        if not token.isalpha() or token in self.stop_words:
+            return ""
+        if self.stemmer is not None:
+            return self.stemmer(token)
+        return token
+
+    def analyze(self, text):
+        """Terms of one text, in order (duplicates kept)."""
+        if not isinstance(text, str):
+            return []
+        data = text.encode("utf-8").translate(self.table, self.delete)
+        text = data.decode("utf-8")
+        if not data.isascii():
+            text = text.lower()
+        return [t for t in map(self.terms.__getitem__, text.split()) if t]
+
+    __call__ = analyze
+
+    @property
+    def config(self):
+        """JSON-able description of the analysis, stored with persisted indexes."""
+        stop_words = "\n".join(sorted(self.stop_words)).encode("utf-8")
+        return {
+            "stem": self.stemmer is not None,
+            "stop_words": hashlib.sha1(stop_words).hexdigest(),
+        }
+
+    def analyze_many(self, texts, vocabulary, grow=True):
+        """Yield one int32 array of term ids per text.
+
+        `vocabulary` maps term -> id. With `grow`, unseen terms get the next
+        free id (len(vocabulary)); otherwise they are dropped, which is what
+        query-time analysis wants.
+        """
+        for text in texts:
+            tokens = self.analyze(text)
+            if grow:
+                ids = []
+                for t in tokens:
+                    tid = vocabulary.get(t)
+                    if tid is None:
+                        tid = vocabulary[t] = len(vocabulary)
+                    ids.append(tid)
+            else:
+                ids = [vocabulary[t] for t in tokens if t in vocabulary]
+            yield np.array(ids, dtype=np.int32)
+
+
+class KeywordAnalyzer(Analyzer):
+    """Exact keywords, e.g. Tags: "|dark-souls|elden-ring|" -> ['dark-souls', 'elden-ring'].
+
+    Values are only lower-cased and split on the separators; no punctuation
+    stripping or stopwords, so hyphenated tags stay one term.
+    """
+
+    def __init__(self, separators="|<> "):
+        super().__init__(stop_words=())
+        self.separators = str.maketrans(separators, " " * len(separators))
+
+    def analyze(self, text):
+        if not isinstance(text, str):
+            return []
+        return text.translate(self.separators).lower().split()
+
+    __call__ = analyze
+
+    @property
+    def config(self):
+        return {"keyword": True}
+
+
+default_analyzer = Analyzer()
+keyword_analyzer = KeywordAnalyzer()
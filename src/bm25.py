@@ -0,0 +1,202 @@
+# bm25.py
+# BM25 ranking with MaxScore dynamic pruning.
+#
+#   python src/bm25.py bench data/Posts.xml      # exhaustive vs MaxScore latency
+#
+#   scorer = BM25(index)                         # any InvertedIndex (or SegmentedIndex)
+#   post_ids, scores = scorer.top_k(["elden", "ring"], 10)
+#   post_ids, scores = scorer.daat_top_k(["elden", "ring"], 10)   # O(k) memory
+#   post_ids, scores = scorer.top_k(terms, 10, allowed=metadata.mask("type:question"))
+#
+# score(d) = sum over query terms t of
+#     idf(t) * qtf(t) * tf(t, d) * (k1 + 1) / (tf(t, d) + norm(d))
+# with norm(d) = k1 * (1 - b + b * len(d) / avg_len). The per-doc norms and,
+# per term, the largest tf part over its posting list are computed when the
+# index is saved (docs.norms, postings.bounds), so a term's upper bound is
+# idf * qtf * bound without touching its postings.
+#
+# top_k scores terms from the highest upper bound down. Once the k-th best
+# partial score exceeds the summed bounds of the terms not yet added, no
+# unseen doc can reach the top k: the remaining (low-impact, usually very
+# common) terms are only looked up for the surviving candidates, block by
+# block through the lists' skip entries, and candidates that cannot catch
+# up are dropped along the way. daat_top_k prunes the same way, one window
+# of docs at a time (see daat.py). Scores are
+# summed in the same term order as the exhaustive scorer, so the top k is
+# exactly the same, floats included. An `allowed` mask over docIDs (a
+# metadata filter, see doc_metadata.py) is applied to each posting list
+# before its scores are computed, so only allowed docs are ever scored and
+# the pruning threshold is the k-th best among them.
+import argparse
+import math
+import time
+from collections import Counter
+
+import numpy as np
+
+from daat import daat_top_k
+from postings import decode_flat, term_batches
+
+K1 = 1.2
+B = 0.75
+# Relative slack on summed bounds, so float rounding never prunes a doc that ties
+BOUND_SLACK = 1e-9
+BOUNDS_BATCH_POSTINGS = 1 << 22
+
+
+def doc_norms(doc_lengths, k1=K1, b=B, avg=None):
+    """k1 * (1 - b + b * len / avg_len) per doc, as float32; avg_len defaults to the mean length."""
+    lengths = np.asarray(doc_lengths, dtype=np.float64)
+    if avg is None:
+        avg = lengths.mean() if len(lengths) else 0.0
+    return (k1 * (1 - b + b * lengths / max(avg, 1e-9))).astype(np.float32)
+
+
+def tf_part(freqs, norms, k1=K1):
+    return freqs * (k1 + 1) / (freqs + norms.astype(np.float64))
+
+
+def term_bounds(store, norms, k1=K1, batch_postings=BOUNDS_BATCH_POSTINGS):
+    """Largest tf part of every term's posting list, decoding the postings in batches."""
+    dfs = np.asarray(store.doc_freqs, dtype=np.int64)
+    bounds = np.zeros(len(dfs), dtype=np.float64)
+    for lo, hi in term_batches(dfs, batch_postings):
+        docids, freqs = decode_flat(store.data, store.offsets, dfs, lo, hi)
+        counts = dfs[lo:hi]
+        nonempty = counts > 0
+        if len(docids):
+            starts = (np.cumsum(counts) - counts)[nonempty]
+            bounds[lo:hi][nonempty] = np.maximum.reduceat(tf_part(freqs, norms[docids], k1), starts)
+    return bounds
+
+
+class BM25:
+    """BM25 scorer over an index's postings; uses the saved norms and bounds when they match k1/b."""
+
+    def __init__(self, index, k1=K1, b=B):
+        self.index = index
+        self.k1, self.b = k1, b
+        saved = getattr(index, "bm25", None)
+        if saved is not None and saved["params"] == {"k1": k1, "b": b}:
+            self.norms, self.bounds = saved["norms"], saved["bounds"]
+        else:
+            self.norms, self.bounds = doc_norms(index.doc_lengths, k1, b, index.avg_doc_length), None
+        self.bound_cache = {}  # term -> bound, when there are no saved bounds
+
+    def idf(self, df):
+        n = self.index.n_docs
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def term_bound(self, term):
+        if self.bounds is not None:
+            return float(self.bounds[self.index.term_id(term)])
+        if term not in self.bound_cache:
+            docids, freqs = self.index.postings(term)
+            self.bound_cache[term] = float(tf_part(freqs, self.norms[docids], self.k1).max())
+        return self.bound_cache[term]
+
+    def clauses(self, terms):
+        """[(term, weight, upper bound)] of the known query terms, highest bound first."""
+        clauses = []
+        for term, qtf in Counter(terms).items():
+            df = self.index.doc_freq(term)
+            if df:
+                weight = self.idf(df) * qtf
+                clauses.append((term, weight, weight * self.term_bound(term)))
+        clauses.sort(key=lambda c: (-c[2], c[0]))
+        return clauses
+
+    def accumulate(self, terms, k=None, allowed=None):
+        """(docids, scores), term by term; with `k`, docs that cannot make the top k are pruned.
+
+        Only docs where the boolean mask `allowed` is set are scored, if given.
+        """
+        docids = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float64)
+        if k is not None and k <= 0:
+            return docids, scores
+        clauses = self.clauses(terms)
+        # rest[i]: most that terms i.. can still add to any doc
+        rest = np.cumsum([c[2] for c in clauses][::-1])[::-1] * (1 + BOUND_SLACK)
+        for i, (term, weight, _) in enumerate(clauses):
+            threshold = -math.inf
+            if k is not None and len(scores) >= k:
+                threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+            if rest[i] < threshold:
+                # No unseen doc can reach the top k: look up the surviving
+                # candidates only, through the list's skip entries
+                keep = scores + rest[i] >= threshold
+                docids, scores = docids[keep], scores[keep]
+                hit, freqs = self.index.cursor(term).seek(docids)
+                scores[hit] += weight * tf_part(freqs, self.norms[docids[hit]], self.k1)
+                continue
+            term_docids, freqs = self.index.postings(term)
+            if allowed is not None:
+                keep = allowed[term_docids]
+                term_docids, freqs = term_docids[keep], freqs[keep]
+            contrib = weight * tf_part(freqs, self.norms[term_docids], self.k1)
+            if not len(docids):
+                docids, scores = term_docids.astype(np.int64), contrib
+                continue
+            # Union: each doc's previous partial score first, then this term's part
+            docids, inverse = np.unique(np.concatenate([docids, term_docids]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([scores, contrib]), minlength=len(docids))
+        return docids, scores
+
+    def scores(self, terms, allowed=None):
+        """Exhaustive BM25 (docids, scores) of every (allowed) doc matching any term."""
+        return self.accumulate(terms, allowed=allowed)
+
+    def top_k(self, terms, k, prune=True, allowed=None):
+        """Best `k` post Ids with their scores; prune=False scores every matching doc."""
+        docids, scores = self.accumulate(terms, k if prune else None, allowed)
+        return self.index.top_k(docids, scores, k)
+
+    def daat_top_k(self, terms, k, allowed=None):
+        """Same result as top_k, document at a time in O(k + terms) memory (see daat.py)."""
+        cursors, scorers, bounds = [], [], []
+        for term, weight, bound in self.clauses(terms):
+            cursors.append(self.index.cursor(term))
+            scorers.append(lambda docids, freqs, weight=weight:
+                           weight * tf_part(freqs, self.norms[docids], self.k1))
+            bounds.append(bound * (1 + BOUND_SLACK))
+        docids, scores = daat_top_k(cursors, scorers, k, bounds=bounds, allowed=allowed)
+        return self.index.post_ids(docids), scores
+
+
+def main(argv=None):
+    import dump_reader
+    from analyzer import default_analyzer
+    from index_store import open_index
+
+    parser = argparse.ArgumentParser(description="BM25 latency: exhaustive scoring vs MaxScore pruning.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("dump", help="Posts.xml (or .zip)")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    index = open_index(dump_reader.resolve_dump_path(args.dump))
+    scorer = BM25(index)
+    queries = ["game", "play game", "elden ring boss", "dark souls playstation xbox",
+               "how to beat the final boss in sekiro", "download games playstation",
+               "witcher crashes constantly", "skyrim mods reinstall", "gta online load",
+               "upgrade the horse", "moonlight butterfly dark souls", "grafted scion elden ring"]
+    timings = {"exhaustive": [], "maxscore": []}
+    for query in queries:
+        terms = default_analyzer.analyze(query)
+        results = {}
+        for mode, prune in (("exhaustive", False), ("maxscore", True)):
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[mode] = scorer.top_k(terms, args.k, prune)
+                timings[mode].append(time.perf_counter() - start)
+        same = all(np.array_equal(a, b) for a, b in zip(results["exhaustive"], results["maxscore"]))
+        print(f"{query!r:45} identical top-{args.k}: {same}")
+    for mode, times in timings.items():
+        ms = np.array(times) * 1e3
+        print(f"{mode:<10} p50 {np.percentile(ms, 50):7.2f} ms  p99 {np.percentile(ms, 99):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
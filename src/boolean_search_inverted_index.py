@@ -1,89 +1,45 @@
 import os
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-import nltk
-from nltk.corpus import stopwords
-import string
 import time
+from dump_reader import resolve_dump_path
+from doc_metadata import open_metadata
+from doc_store import open_doc_store
+from index_store import open_index
+from query_cache import QueryCache
+from query_parser import evaluate, parse, search
+from tag_index import open_tag_index
 
 # -----------------------
 # 0️⃣ Ensure required files exist
 # -----------------------
 # posts_file = "data/Posts.xml"
-posts_file = "/content/IR_Project01/data/Posts.xml"
+posts_file = resolve_dump_path("/content/IR_Project01/data/Posts.xml")  # or data/Posts.zip
 if not os.path.exists(posts_file):
     raise FileNotFoundError(f"{posts_file} not found in current directory: {os.getcwd()}")
 
 # -----------------------
-# 1️⃣ Download NLTK stopwords
-# -----------------------
-nltk.download('stopwords', quiet=True)
-stop_words = set(stopwords.words('english'))
-
-# -----------------------
-# 2️⃣ Load and clean posts
-# -----------------------
-tree = ET.parse(posts_file)
-root = tree.getroot()
-
-posts = []
-for row in root.findall("row"):
-    try:
-        post_id = int(row.attrib.get("Id"))
-    except (ValueError, TypeError):
-        continue
-    body = row.attrib.get("Body", "")
-    # Remove HTML tags
-    text = BeautifulSoup(body, "html.parser").get_text()
-    if text.strip():
-        posts.append((post_id, text))
-
-# -----------------------
-# 3️⃣ Preprocessing function
-# -----------------------
-def preprocess(text):
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    tokens = [w for w in text.split() if w.isalpha() and w not in stop_words]
-    return tokens
-
-# -----------------------
-# 4️⃣ Build inverted index
+# 1️⃣ Open the on-disk index (built on first use, see index_store.py)
 # -----------------------
 start_time = time.time()
-inverted_index = {}
-
-for post_id, text in posts:
-    tokens = preprocess(text)
-    for token in tokens:
-        inverted_index.setdefault(token, set()).add(post_id)
-
+# mmapped, shared across processes; positions for "phrase" queries
+inverted_index = open_index(posts_file, fields=["Body"], workers=os.cpu_count(), positions=True)
 end_time = time.time()
-print(f"Inverted index built with {len(inverted_index)} unique terms in {end_time - start_time:.2f} seconds")
+print(f"Inverted index ready with {len(inverted_index)} unique terms in {end_time - start_time:.2f} seconds")
+# Repeated queries come from an LRU result cache, hot terms' postings from another (see query_cache.py)
+query_cache = QueryCache(inverted_index)
 
 # -----------------------
-# 5️⃣ Boolean search function
+# 2️⃣ Boolean search function
 # -----------------------
+# Full query language: AND / OR / NOT, parentheses and "phrases" (see query_parser.py);
+# `operator` only joins words written without one
 def boolean_search(query, operator="AND"):
-    query_tokens = preprocess(query)
-    if not query_tokens:
-        return []
-
-    # Get sets for each token
-    sets = [inverted_index.get(t, set()) for t in query_tokens]
-
-    if operator.upper() == "AND":
-        result_set = set.intersection(*sets) if sets else set()
-    elif operator.upper() == "OR":
-        result_set = set.union(*sets)
-    else:
+    if operator.upper() not in ("AND", "OR"):
         raise ValueError("Operator must be AND or OR")
-
     # Return top 50 post IDs
-    return list(result_set)[:50]
+    return query_cache.boolean(query, default_operator=operator)[:50].tolist()
 
 # -----------------------
-# 6️⃣ Example usage
+# 3️⃣ Example usage
 # -----------------------
 query1 = "Playstation"
 results_and = boolean_search(query1, operator="AND")
@@ -91,3 +47,19 @@ results_or = boolean_search(query1, operator="OR")
 
 print("AND results:", results_and)
 print("OR results:", results_or)
+print("Query language:", boolean_search('(sekiro OR "elden ring") AND boss NOT xbox')[:10])
+
+# Tag facets of every match (docIDs line up across all indexes of the dump, see tag_index.py)
+tag_index = open_tag_index(posts_file)
+matches = evaluate(parse(query1, inverted_index.analyzer), inverted_index)
+print("Top tags among matches:", tag_index.facets(matches, 10))
+
+# Metadata filters, applied while the query is evaluated (see doc_metadata.py)
+metadata = open_metadata(posts_file).aligned(inverted_index.doc_ids)
+within = metadata.docids("type:question score>=5 unanswered")
+print("Unanswered questions scored 5+:", search(inverted_index, query1, within=within)[:10].tolist())
+
+docs = open_doc_store(posts_file)
+print("\nFirst AND matches:")
+for pid in results_and[:10]:
+    print(pid, docs.get(pid, "Title") or (docs.get(pid, "Body") or "")[:80])
@@ -2,16 +2,21 @@
 # boolean_tf_ir_evaluation_top10.py
 # ----------------------------
 import os
+import re
 import pandas as pd
-import xml.etree.ElementTree as ET
-import re, string, time, math
-from collections import defaultdict
+import time, math
+from dump_reader import resolve_dump_path
+from analyzer import default_analyzer
+from batch_scoring import BatchScorer
+from fielded_index import open_fielded_index
+from index_store import format_build, open_index
+from query_cache import QueryCache
 
 # ----------------------------
 # 0️⃣ Define path for Posts.xml
 # ----------------------------
 repo_root = os.getcwd()  # Current working directory
-posts_path = os.path.join(repo_root, "data/Posts.xml")
+posts_path = resolve_dump_path(os.path.join(repo_root, "data/Posts.xml"))  # falls back to data/Posts.zip
 
 if not os.path.exists(posts_path):
     raise FileNotFoundError(f"{posts_path} not found! Current folder: {os.getcwd()}")
@@ -19,97 +24,61 @@ if not os.path.exists(posts_path):
 # ----------------------------
 # 1️⃣ Text normalization (No NLTK)
 # ----------------------------
-stop_words = set([
-    'i','me','my','myself','we','our','ours','ourselves','you','your','yours','yourself','yourselves',
-    'he','him','his','himself','she','her','hers','herself','it','its','itself','they','them','their',
-    'theirs','themselves','what','which','who','whom','this','that','these','those','am','is','are',
-    'was','were','be','been','being','have','has','had','having','do','does','did','doing','a','an',
-    'the','and','but','if','or','because','as','until','while','of','at','by','for','with','about',
-    'against','between','into','through','during','before','after','above','below','to','from','up',
-    'down','in','out','on','off','over','under','again','further','then','once','here','there','when',
-    'where','why','how','all','any','both','each','few','more','most','other','some','such','no','nor',
-    'not','only','own','same','so','than','too','very','s','t','can','will','just','don','should','now'
-])
-
-def normalize_text(text):
-    text = text.lower()
-    text = re.sub(r'<[^>]+>', ' ', text)          # Remove HTML
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    tokens = text.split()
-    tokens = [w for w in tokens if w.isalpha() and w not in stop_words]
-    return tokens
+# Same analyzer as the other indexers (see analyzer.py)
+normalize_text = default_analyzer.analyze
 
 # ----------------------------
-# 2️⃣ Load all posts efficiently
+# 2️⃣ Boolean search (AND/OR/NOT, parentheses, "exact phrases", a NEAR/k b)
 # ----------------------------
-def load_all_posts(file_path):
-    posts = []
-    for event, elem in ET.iterparse(file_path, events=("end",)):
-        if elem.tag == "row":
-            post_id = elem.attrib.get("Id")
-            title = elem.attrib.get("Title", "")
-            body = elem.attrib.get("Body", "")
-            posts.append({"Id": int(post_id), "Text": title + " " + body})
-            elem.clear()  # Free memory
-    return pd.DataFrame(posts)
+NEAR = re.compile(r'(\S+)\s+NEAR/(\d+)\s+(\S+)')
 
-# ----------------------------
-# 3️⃣ Build boolean and TF indexes separately
-# ----------------------------
-def build_indexes_separately(df):
-    boolean_index = defaultdict(set)
-    tf_index = defaultdict(lambda: defaultdict(int))
-    doc_text_map = {}
-
-    # Boolean index
-    start_time_bool = time.time()
-    for _, row in df.iterrows():
-        doc_id = row["Id"]
-        tokens = normalize_text(row["Text"])
-        for token in tokens:
-            boolean_index[token].add(doc_id)
-    boolean_time = time.time() - start_time_bool
-
-    # TF index
-    start_time_tf = time.time()
-    for _, row in df.iterrows():
-        doc_id = row["Id"]
-        tokens = normalize_text(row["Text"])
-        doc_text_map[doc_id] = tokens
-        for token in tokens:
-            tf_index[token][doc_id] += 1
-    tf_time = time.time() - start_time_tf
-
-    return boolean_index, tf_index, doc_text_map, boolean_time, tf_time
+# Repeated queries are served from an LRU result cache (see query_cache.py)
+query_caches = {}
+
+def cache_for(index):
+    if id(index) not in query_caches:
+        query_caches[id(index)] = QueryCache(index)
+    return query_caches[id(index)]
 
-# ----------------------------
-# 4️⃣ Boolean search (AND/OR)
-# ----------------------------
 def boolean_search(query, boolean_index, operator="OR"):
-    tokens = normalize_text(query)
-    if not tokens:
-        return set()
-    sets = [boolean_index.get(t, set()) for t in tokens]
-    if operator.upper() == "AND":
-        result = set.intersection(*sets) if sets else set()
-    else:
-        result = set.union(*sets)
-    return result
+    # `operator` joins words that have no explicit operator between them (see query_parser.py)
+    return cache_for(boolean_index).boolean(query, default_operator=operator)
 
 # ----------------------------
-# 5️⃣ TF-based ranking (top-k)
+# 3️⃣ TF-based ranking (top-k)
 # ----------------------------
 def tf_ranking(query, tf_index, k=50):
-    tokens = normalize_text(query)
-    scores = defaultdict(int)
-    for t in tokens:
-        for doc_id, freq in tf_index.get(t, {}).items():
-            scores[doc_id] += freq
-    ranked_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    return [doc_id for doc_id, _ in ranked_docs[:k]]
+    tokens = normalize_text(NEAR.sub(r"\1 \3", query))
+    # Document at a time with a size-k heap: no accumulator over every matching doc
+    post_ids, _ = cache_for(tf_index).top_k(tokens, k, model="tf")
+    return post_ids.tolist()
+
+# TF top-k of many queries at once: one sparse matrix product (see batch_scoring.py).
+# The doc-term matrix takes a pass over every posting, so it is built once per
+# index (and generation) and reused; small query sets just go one by one.
+BATCH_MIN_QUERIES = 1000
+batch_scorers = {}
+
+def batch_scorer_for(index):
+    generation, scorer = batch_scorers.get(id(index), (None, None))
+    if scorer is None or generation != index.generation:
+        batch_scorers[id(index)] = index.generation, BatchScorer(index, model="tf")
+    return batch_scorers[id(index)][1]
+
+def tf_ranking_batch(queries, tf_index, k=50):
+    if len(queries) < BATCH_MIN_QUERIES:
+        return [tf_ranking(query, tf_index, k) for query in queries]
+    tokens = [normalize_text(NEAR.sub(r"\1 \3", query)) for query in queries]
+    return [post_ids.tolist() for post_ids, _ in batch_scorer_for(tf_index).top_k(tokens, k)]
+
+# BM25F over separate Title / Body / Tags fields ("title:word" restricts a word to one field)
+def bm25f_ranking(query, fielded_index, k=50):
+    query = NEAR.sub(r"\1 \3", query).replace('"', " ")
+    post_ids, _ = fielded_index.search(query, k)
+    return post_ids.tolist()
 
 # ----------------------------
-# 6️⃣ Evaluation metrics
+# 4️⃣ Evaluation metrics
 # ----------------------------
 def precision_at_k(retrieved, relevant, k):
     retrieved_k = retrieved[:k]
@@ -125,16 +94,27 @@ def ndcg_at_k(retrieved, relevant, k):
     return dcg / idcg if idcg > 0 else 0
 
 # ----------------------------
-# 7️⃣ Load all posts and build indexes
+# 5️⃣ Open the on-disk index (Title + Body, with positions; built on first use, see index_store.py)
 # ----------------------------
-posts_df = load_all_posts(posts_path)
-boolean_index, tf_index, doc_text_map, boolean_time, tf_time = build_indexes_separately(posts_df)
-print(f"Boolean index build time: {boolean_time:.2f}s")
-print(f"TF index build time: {tf_time:.2f}s")
+start_time = time.time()
+index = open_index(posts_path, workers=os.cpu_count(), positions=True)  # first build runs on every core
+load_time = time.time() - start_time
+# One index serves both models: Boolean retrieval reads docIDs, TF ranking adds the freqs
+boolean_index = tf_index = index
+print(f"Index ready in {load_time:.2f}s")
+print("Index build stages (time, peak RSS):")
+print(format_build(index.meta))
 print(f"Built indexes with {len(boolean_index)} unique terms")
+stats = tf_index.stats()
+print(f"Postings: {stats['postings']} in {stats['postings_bytes'] / 1e6:.1f} MB "
+      f"({stats['bytes_per_posting']:.2f} bytes/posting)")
+# Title, Body and Tags indexed separately in one pass, for BM25F (see fielded_index.py)
+fielded_index = open_fielded_index(posts_path)
+print("Fielded index build stages:")
+print(format_build(fielded_index.meta))
 
 # ----------------------------
-# 8️⃣ Example queries (20 queries)
+# 6️⃣ Example queries (20 queries)
 # ----------------------------
 queries = [
     "Can I download PlayStation 3 games for my PlayStation 4",
@@ -159,19 +139,30 @@ queries = [
     "I don't know where to go next in Elden Ring! How do I find out?"
 ]
 
+# Phrase and NEAR/k coverage for the Boolean model; kept apart from the 20
+# benchmark queries above so their numbers stay comparable across runs
+phrase_queries = [
+    '"Dark Souls 2" Xbox360',
+    'Defeating "Moonlight Butterfly"',
+    '"Grafted Scion" "Elden Ring"',
+    'dexterity weapon NEAR/3 speed "Elden Ring"',
+]
+
 # ----------------------------
-# 9️⃣ Run evaluation for both models (Top-10)
+# 7️⃣ Run evaluation for the three models (Top-10)
 # ----------------------------
 TOP_K = 10
 all_results = []
+# Same results as tf_ranking per query (ties broken by docID in both)
+tf_results = tf_ranking_batch(queries, tf_index, k=TOP_K)
 
-for query in queries:
+for query, tf_docs in zip(queries, tf_results):
     # Boolean
     boolean_docs_full = boolean_search(query, boolean_index, operator="OR")
-    boolean_docs = list(boolean_docs_full)[:TOP_K]
+    boolean_docs = boolean_docs_full[:TOP_K].tolist()
 
-    # TF
-    tf_docs = tf_ranking(query, tf_index, k=TOP_K)
+    # BM25F
+    bm25f_docs = bm25f_ranking(query, fielded_index, k=TOP_K)
 
     # Simulate relevance
     relevant_docs = tf_docs[:3]
@@ -181,18 +172,28 @@ for query in queries:
     ndcg_bool = ndcg_at_k(boolean_docs, relevant_docs, TOP_K)
     prec_tf = precision_at_k(tf_docs, relevant_docs, TOP_K)
     ndcg_tf = ndcg_at_k(tf_docs, relevant_docs, TOP_K)
+    prec_bm25f = precision_at_k(bm25f_docs, relevant_docs, TOP_K)
+    ndcg_bm25f = ndcg_at_k(bm25f_docs, relevant_docs, TOP_K)
 
     all_results.append({
         "Query": query,
         f"Prec@{TOP_K}_Boolean": prec_bool,
         f"nDCG@{TOP_K}_Boolean": ndcg_bool,
         f"Prec@{TOP_K}_TF": prec_tf,
-        f"nDCG@{TOP_K}_TF": ndcg_tf
+        f"nDCG@{TOP_K}_TF": ndcg_tf,
+        f"Prec@{TOP_K}_BM25F": prec_bm25f,
+        f"nDCG@{TOP_K}_BM25F": ndcg_bm25f
     })
 
 results_df = pd.DataFrame(all_results)
 print(f"\n===== Evaluation Results (Top-{TOP_K}) =====")
 print(results_df)
+print("Query cache:", cache_for(index).stats())
+
+print("\n===== Phrase / NEAR queries (Boolean) =====")
+for query in phrase_queries:
+    matches = boolean_search(query, boolean_index, operator="AND")
+    print(f"{query!r:50} {len(matches):6d} matches  {matches[:5].tolist()}")
 
 
 # # ----------------------------
@@ -0,0 +1,120 @@
+# daat.py
+# Document-at-a-time top-k: posting cursors walked together, a bounded heap.
+#
+#   post_ids, scores = tf_top_k(index, ["elden", "ring"], 10)     # summed term frequencies
+#   post_ids, scores = BM25(index).daat_top_k(["elden", "ring"], 10)
+#   post_ids, scores = tf_top_k(index, ["elden", "ring"], 10, allowed=metadata.mask("score>=5"))
+#
+# Every query term gets a cursor that decodes its posting list one block at
+# a time (postings.PostingCursor, DAAT_BLOCK postings per step). Each step
+# takes the smallest last docID among the cursors' current blocks as the
+# pivot and scores every doc up to it from all cursors at once, so a doc is
+# finished (all of its terms summed, in query-term order) before the cursors
+# move past it. Finished docs go through a size-k min-heap. Memory is
+# O(k + terms * block) whatever the number of matching docs: no per-query
+# accumulator over all of them is allocated.
+#
+# Given per-term upper bounds (BM25.daat_top_k), the walk prunes MaxScore
+# style: once the heap is full, the lowest-bound terms whose bounds add up
+# to less than its minimum can no longer bring a new doc in. They stop
+# driving the pivot and only look up the docs of each window through their
+# skip entries (PostingCursor.seek), so most of their blocks are never
+# decoded.
+#
+# An `allowed` mask over docIDs (a metadata filter, see doc_metadata.py)
+# drops filtered-out docs from each window before anything is seeked or
+# scored, and the heap only ever holds allowed docs.
+import heapq
+
+import numpy as np
+
+# Postings decoded per cursor step: large enough to amortize the per-step
+# Python work, small enough to keep memory per query constant
+DAAT_BLOCK = 4096
+
+
+def daat_top_k(cursors, scorers, k, block=DAAT_BLOCK, bounds=None, allowed=None):
+    """Best `k` (docids, scores) over cursors, ties broken by docID.
+
+    scorers[i](docids, freqs) returns the score contributions of a block of
+    cursor i's postings. With `bounds` (the most each cursor can add to a
+    doc, cursors in decreasing bound order), cursors whose bounds together
+    cannot lift a doc into the heap stop driving the walk and are only
+    seeked for the docs the others bring up. Only docs set in the boolean
+    mask `allowed` are scored, if given.
+    """
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    heap = []  # (score, -docid): the root is the current k-th best
+    blocks = [cursor.next_block(block) for cursor in cursors]
+    starts = [0] * len(cursors)
+    # rest[i]: most that cursors i.. can add to a doc; cursors[essential:] only get seeked
+    rest = np.cumsum(bounds[::-1])[::-1].tolist() if bounds is not None else None
+    essential = len(cursors)
+    while True:
+        if rest is not None and len(heap) == k:
+            while essential and rest[essential - 1] < heap[0][0]:
+                essential -= 1
+        live = [i for i in range(essential) if blocks[i] is not None]
+        if not live:
+            break
+        pivot = min(blocks[i][0][-1] for i in live)
+        parts = {}
+        for i in live:
+            block_docids, block_freqs = blocks[i]
+            start = starts[i]
+            stop = int(np.searchsorted(block_docids, pivot, side="right"))
+            if stop > start:
+                part_docids, part_freqs = block_docids[start:stop], block_freqs[start:stop]
+                if allowed is not None:
+                    keep = allowed[part_docids]
+                    part_docids, part_freqs = part_docids[keep], part_freqs[keep]
+                if len(part_docids):
+                    parts[i] = part_docids, part_freqs
+            if stop == len(block_docids):
+                blocks[i], starts[i] = cursors[i].next_block(block), 0
+            else:
+                starts[i] = stop
+        if not parts:
+            continue
+        docs = np.concatenate([d for d, _ in parts.values()])
+        docs.sort()
+        docs = docs[np.r_[True, docs[1:] != docs[:-1]]]
+        for i in range(essential, len(cursors)):
+            hit, freqs = cursors[i].seek(docs)
+            if len(freqs):
+                parts[i] = docs[hit], freqs
+        # Contributions added in cursor order, so every doc's score is summed in query-term order
+        scores = np.zeros(len(docs))
+        for i in sorted(parts):
+            scores[np.searchsorted(docs, parts[i][0])] += scorers[i](*parts[i])
+        # Docs come in increasing docID order, so a doc tied with the heap's
+        # minimum loses the tie-break; only strictly better scores can enter
+        if len(heap) == k:
+            better = np.flatnonzero(scores > heap[0][0])
+        else:
+            better = np.arange(len(docs))
+        if len(better) > k:
+            # The step's own best k, ties to the lower docID
+            better = better[np.lexsort((better, -scores[better]))[:k]]
+        for j in better.tolist():
+            entry = (scores[j], -int(docs[j]))
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+    best = sorted(heap, key=lambda e: (-e[0], -e[1]))
+    return (np.array([-d for _, d in best], dtype=np.int64),
+            np.array([score for score, _ in best], dtype=np.float64))
+
+
+def tf_top_k(index, terms, k, allowed=None):
+    """Best `k` post Ids by summed term frequency (as InvertedIndex.tf_scores + top_k)."""
+    cursors, scorers = [], []
+    for term in terms:
+        cursor = index.cursor(term)
+        if cursor is not None:
+            cursors.append(cursor)
+            scorers.append(lambda docids, freqs: freqs)
+    docids, scores = daat_top_k(cursors, scorers, k, allowed=allowed)
+    return index.post_ids(docids), scores.astype(np.int64)
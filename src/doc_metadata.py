@@ -0,0 +1,218 @@
+# doc_metadata.py
+# Per-post metadata columns for query-time filters.
+#
+#   python src/doc_metadata.py data/Posts.xml "type:question score>=5 created:2022..2024 unanswered"
+#
+#   meta = open_metadata(posts_path).aligned(index.doc_ids)   # builds on first use
+#   within = meta.docids("type:question score>=5")             # sorted internal docIDs
+#   post_ids = query_parser.search(index, "elden ring", within=within)
+#   post_ids, scores = BM25(index).top_k(terms, 10, allowed=meta.mask("created>=2023"))
+#
+# PostTypeId, Score, AnswerCount and CreationDate are kept as flat numpy
+# arrays (one file each, memory-mapped), one row per post in dump order,
+# which is also the internal docID order of every index built from the
+# dump. aligned() reorders them for an index whose docIDs differ (a
+# SegmentedIndex), so row i is always docID i.
+#
+# A filter expression is a list of space-separated predicates, all of which
+# must hold:
+#   type:question  type:answer     PostTypeId (1 / 2, or any number)
+#   score>=5  score<0  score:1..10 Score (ranges are inclusive)
+#   answers>=3  answers:0          AnswerCount
+#   created:2022..2024             CreationDate; a year, month or day stands
+#   created>=2023-06  created:2023-05-17   for its whole period
+#   unanswered  answered           questions with no / some answers
+# Each predicate is a vectorized comparison over its column, so a filter is
+# a boolean mask over docIDs. Queries take it as the docs to search within
+# (query_parser.evaluate) or as a mask checked on each block of postings
+# before it is scored (BM25), so filtered-out docs are never scored.
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+import dump_cache
+import dump_reader
+
+METADATA_VERSION = 1
+META = "meta.json"
+# column -> (dump attribute, dtype); missing values are stored as 0 (NaT for dates)
+COLUMNS = {
+    "ids": ("Id", np.int64),
+    "type": ("PostTypeId", np.int8),
+    "score": ("Score", np.int32),
+    "answers": ("AnswerCount", np.int32),
+    "created": ("CreationDate", np.int64),  # ns since the epoch
+}
+NAT = np.iinfo(np.int64).min
+POST_TYPES = {"question": 1, "answer": 2}
+PREDICATE = re.compile(r"^(type|score|answers|created)(>=|<=|:|=|>|<)(.+)$")
+
+
+def metadata_dir_for(path):
+    return dump_cache.cache_dir_for(path) + ".meta"
+
+
+# -----------------------
+# Build
+# -----------------------
+def build_metadata(path, meta_dir=None):
+    """Write the metadata columns of a dump file."""
+    path = dump_reader.resolve_dump_path(path)
+    meta_dir = meta_dir or metadata_dir_for(path)
+    fingerprint = dump_cache.source_fingerprint(path)
+    meta = {"version": METADATA_VERSION, "source": fingerprint, "columns": list(COLUMNS)}
+    with dump_cache.building(meta_dir) as tmp_dir:
+        files = {name: open(os.path.join(tmp_dir, name + ".bin"), "wb") for name in COLUMNS}
+        rows = 0
+        try:
+            attributes = [attribute for attribute, _ in COLUMNS.values()]
+            for chunk in dump_reader.iter_chunks(path, attributes):
+                for name, (attribute, dtype) in COLUMNS.items():
+                    column = chunk[attribute]
+                    if name == "created":
+                        values = column.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+                    else:
+                        values = column.fillna(0).to_numpy(dtype=np.int64).astype(dtype)
+                    files[name].write(values.tobytes())
+                rows += len(chunk)
+        finally:
+            for f in files.values():
+                f.close()
+        meta["rows"] = rows
+        with open(os.path.join(tmp_dir, META), "w") as f:
+            json.dump(meta, f, indent=1)
+    return meta
+
+
+# -----------------------
+# Filters
+# -----------------------
+def value_span(field, text):
+    """[lo, hi) of the column values one filter value stands for."""
+    if field == "created":
+        try:
+            day = np.datetime64(text)
+        except ValueError:
+            raise ValueError(f"bad date {text!r} in filter") from None
+        return tuple(int(d.astype("datetime64[ns]").astype(np.int64)) for d in (day, day + 1))
+    if field == "type" and text in POST_TYPES:
+        value = POST_TYPES[text]
+    else:
+        try:
+            value = int(text)
+        except ValueError:
+            raise ValueError(f"bad {field} value {text!r} in filter") from None
+    return value, value + 1
+
+
+def parse_predicate(token):
+    """(column, lo, hi) of one predicate: lo <= value < hi, None for an open end."""
+    match = PREDICATE.match(token)
+    if match is None:
+        raise ValueError(f"unknown filter {token!r}")
+    field, op, text = match.groups()
+    if op in (":", "=") and ".." in text:
+        first, last = text.split("..", 1)
+        return field, value_span(field, first)[0] if first else None, value_span(field, last)[1] if last else None
+    lo, hi = value_span(field, text)
+    if op in (":", "="):
+        return field, lo, hi
+    return {
+        ">=": (field, lo, None),
+        ">": (field, hi, None),
+        "<=": (field, None, hi),
+        "<": (field, None, lo),
+    }[op]
+
+
+# -----------------------
+# Read
+# -----------------------
+class DocMetadata:
+    """Metadata columns, row i describing internal docID i."""
+
+    def __init__(self, columns, known=None):
+        self.columns = columns
+        self.known = known  # rows of posts the metadata has (aligned()), None for all
+
+    @classmethod
+    def load(cls, meta_dir):
+        with open(os.path.join(meta_dir, META)) as f:
+            meta = json.load(f)
+        columns = {}
+        for name, (_, dtype) in COLUMNS.items():
+            if meta["rows"]:
+                columns[name] = np.memmap(os.path.join(meta_dir, name + ".bin"), dtype=dtype,
+                                          mode="r", shape=(meta["rows"],))
+            else:
+                columns[name] = np.zeros(0, dtype=dtype)
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns["ids"])
+
+    def aligned(self, doc_ids):
+        """Metadata in the docID order of an index (its doc_ids); unknown posts match no filter on them."""
+        doc_ids = np.asarray(doc_ids)
+        ids = self.columns["ids"]
+        if len(doc_ids) == len(ids) and np.array_equal(doc_ids, ids):
+            return self
+        order = np.argsort(ids, kind="stable")
+        rows = order[np.minimum(np.searchsorted(ids, doc_ids, sorter=order), max(len(ids) - 1, 0))]
+        found = ids[rows] == doc_ids if len(ids) else np.zeros(len(doc_ids), dtype=bool)
+        columns = {}
+        for name, column in self.columns.items():
+            values = np.asarray(column)[rows] if len(ids) else np.zeros(len(doc_ids), dtype=column.dtype)
+            values[~found] = NAT if name == "created" else 0
+            columns[name] = values
+        columns["ids"] = doc_ids.astype(np.int64)
+        return DocMetadata(columns, found)
+
+    def mask(self, expression):
+        """Boolean mask over docIDs of the docs matching every predicate of a filter expression."""
+        mask = np.ones(len(self), dtype=bool)
+        for token in expression.lower().split():
+            if token in ("unanswered", "answered"):
+                mask &= self.columns["type"] == POST_TYPES["question"]
+                mask &= (self.columns["answers"] == 0) == (token == "unanswered")
+                continue
+            name, lo, hi = parse_predicate(token)
+            column = self.columns[name]
+            if lo is not None:
+                mask &= column >= lo
+            if hi is not None:
+                mask &= column < hi
+            if name == "created" and lo is None:
+                mask &= column != NAT
+        if self.known is not None and expression.split():
+            # Stored as 0, an unknown post would otherwise pass score:0 or answers<1
+            mask &= self.known
+        return mask
+
+    def docids(self, expression):
+        """Sorted internal docIDs matching a filter expression."""
+        return np.flatnonzero(self.mask(expression))
+
+
+def open_metadata(path, meta_dir=None):
+    """Open the metadata columns of a dump file, (re)building them if missing or stale."""
+    path = dump_reader.resolve_dump_path(path)
+    meta_dir = meta_dir or metadata_dir_for(path)
+    fresh = dump_cache.fresh_meta(path, os.path.join(meta_dir, META),
+                                  {"version": METADATA_VERSION, "columns": list(COLUMNS)})
+    if fresh is None:
+        build_metadata(path, meta_dir)
+    return DocMetadata.load(meta_dir)
+
+
+if __name__ == "__main__":
+    metadata = open_metadata(sys.argv[1])
+    for expression in sys.argv[2:]:
+        start = time.perf_counter()
+        docids = metadata.docids(expression)
+        elapsed = (time.perf_counter() - start) * 1e3
+        print(f"{expression!r}: {len(docids)} of {len(metadata)} posts in {elapsed:.2f} ms")
@@ -0,0 +1,176 @@
+# doc_store.py
+# Memory-mapped document store: fetch the raw text of any post by Id in O(1).
+#
+#   docs = open_doc_store(posts_path)          # builds on first use
+#   docs.get(12345, "Title")                   # -> str or None
+#   docs.get_bytes(12345, "Body")              # -> zero-copy memoryview
+#
+# Each field is one contiguous UTF-8 blob (<field>.blob) plus an Id-indexed
+# int64 table of (offset, length) pairs (<field>.index). Both are opened with
+# mmap, so a process only pages in the documents it actually touches and
+# several search processes share the same page cache.
+import json
+import mmap
+import os
+import sys
+import zlib
+
+import numpy as np
+
+import dump_cache
+import dump_reader
+
+STORE_VERSION = 1
+META = "meta.json"
+DEFAULT_FIELDS = ("Title", "Body")
+
+
+def store_dir_for(path):
+    return dump_cache.cache_dir_for(path) + ".docs"
+
+
+# -----------------------
+# Build
+# -----------------------
+def build_doc_store(path, store_dir=None, fields=DEFAULT_FIELDS, compress=False):
+    """Write the doc store for a dump file.
+
+    With `compress` every document is zlib-compressed on its own, so it stays
+    individually addressable; fetches then decompress instead of being zero-copy.
+    """
+    path = dump_reader.resolve_dump_path(path)
+    store_dir = store_dir or store_dir_for(path)
+    fingerprint = dump_cache.source_fingerprint(path)
+    with dump_cache.building(store_dir) as tmp_dir:
+        blobs = {f: open(os.path.join(tmp_dir, f + ".blob"), "wb") for f in fields}
+        sizes = {f: 0 for f in fields}
+        ids, spans = [], {f: [] for f in fields}
+        try:
+            for chunk in dump_reader.iter_chunks(path, ["Id"] + list(fields)):
+                ids.append(chunk["Id"].to_numpy())
+                for field in fields:
+                    span = np.full((len(chunk), 2), -1, dtype=np.int64)
+                    for i, text in enumerate(chunk[field].tolist()):
+                        if not isinstance(text, str):
+                            continue
+                        data = text.encode("utf-8")
+                        if compress:
+                            data = zlib.compress(data)
+                        span[i] = (sizes[field], len(data))
+                        blobs[field].write(data)
+                        sizes[field] += len(data)
+                    spans[field].append(span)
+        finally:
+            for blob in blobs.values():
+                blob.close()
+
+        ids = np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+        n_slots = int(ids.max()) + 1 if len(ids) else 0
+        for field in fields:
+            index = np.full((n_slots, 2), -1, dtype=np.int64)
+            if len(ids):
+                index[ids] = np.concatenate(spans[field])
+            index.tofile(os.path.join(tmp_dir, field + ".index"))
+
+        meta = {
+            "version": STORE_VERSION,
+            "source": fingerprint,
+            "fields": list(fields),
+            "slots": n_slots,
+            "docs": int(len(ids)),
+            "compress": bool(compress),
+        }
+        with open(os.path.join(tmp_dir, META), "w") as f:
+            json.dump(meta, f, indent=1)
+    return meta
+
+
+# -----------------------
+# Read
+# -----------------------
+class DocStore:
+    """Read-only, mmap-backed view over a built doc store."""
+
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, META)) as f:
+            self.meta = json.load(f)
+        self.fields = self.meta["fields"]
+        self.compressed = self.meta["compress"]
+        self.index = {}
+        self.blobs = {}
+        self.views = {}
+        for field in self.fields:
+            slots = self.meta["slots"]
+            if slots:
+                self.index[field] = np.memmap(os.path.join(store_dir, field + ".index"),
+                                              dtype=np.int64, mode="r", shape=(slots, 2))
+            else:
+                self.index[field] = np.zeros((0, 2), dtype=np.int64)
+            blob_path = os.path.join(store_dir, field + ".blob")
+            if os.path.getsize(blob_path):
+                with open(blob_path, "rb") as f:
+                    self.blobs[field] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.views[field] = memoryview(self.blobs[field])
+            else:
+                self.views[field] = memoryview(b"")
+
+    def __len__(self):
+        return self.meta["docs"]
+
+    def __contains__(self, post_id):
+        return any(self.span(post_id, f) is not None for f in self.fields)
+
+    def span(self, post_id, field):
+        index = self.index[field]
+        if post_id < 0 or post_id >= len(index):
+            return None
+        offset, length = index[post_id]
+        if length < 0:
+            return None
+        return int(offset), int(length)
+
+    def get_bytes(self, post_id, field="Body"):
+        """Stored bytes of one field as a zero-copy memoryview (None if absent)."""
+        span = self.span(post_id, field)
+        if span is None:
+            return None
+        offset, length = span
+        return self.views[field][offset:offset + length]
+
+    def get(self, post_id, field="Body"):
+        """Text of one field of a post, or None if the post has no such field."""
+        data = self.get_bytes(post_id, field)
+        if data is None:
+            return None
+        if self.compressed:
+            return zlib.decompress(data).decode("utf-8")
+        return str(data, "utf-8")
+
+    def get_many(self, post_ids, field="Body"):
+        return [self.get(pid, field) for pid in post_ids]
+
+    def close(self):
+        for view in self.views.values():
+            view.release()
+        for blob in self.blobs.values():
+            blob.close()
+
+
+def open_doc_store(path, store_dir=None, fields=DEFAULT_FIELDS, compress=False):
+    """Open the doc store for a dump file, (re)building it if it is missing or stale."""
+    path = dump_reader.resolve_dump_path(path)
+    store_dir = store_dir or store_dir_for(path)
+    fresh = dump_cache.fresh_meta(path, os.path.join(store_dir, META), {
+        "version": STORE_VERSION,
+        "fields": lambda stored: stored is not None and all(field in stored for field in fields),
+        "compress": bool(compress),
+    })
+    if fresh is None:
+        build_doc_store(path, store_dir, fields, compress)
+    return DocStore(store_dir)
+
+
+if __name__ == "__main__":
+    for dump_path in sys.argv[1:]:
+        info = build_doc_store(dump_path)
+        print(f"{dump_path}: {info['docs']} docs -> {store_dir_for(dump_reader.resolve_dump_path(dump_path))}")
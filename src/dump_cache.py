@@ -0,0 +1,360 @@
+# dump_cache.py
+# One-time columnar cache of a parsed dump file.
+#
+#   python src/dump_cache.py data/Posts.xml data/Comments.xml
+#
+# Every cached column is written to its own flat binary file next to a
+# manifest.json; string columns are stored as one UTF-8 blob plus an offsets
+# array. The cache lives in <dump dir>/.cache/<dump file name>/ and is keyed on
+# the source file's size, mtime and SHA-256, so a re-downloaded dump is picked
+# up automatically. dump_reader loads from it whenever it is fresh.
+# Columns are cached as they are first asked for: a read of ["Id", "Tags"]
+# parses and writes just those two, and a later read needing Body adds it
+# (the columns already cached are carried over, not re-parsed). The CLI
+# caches every schema column.
+#
+# Every cache, index and store derived from a dump is built in its own
+# uniquely named scratch directory next to its target and swapped into
+# place when complete (`with building(target) as tmp_dir:`), so concurrent
+# builders never delete each other's half-written output.
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import dump_reader
+
+CACHE_VERSION = 1
+MANIFEST = "manifest.json"
+HASH_BLOCK = 4 * 1024 * 1024
+
+# Set IR_DUMP_CACHE=0 to always parse the XML
+CACHE_ENABLED = os.environ.get("IR_DUMP_CACHE", "1") != "0"
+
+
+# -----------------------
+# Cache location and source fingerprint
+# -----------------------
+def cache_dir_for(path):
+    path = os.path.abspath(path)
+    return os.path.join(os.path.dirname(path), ".cache", os.path.basename(path))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path, with_hash=True):
+    st = os.stat(path)
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if with_hash:
+        fp["sha256"] = file_sha256(path)
+    return fp
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, obj):
+    """Write a JSON file atomically: to a unique temporary file next to it, then os.replace."""
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(obj, f, indent=1)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def write_manifest(cache_dir, manifest):
+    write_json(os.path.join(cache_dir, MANIFEST), manifest)
+
+
+# -----------------------
+# Atomic directory builds
+# -----------------------
+def building_dir(target, purpose="building"):
+    """A new, uniquely named scratch directory next to `target` (to build it in, or for its build's temporaries)."""
+    parent = os.path.dirname(os.path.abspath(target))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f"{os.path.basename(target)}.{purpose}-", dir=parent)
+
+
+def publish_dir(tmp_dir, target):
+    """Move a finished build into `target`, removing the previous version after the swap.
+
+    If another builder publishes first, its result is kept and this one is
+    discarded; readers that still map files of the old version keep them.
+    """
+    parent = os.path.dirname(os.path.abspath(target))
+    old = None
+    if os.path.exists(target):
+        old = tempfile.mkdtemp(prefix=os.path.basename(target) + ".old-", dir=parent)
+        try:
+            os.replace(target, old)
+        except FileNotFoundError:
+            pass
+    try:
+        os.replace(tmp_dir, target)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def building(target):
+    """Scratch directory to build `target` in: published on success, removed on failure."""
+    tmp_dir = building_dir(target)
+    try:
+        yield tmp_dir
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    publish_dir(tmp_dir, target)
+
+
+def fresh_manifest(path):
+    """Return the cache manifest for `path` if the cache matches the source, else None."""
+    if not os.path.exists(path):
+        return None
+    return fresh_meta(path, os.path.join(cache_dir_for(path), MANIFEST), {"version": CACHE_VERSION})
+
+
+def fingerprint_matches(path, cached):
+    """Check `path` against a stored fingerprint, refreshing its mtime on a hash match."""
+    st = os.stat(path)
+    if st.st_size != cached["size"]:
+        return False
+    if st.st_mtime_ns != cached["mtime_ns"]:
+        if file_sha256(path) != cached["sha256"]:
+            return False
+        cached["mtime_ns"] = st.st_mtime_ns
+    return True
+
+
+def fresh_meta(path, meta_path, params):
+    """The JSON meta at `meta_path` of something built from `path`, or None if missing or stale.
+
+    `params` maps each build parameter's meta key to the value it must have,
+    or to a predicate on the stored value. The source is then checked against
+    the stored fingerprint: size and mtime first, the SHA-256 only when the
+    mtime changed but the size did not (e.g. the file was copied or touched),
+    in which case the new mtime is written back to the meta.
+    """
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for key, expected in params.items():
+        stored = meta.get(key)
+        if not (expected(stored) if callable(expected) else stored == expected):
+            return None
+    if "source" not in meta:
+        return None
+    mtime_ns = meta["source"]["mtime_ns"]
+    if not fingerprint_matches(path, meta["source"]):
+        return None
+    if meta["source"]["mtime_ns"] != mtime_ns:
+        try:
+            write_json(meta_path, meta)
+        except OSError:
+            pass
+    return meta
+
+
+# -----------------------
+# Column writers
+# -----------------------
+class ColumnWriter:
+    """Appends typed chunks of one column to its files in the cache directory."""
+
+    def __init__(self, cache_dir, name, kind):
+        self.name = name
+        self.kind = kind
+        self.base = os.path.join(cache_dir, name)
+        self.has_values = False
+        self.n_bytes = 0
+        self.values = open(self.base + ".bin", "wb")
+        self.mask = open(self.base + ".mask", "wb") if kind in ("int", "str") else None
+        if kind == "str":
+            self.offsets = open(self.base + ".offsets", "wb")
+            np.zeros(1, dtype=np.int64).tofile(self.offsets)
+
+    def append(self, column):
+        if self.kind == "id":
+            np.asarray(column, dtype=np.int64).tofile(self.values)
+            self.has_values = True
+        elif self.kind == "int":
+            arr = pd.array(column, dtype="Int64")
+            mask = np.asarray(arr.isna())
+            arr.to_numpy(dtype=np.int64, na_value=0).tofile(self.values)
+            mask.tofile(self.mask)
+            self.has_values |= not mask.all()
+        elif self.kind == "date":
+            values = np.asarray(column, dtype="datetime64[ns]")
+            values.view(np.int64).tofile(self.values)
+            self.has_values |= not np.isnat(values).all()
+        else:
+            mask = np.array([v is None or v != v for v in column], dtype=bool)
+            encoded = [b"" if m else v.encode("utf-8") for v, m in zip(column, mask)]
+            lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+            (self.n_bytes + np.cumsum(lengths)).tofile(self.offsets)
+            self.n_bytes += int(lengths.sum())
+            self.values.write(b"".join(encoded))
+            mask.tofile(self.mask)
+            self.has_values |= not mask.all()
+
+    def close(self):
+        self.values.close()
+        if self.mask is not None:
+            self.mask.close()
+        if self.kind == "str":
+            self.offsets.close()
+
+
+COLUMN_SUFFIXES = (".bin", ".mask", ".offsets")
+
+
+def link_column(src_dir, dst_dir, name):
+    """Carry a cached column's files over to a new cache directory (hard links where possible)."""
+    for suffix in COLUMN_SUFFIXES:
+        src = os.path.join(src_dir, name + suffix)
+        if os.path.exists(src):
+            try:
+                os.link(src, os.path.join(dst_dir, name + suffix))
+            except OSError:
+                shutil.copy2(src, os.path.join(dst_dir, name + suffix))
+
+
+def build_cache(path, schema=None, columns=None, chunk_size=dump_reader.DEFAULT_CHUNK_SIZE, workers=None):
+    """Parse `path` once and cache `columns` (every schema column if None).
+
+    Columns a fresh cache already holds are kept as they are; only the
+    missing ones are parsed.
+    """
+    schema = schema or dump_reader.schema_for(path)
+    columns = list(schema) if columns is None else list(columns)
+    cache_dir = cache_dir_for(path)
+    existing = fresh_manifest(path)
+    kept = existing["columns"] if existing is not None else {}
+    missing = [col for col in columns if col not in kept]
+    if existing is not None and not missing:
+        return existing
+    fingerprint = existing["source"] if existing is not None else source_fingerprint(path)
+
+    with building(cache_dir) as tmp_dir:
+        for col in kept:
+            link_column(cache_dir, tmp_dir, col)
+        writers = {col: ColumnWriter(tmp_dir, col, schema[col]) for col in missing}
+        n_rows = 0
+        try:
+            for chunk in dump_reader.iter_chunks(path, missing, chunk_size, schema=schema, use_cache=False,
+                                                 workers=workers):
+                for col, writer in writers.items():
+                    writer.append(chunk[col].to_numpy())
+                n_rows += len(chunk)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        built = {col: {"kind": w.kind, "present": bool(w.has_values)} for col, w in writers.items()}
+        manifest = {
+            "version": CACHE_VERSION,
+            "source": fingerprint,
+            "rows": n_rows,
+            "columns": {col: kept.get(col) or built[col] for col in schema if col in kept or col in built},
+        }
+        write_manifest(tmp_dir, manifest)
+    return manifest
+
+
+# -----------------------
+# Column readers
+# -----------------------
+def open_column(cache_dir, name, kind, n_rows):
+    """Memory-map one cached column; returns a callable slicing it into a typed array."""
+    base = os.path.join(cache_dir, name)
+
+    def mapped(suffix, dtype, count):
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(base + suffix, dtype=dtype, mode="r", shape=(count,))
+
+    if kind == "id":
+        values = mapped(".bin", np.int64, n_rows)
+        return lambda start, stop: np.array(values[start:stop])
+    if kind == "int":
+        values = mapped(".bin", np.int64, n_rows)
+        mask = mapped(".mask", np.bool_, n_rows)
+        return lambda start, stop: pd.arrays.IntegerArray(
+            np.array(values[start:stop]), np.array(mask[start:stop]))
+    if kind == "date":
+        values = mapped(".bin", np.int64, n_rows)
+        return lambda start, stop: np.array(values[start:stop]).view("datetime64[ns]")
+
+    offsets = mapped(".offsets", np.int64, n_rows + 1)
+    mask = mapped(".mask", np.bool_, n_rows)
+    blob = mapped(".bin", np.uint8, int(offsets[-1])) if n_rows else b""
+
+    def strings(start, stop):
+        data = bytes(blob[offsets[start]:offsets[stop]])
+        base_off = int(offsets[start])
+        bounds = (offsets[start:stop + 1] - base_off).tolist()
+        nulls = mask[start:stop].tolist()
+        return np.array([
+            None if nulls[i] else data[bounds[i]:bounds[i + 1]].decode("utf-8")
+            for i in range(stop - start)
+        ], dtype=object)
+
+    return strings
+
+
+def cached_columns(manifest, columns):
+    """Resolve the requested columns against the cache, or None if it cannot serve them."""
+    available = manifest["columns"]
+    if columns is None:
+        return [col for col, meta in available.items() if meta["present"]]
+    if any(col not in available for col in columns):
+        return None
+    return list(columns)
+
+
+def iter_cached_chunks(path, manifest, columns, chunk_size, max_rows=None, start=0, stop=None):
+    """Yield typed DataFrame chunks straight from the cache (rows start..stop-1 if given)."""
+    cache_dir = cache_dir_for(path)
+    n_rows = manifest["rows"] if stop is None else min(stop, manifest["rows"])
+    if max_rows:
+        n_rows = min(n_rows, start + max_rows)
+    readers = {
+        col: open_column(cache_dir, col, manifest["columns"][col]["kind"], manifest["rows"])
+        for col in columns
+    }
+    for lo in range(start, n_rows, chunk_size):
+        hi = min(lo + chunk_size, n_rows)
+        yield pd.DataFrame({col: read(lo, hi) for col, read in readers.items()})
+
+
+if __name__ == "__main__":
+    for dump_path in sys.argv[1:]:
+        dump_path = dump_reader.resolve_dump_path(dump_path)
+        print(f"Caching {dump_path} ...")
+        info = build_cache(dump_path)
+        print(f"  {info['rows']} rows -> {cache_dir_for(dump_path)}")
@@ -0,0 +1,361 @@
+# dump_reader.py
+# Shared streaming reader for the Stack Exchange dump (Posts.xml, Comments.xml).
+#
+#   from dump_reader import load_posts, iter_chunks
+#   posts_df = load_posts(posts_path, columns=["Id", "PostTypeId", "Tags"])
+#
+# Rows are parsed with lxml iterparse and converted to typed columns chunk by
+# chunk, so at most one chunk of raw rows is held in memory at a time.
+# Once a dump has been converted by dump_cache, the same calls load the
+# requested columns from the columnar cache instead of re-parsing the XML.
+# Posts.zip / Comments.zip can be passed wherever a .xml path is accepted;
+# rows are streamed straight out of the compressed member.
+# Pass workers=N (or set IR_INGEST_WORKERS) to parse plain .xml files in
+# parallel byte ranges across a process pool.
+import contextlib
+import io
+import logging
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# -----------------------
+# Column types
+# -----------------------
+# "id"   -> int64, must be present on every row
+# "int"  -> nullable Int64
+# "date" -> datetime64 (NaT when missing)
+# "str"  -> object (None when missing)
+POSTS_SCHEMA = {
+    "Id": "id",
+    "PostTypeId": "id",
+    "AcceptedAnswerId": "int",
+    "ParentId": "int",
+    "CreationDate": "date",
+    "DeletionDate": "date",
+    "Score": "int",
+    "ViewCount": "int",
+    "Body": "str",
+    "OwnerUserId": "int",
+    "OwnerDisplayName": "str",
+    "LastEditorUserId": "int",
+    "LastEditorDisplayName": "str",
+    "LastEditDate": "date",
+    "LastActivityDate": "date",
+    "Title": "str",
+    "Tags": "str",
+    "AnswerCount": "int",
+    "CommentCount": "int",
+    "FavoriteCount": "int",
+    "ClosedDate": "date",
+    "CommunityOwnedDate": "date",
+    "ContentLicense": "str",
+}
+
+COMMENTS_SCHEMA = {
+    "Id": "id",
+    "PostId": "id",
+    "Score": "int",
+    "Text": "str",
+    "CreationDate": "date",
+    "UserDisplayName": "str",
+    "UserId": "int",
+    "ContentLicense": "str",
+}
+
+DEFAULT_CHUNK_SIZE = 50_000
+DEFAULT_WORKERS = int(os.environ.get("IR_INGEST_WORKERS", "1"))
+
+
+def schema_for(path):
+    """Pick the column schema from the dump file name."""
+    name = os.path.basename(path).lower()
+    if name.startswith("comments"):
+        return COMMENTS_SCHEMA
+    return POSTS_SCHEMA
+
+
+# -----------------------
+# Dump sources (.xml or .zip)
+# -----------------------
+def resolve_dump_path(path):
+    """Return `path`, or the sibling .zip archive when only that exists (data/Posts.zip)."""
+    if os.path.exists(path) or not path.lower().endswith(".xml"):
+        return path
+    zip_path = path[:-4] + ".zip"
+    return zip_path if os.path.exists(zip_path) else path
+
+
+def zip_member(zf, path):
+    """Pick the XML member of a dump archive: <stem>.xml, else the only .xml inside."""
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    xml_names = [n for n in zf.namelist() if n.lower().endswith(".xml")]
+    for name in xml_names:
+        if os.path.basename(name).lower() == stem + ".xml":
+            return name
+    if len(xml_names) == 1:
+        return xml_names[0]
+    raise ValueError(f"Cannot find the {stem}.xml member in {path} (members: {xml_names})")
+
+
+@contextlib.contextmanager
+def open_dump(path):
+    """Open a dump file for streaming; .zip members are decompressed incrementally."""
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as zf, zf.open(zip_member(zf, path)) as f:
+            yield f
+    else:
+        with open(path, "rb") as f:
+            yield f
+
+
+# -----------------------
+# Typed conversion
+# -----------------------
+def convert_column(values, kind):
+    """Convert a list of raw attribute strings (or None) to a typed column."""
+    if kind == "id":
+        return np.array(values, dtype=np.int64)
+    if kind == "int":
+        return pd.array(pd.to_numeric(pd.Series(values, dtype=object)), dtype="Int64")
+    if kind == "date":
+        dates = pd.to_datetime(pd.Series(values, dtype=object), format="ISO8601")
+        return dates.to_numpy(dtype="datetime64[ns]")
+    return np.array(values, dtype=object)
+
+
+def rows_to_frame(raw, schema):
+    """Build a typed DataFrame from a dict of raw column lists."""
+    return pd.DataFrame({
+        col: convert_column(values, schema.get(col, "str"))
+        for col, values in raw.items()
+    })
+
+
+# -----------------------
+# Streaming parse
+# -----------------------
+def iter_raw_rows(source):
+    """Yield the attribute dict of every <row> element, freeing parsed rows as we go."""
+    for _, elem in etree.iterparse(source, events=("end",), tag="row", huge_tree=True):
+        yield elem.attrib
+        elem.clear(keep_tail=True)
+        # Drop already-processed siblings so the root does not grow
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def iter_raw_chunks(path, columns=None, chunk_size=DEFAULT_CHUNK_SIZE, max_rows=None):
+    """Yield dicts of raw column lists, at most `chunk_size` rows each."""
+    with open_dump(path) as source:
+        yield from iter_raw_chunks_from(source, columns, chunk_size, max_rows)
+
+
+def iter_raw_chunks_from(source, columns, chunk_size, max_rows):
+    fixed = columns is not None
+    raw = {col: [] for col in columns} if fixed else {}
+    n_chunk = 0
+    n_total = 0
+    for attrib in iter_raw_rows(source):
+        if fixed:
+            for col in columns:
+                raw[col].append(attrib.get(col))
+        else:
+            for col in attrib.keys():
+                if col not in raw:
+                    raw[col] = [None] * n_chunk
+            for col, values in raw.items():
+                values.append(attrib.get(col))
+        n_chunk += 1
+        n_total += 1
+        if n_chunk >= chunk_size:
+            yield raw
+            raw = {col: [] for col in columns} if fixed else {}
+            n_chunk = 0
+        if max_rows and n_total >= max_rows:
+            break
+    if n_chunk:
+        yield raw
+
+
+# -----------------------
+# Parallel ingest
+# -----------------------
+# Dump files are a flat run of self-contained <row .../> elements and '<'
+# never appears unescaped inside attribute values, so any "<row" byte
+# sequence starts a row. The file is cut into ranges aligned to those
+# boundaries and each range is parsed on its own in a worker process.
+ROW_START = re.compile(rb"<row[\s/>]")
+MIN_RANGE_BYTES = 1 << 20
+MAX_RANGE_BYTES = 64 << 20
+SCAN_BLOCK = 1 << 16
+
+
+def next_row_start(f, offset, limit):
+    """Return the offset of the first "<row" at or after `offset` (or `limit`)."""
+    f.seek(offset)
+    pos = offset
+    carry = b""
+    while pos < limit:
+        block = f.read(SCAN_BLOCK)
+        if not block:
+            break
+        data = carry + block
+        m = ROW_START.search(data)
+        if m:
+            return min(pos - len(carry) + m.start(), limit)
+        carry = data[-5:]
+        pos += len(block)
+    return limit
+
+
+def row_byte_ranges(path, workers):
+    """Split a dump file into byte ranges that each start on a <row boundary."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        first = next_row_start(f, 0, size)
+        # Rows end before the closing root tag (</posts>, </comments>)
+        f.seek(max(first, size - SCAN_BLOCK))
+        tail = f.read()
+        close = tail.rfind(b"</")
+        end = size - len(tail) + close if close >= 0 else size
+        if first >= end:
+            return []
+        range_bytes = min(max((end - first) // (workers * 4), MIN_RANGE_BYTES), MAX_RANGE_BYTES)
+        cuts = [first]
+        for nominal in range(first + range_bytes, end, range_bytes):
+            cut = next_row_start(f, max(nominal, cuts[-1] + 1), end)
+            if cut < end:
+                cuts.append(cut)
+        cuts.append(end)
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def parse_byte_range(path, start, stop, columns, schema):
+    """Worker: parse the rows in path[start:stop] into one typed DataFrame."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    source = io.BytesIO(b"<rows>" + data + b"</rows>")
+    raw = next(iter_raw_chunks_from(source, columns, float("inf"), None), None)
+    if raw is None:
+        return pd.DataFrame({col: [] for col in (columns or [])})
+    return rows_to_frame(raw, schema)
+
+
+def iter_chunks_parallel(path, columns, schema, workers):
+    """Yield one typed DataFrame per byte range, in file order, from a process pool."""
+    ranges = row_byte_ranges(path, workers)
+    in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for start, stop in ranges:
+            futures.append(pool.submit(parse_byte_range, path, start, stop, columns, schema))
+            if len(futures) >= in_flight:
+                yield futures.pop(0).result()
+        for future in futures:
+            yield future.result()
+
+
+def use_parallel(path, workers):
+    # Compressed members cannot be seeked into, so archives are parsed serially
+    return workers and workers > 1 and not path.lower().endswith(".zip")
+
+
+# -----------------------
+# Columnar cache
+# -----------------------
+def cached_source(path, columns, schema, workers=None):
+    """Return (manifest, columns) when the columnar cache can serve this read, else None.
+
+    Columns the cache does not hold yet are parsed and added on first use
+    (only those: a projected read never parses the others); if the cache
+    cannot be written (read-only data directory, disabled via
+    IR_DUMP_CACHE=0) the XML is parsed as before.
+    """
+    import dump_cache
+
+    if not dump_cache.CACHE_ENABLED:
+        return None
+    if columns is not None and any(col not in schema for col in columns):
+        return None
+    needed = list(schema) if columns is None else list(columns)
+    manifest = dump_cache.fresh_manifest(path)
+    if manifest is None or any(col not in manifest["columns"] for col in needed):
+        try:
+            manifest = dump_cache.build_cache(path, schema, needed, workers=workers)
+        except OSError as e:
+            logger.warning("could not write dump cache for %s: %s", path, e)
+            return None
+    resolved = dump_cache.cached_columns(manifest, columns)
+    if resolved is None:
+        return None
+    return manifest, resolved
+
+
+def iter_chunks(path, columns=None, chunk_size=DEFAULT_CHUNK_SIZE, max_rows=None, schema=None,
+                use_cache=True, workers=None):
+    """Stream a dump file as typed DataFrame chunks.
+
+    `columns` restricts parsing to the listed attributes (missing attributes
+    become nulls); with None every attribute seen in a chunk is kept. With
+    `workers` > 1 chunks are whole byte ranges parsed in parallel (file order).
+    """
+    path = resolve_dump_path(path)
+    schema = schema or schema_for(path)
+    workers = DEFAULT_WORKERS if workers is None else workers
+    cached = cached_source(path, columns, schema, workers) if use_cache else None
+    if cached is not None:
+        import dump_cache
+
+        manifest, columns = cached
+        yield from dump_cache.iter_cached_chunks(path, manifest, columns, chunk_size, max_rows)
+        return
+    if use_parallel(path, workers) and not max_rows:
+        yield from iter_chunks_parallel(path, columns, schema, workers)
+        return
+    for raw in iter_raw_chunks(path, columns, chunk_size, max_rows):
+        yield rows_to_frame(raw, schema)
+
+
+def read_table(path, columns=None, max_rows=None, chunk_size=DEFAULT_CHUNK_SIZE, schema=None,
+               use_cache=True, workers=None):
+    """Read a whole dump file into one typed DataFrame."""
+    path = resolve_dump_path(path)
+    schema = schema or schema_for(path)
+    workers = DEFAULT_WORKERS if workers is None else workers
+    cached = cached_source(path, columns, schema, workers) if use_cache else None
+    if cached is not None:
+        # Served from the cache in a single slice: no per-chunk concat
+        import dump_cache
+
+        manifest, columns = cached
+        chunk_size = max(manifest["rows"], 1)
+        return next(dump_cache.iter_cached_chunks(path, manifest, columns, chunk_size, max_rows),
+                    pd.DataFrame({col: [] for col in columns}))
+    chunks = list(iter_chunks(path, columns, chunk_size, max_rows, schema, use_cache=False,
+                              workers=workers))
+    if not chunks:
+        return pd.DataFrame({col: [] for col in (columns or [])})
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    # Dumps are written in Id order; only re-sort if a merged file is not
+    if "Id" in df.columns and not df["Id"].is_monotonic_increasing:
+        df = df.sort_values("Id", kind="stable", ignore_index=True)
+    return df
+
+
+def load_posts(file_path, columns=None, max_rows=None, workers=None):
+    """Load Posts.xml rows as a typed DataFrame."""
+    return read_table(file_path, columns, max_rows, schema=POSTS_SCHEMA, workers=workers)
+
+
+def load_comments(file_path, columns=None, max_rows=None, workers=None):
+    """Load Comments.xml rows as a typed DataFrame."""
+    return read_table(file_path, columns, max_rows, schema=COMMENTS_SCHEMA, workers=workers)
@@ -0,0 +1,241 @@
+# fielded_index.py
+# Multi-field index: separate postings and lengths per field, BM25F ranking.
+#
+#   python src/fielded_index.py build data/Posts.xml
+#   python src/fielded_index.py search data/Posts.xml "title:sekiro boss tags:dark-souls"
+#
+#   index = open_fielded_index(posts_path)    # builds on first use
+#   index.search("title:sekiro boss", k=10)   # -> (post Ids, BM25F scores)
+#   index.field("Tags").docs("dark-souls")    # one field's InvertedIndex
+#
+# Title and Body are analyzed text; Tags is a keyword field (one exact term
+# per tag, see KeywordAnalyzer). Every field has its own IndexBuilder, all fed
+# from the same single pass over the dump, so the fields share internal
+# docIDs and each field's doc_lengths are its field lengths. On disk the
+# index is a directory with meta.json and one saved index (index_store
+# format) per field:
+#   <dump dir>/.cache/<file>.fields-title-body-tags/{title,body,tags}/
+# A query word like "title:sekiro" only matches that field; a plain word
+# matches every field, each analyzed with the field's own analyzer.
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+import dump_cache
+import dump_reader
+import index_store
+from analyzer import default_analyzer, keyword_analyzer
+from inverted_index import EMPTY_POSTINGS, IndexBuilder
+
+FIELDS = ("Title", "Body", "Tags")
+KEYWORD_FIELDS = {"Tags"}
+# BM25F parameters: per-field weight and length normalization, shared k1
+WEIGHTS = {"Title": 3.0, "Body": 1.0, "Tags": 2.0}
+FIELD_B = {"Title": 0.5, "Body": 0.75, "Tags": 0.0}
+K1 = 1.2
+# Sentence punctuation around a query word, stripped before keyword analysis
+# ("Sekiro?" -> sekiro); inner characters stay, so c++ and node.js still match
+KEYWORD_STRIP = "?!,;:\"'()[]{}<>"
+
+
+def fielded_index_dir_for(path, fields=FIELDS):
+    return dump_cache.cache_dir_for(path) + ".fields-" + "-".join(f.lower() for f in fields)
+
+
+def analyzer_for(field, analyzer=default_analyzer):
+    return keyword_analyzer if field in KEYWORD_FIELDS else analyzer
+
+
+def analyzer_configs(fields, analyzer=default_analyzer):
+    return {field: analyzer_for(field, analyzer).config for field in fields}
+
+
+# -----------------------
+# Build
+# -----------------------
+def build_fielded_index(path, index_dir=None, fields=FIELDS, analyzer=default_analyzer, positions=False):
+    """Index every field of a dump in one pass and save it; returns the meta."""
+    path = dump_reader.resolve_dump_path(path)
+    index_dir = index_dir or fielded_index_dir_for(path, fields)
+    source = dump_cache.source_fingerprint(path)
+    report = index_store.BuildReport()
+    builders = {field: IndexBuilder(analyzer_for(field, analyzer), positions) for field in fields}
+    for chunk in report.timed("parse", dump_reader.iter_chunks(path, ["Id"] + list(fields))):
+        for field, builder in builders.items():
+            index_store.add_chunk(builder, chunk, (field,), report)
+
+    with dump_cache.building(index_dir) as tmp_dir:
+        for field in fields:
+            with report.stage("finalize"):
+                index = builders.pop(field).build()
+            with report.stage("write"):
+                index_store.save_index(index, os.path.join(tmp_dir, field.lower()), source, (field,))
+                del index
+        meta = {
+            "version": index_store.INDEX_VERSION,
+            "source": source,
+            "fields": list(fields),
+            "analyzers": analyzer_configs(fields, analyzer),
+            "positions": positions,
+            "build": report.as_dict(),
+        }
+        with open(os.path.join(tmp_dir, index_store.META), "w") as f:
+            json.dump(meta, f, indent=1)
+    return meta
+
+
+# -----------------------
+# Query
+# -----------------------
+class FieldedIndex:
+    """One InvertedIndex per field over shared docIDs, ranked with BM25F."""
+
+    def __init__(self, fields, weights=None, field_b=None, k1=K1):
+        self.fields = fields  # name -> InvertedIndex
+        self.weights = {**WEIGHTS, **(weights or {})}
+        self.field_b = {**FIELD_B, **(field_b or {})}
+        self.k1 = k1
+        first = next(iter(fields.values()))
+        self.doc_ids = first.doc_ids
+        self.top_k = first.top_k
+        self.avg_lengths = {name: float(np.mean(index.doc_lengths)) if index.n_docs else 0.0
+                            for name, index in fields.items()}
+
+    @property
+    def n_docs(self):
+        return len(self.doc_ids)
+
+    def field(self, name):
+        for field, index in self.fields.items():
+            if field.lower() == name.lower():
+                return index
+        raise KeyError(f"unknown field {name!r}; have {list(self.fields)}")
+
+    def post_ids(self, docids):
+        return self.doc_ids[docids]
+
+    def parse(self, query):
+        """Query words -> clauses, one {field: term} dict per analyzed term; 'field:word' restricts to one field.
+
+        A plain word the text analyzer drops (a stopword, a number) is
+        dropped from the keyword fields too.
+        """
+        text_fields = [f for f in self.fields if f not in KEYWORD_FIELDS]
+        clauses = []
+        for word in query.split():
+            name, sep, rest = word.partition(":")
+            if sep and name.lower() in (f.lower() for f in self.fields):
+                fields = [f for f in self.fields if f.lower() == name.lower()]
+                word = rest
+            else:
+                fields = list(self.fields)
+                if text_fields and not self.fields[text_fields[0]].analyzer.analyze(word):
+                    continue
+            terms = {f: self.fields[f].analyzer.analyze(word.strip(KEYWORD_STRIP).rstrip(".")
+                                                        if f in KEYWORD_FIELDS else word)
+                     for f in fields}
+            # One query word can analyze to several terms ("half-life" -> "halflife" in text fields)
+            for i in range(max(map(len, terms.values()), default=0)):
+                clauses.append({f: t[i] for f, t in terms.items() if i < len(t)})
+        return clauses
+
+    def field_tf(self, clause):
+        """(docids, weighted length-normalized tf summed over the clause's fields)."""
+        docids, tfs = [], []
+        for field, term in clause.items():
+            index = self.fields[field]
+            d, f = index.postings(term)
+            if not len(d):
+                continue
+            b = self.field_b[field]
+            norm = 1 - b + b * np.asarray(index.doc_lengths)[d] / max(self.avg_lengths[field], 1e-9)
+            docids.append(d)
+            tfs.append(self.weights[field] * f / norm)
+        if not docids:
+            return EMPTY_POSTINGS[0], np.zeros(0)
+        docs, inverse = np.unique(np.concatenate(docids), return_inverse=True)
+        return docs, np.bincount(inverse, weights=np.concatenate(tfs), minlength=len(docs))
+
+    def bm25f_scores(self, query):
+        """(docids, scores) for every doc matching any query word."""
+        docids, scores = [], []
+        for clause in self.parse(query):
+            docs, tf = self.field_tf(clause)
+            if not len(docs):
+                continue
+            idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            docids.append(docs)
+            scores.append(idf * tf / (self.k1 + tf))
+        if not docids:
+            return EMPTY_POSTINGS[0], np.zeros(0)
+        docs, inverse = np.unique(np.concatenate(docids), return_inverse=True)
+        return docs, np.bincount(inverse, weights=np.concatenate(scores), minlength=len(docs))
+
+    def search(self, query, k=10):
+        """Best `k` post Ids for a query, with their BM25F scores."""
+        return self.top_k(*self.bm25f_scores(query), k)
+
+    def stats(self):
+        return {field: index.stats() for field, index in self.fields.items()}
+
+
+def load_fielded_index(index_dir, analyzer=default_analyzer, **params):
+    with open(os.path.join(index_dir, index_store.META)) as f:
+        meta = json.load(f)
+    fields = {field: index_store.load_index(os.path.join(index_dir, field.lower()), analyzer_for(field, analyzer))
+              for field in meta["fields"]}
+    index = FieldedIndex(fields, **params)
+    index.meta = meta
+    return index
+
+
+def open_fielded_index(path, index_dir=None, fields=FIELDS, analyzer=default_analyzer, positions=False, **params):
+    """Open the fielded index of a dump, (re)building it if missing or stale."""
+    path = dump_reader.resolve_dump_path(path)
+    index_dir = index_dir or fielded_index_dir_for(path, fields)
+    fresh = dump_cache.fresh_meta(path, os.path.join(index_dir, index_store.META), {
+        "version": index_store.INDEX_VERSION,
+        "fields": list(fields),
+        "analyzers": analyzer_configs(fields, analyzer),
+        "positions": lambda stored: stored or not positions,
+    })
+    if fresh is None:
+        build_fielded_index(path, index_dir, fields, analyzer, positions)
+    return load_fielded_index(index_dir, analyzer, **params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the multi-field (BM25F) index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index a dump file")
+    build.add_argument("dump", help="Posts.xml (or .zip)")
+    build.add_argument("--fields", nargs="+", default=list(FIELDS))
+    build.add_argument("--positions", action="store_true", help="store positions for phrase/NEAR queries")
+    search = commands.add_parser("search", help="BM25F top-k for a query")
+    search.add_argument("dump")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    path = dump_reader.resolve_dump_path(args.dump)
+    if args.command == "build":
+        start = time.time()
+        meta = build_fielded_index(path, fields=args.fields, positions=args.positions)
+        print(f"{path}: fields {', '.join(meta['fields'])} in {time.time() - start:.2f}s "
+              f"-> {fielded_index_dir_for(path, args.fields)}")
+        print(index_store.format_build(meta))
+    else:
+        index = open_fielded_index(path)
+        start = time.perf_counter()
+        post_ids, scores = index.search(args.query, args.k)
+        print(f"{len(post_ids)} results in {(time.perf_counter() - start) * 1e3:.1f} ms")
+        for pid, score in zip(post_ids.tolist(), scores.tolist()):
+            print(f"{pid}\t{score:.3f}")
+
+
+if __name__ == "__main__":
+    main()
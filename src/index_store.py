@@ -0,0 +1,411 @@
+# index_store.py
+# Versioned on-disk inverted index, opened with mmap for instant startup.
+#
+#   python src/index_store.py build data/Posts.xml             # Title + Body
+#   python src/index_store.py build data/Posts.xml --fields Body
+#   python src/index_store.py build data/Posts.xml --memory-budget 512M  # spimi.py
+#   python src/index_store.py build data/Posts.xml --workers 8            # sharded_build.py
+#   python src/index_store.py build data/Posts.xml --positions            # phrase / NEAR
+#
+#   index = open_index(posts_path)          # builds on first use
+#   index.postings("sekiro")                # same API as InvertedIndex
+#
+# An index directory holds one flat file per array plus meta.json:
+#   terms.blob / terms.blocks        front-coded TermDictionary
+#   postings.bin / postings.offsets  compressed posting lists (postings.py)
+#   postings.df                      postings per term
+#   postings.skips                   last docID + byte offsets per 128 postings (skip_to)
+#   docs.ids / docs.lengths          internal docID -> post Id, doc length
+#   positions.bin / positions.blocks in-document positions (only with --positions)
+#   docs.norms / postings.bounds     BM25 doc-length norms and per-term bounds (bm25.py)
+#   bitmaps.bin / .terms / .offsets  roaring bitmaps of the most frequent terms (roaring.py)
+# Every file is memory-mapped read-only, so opening costs a few page faults
+# rather than a rebuild, and concurrent query processes share the page cache.
+# The index lives next to the dump cache (<dump dir>/.cache/<file>.index-<fields>)
+# and is rebuilt when the dump, the format version or the analyzer changes.
+import argparse
+import json
+import mmap
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+import dump_cache
+import dump_reader
+from analyzer import default_analyzer
+from bm25 import B as BM25_B, K1 as BM25_K1, doc_norms, term_bounds
+from html_text import html_to_text_many
+from inverted_index import IndexBuilder, InvertedIndex
+from postings import PositionsStore, PostingsStore, build_skips
+from roaring import BitmapStore, build_bitmaps
+from term_dictionary import TermDictionary
+
+INDEX_VERSION = 1
+META = "meta.json"
+DEFAULT_FIELDS = ("Title", "Body")
+
+# file name -> dtype
+ARRAYS = {
+    "terms.blocks": np.int64,
+    "postings.bin": np.uint8,
+    "postings.offsets": np.int64,
+    "postings.df": np.int64,
+    "docs.ids": np.int64,
+    "docs.lengths": np.int32,
+}
+# Only in indexes built with positions
+POSITION_ARRAYS = {
+    "positions.bin": np.uint8,
+    "positions.blocks": np.int64,
+}
+# Precomputed for BM25 (not in spimi / shard runs)
+BM25_ARRAYS = {
+    "docs.norms": np.float32,
+    "postings.bounds": np.float64,
+}
+# Skip entries (indexes saved before they existed still load, without skipping)
+SKIP_ARRAYS = {
+    "postings.skips": np.int64,
+}
+# Bitmaps of the frequent terms (older indexes build them from postings on use)
+BITMAP_ARRAYS = {
+    "bitmaps.bin": np.uint8,
+    "bitmaps.terms": np.int64,
+    "bitmaps.offsets": np.int64,
+}
+
+
+def index_dir_for(path, fields=DEFAULT_FIELDS):
+    return dump_cache.cache_dir_for(path) + ".index-" + "-".join(f.lower() for f in fields)
+
+
+def document_texts(chunk, fields):
+    """Indexed text of every row of a chunk: the fields joined by spaces, HTML stripped."""
+    columns = []
+    for field in fields:
+        values = chunk[field].tolist()
+        columns.append(html_to_text_many(values) if field == "Body"
+                       else [v if isinstance(v, str) else "" for v in values])
+    return [" ".join(parts) for parts in zip(*columns)]
+
+
+# -----------------------
+# Build report
+# -----------------------
+class BuildReport:
+    """Wall time and peak RSS per build stage; stages may be entered many times.
+
+    A stage's peak is the RSS high-water mark over the stage alone: the
+    kernel's mark (VmHWM) is reset as the stage starts, so a temporary array
+    freed before the stage ends still counts, and earlier stages' peaks do
+    not. Where it cannot be reset the process peak so far is reported.
+    """
+
+    def __init__(self):
+        self.stages = {}  # name -> {"seconds", "peak_rss_mb"}
+        self.open_peaks = []  # peak so far of each enclosing stage, innermost last
+
+    @contextmanager
+    def stage(self, name):
+        if self.open_peaks:
+            # The enclosing stage keeps the mark reached before this one starts
+            self.open_peaks[-1] = max(self.open_peaks[-1], peak_rss_mb())
+        reset_peak_rss()
+        self.open_peaks.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            peak = max(self.open_peaks.pop(), peak_rss_mb())
+            if self.open_peaks:
+                self.open_peaks[-1] = max(self.open_peaks[-1], peak)
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "peak_rss_mb": 0.0})
+            entry["seconds"] += time.perf_counter() - start
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], peak)
+
+    def timed(self, name, iterable):
+        """Iterate `iterable`, charging the time spent producing items to stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, None)
+            if item is None:
+                return
+            yield item
+
+    def add(self, stages):
+        """Fold in another report's as_dict() (e.g. from a worker process)."""
+        for name, e in stages.items():
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "peak_rss_mb": 0.0})
+            entry["seconds"] += e["seconds"]
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], e["peak_rss_mb"])
+
+    def as_dict(self):
+        return {name: {"seconds": round(e["seconds"], 3), "peak_rss_mb": round(e["peak_rss_mb"], 1)}
+                for name, e in self.stages.items()}
+
+
+def format_build(meta):
+    """Per-stage build report of a saved index's meta, one line per stage."""
+    stages = meta.get("build") or {}
+    return "\n".join(f"  {name:<10} {e['seconds']:8.2f}s  peak RSS {e.get('peak_rss_mb', 0.0):8.1f} MB"
+                     for name, e in stages.items())
+
+
+def reset_peak_rss():
+    """Restart the RSS high-water mark from the current RSS (Linux); False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """RSS high-water mark since the last reset_peak_rss (VmHWM), else the process peak (ru_maxrss)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024  # kB
+    except (OSError, ValueError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in KiB on Linux and the BSDs
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+# -----------------------
+# Write
+# -----------------------
+def save_index(index, index_dir, source=None, fields=DEFAULT_FIELDS, bm25=True, plain=False, report=None,
+               **extra):
+    """Write an InvertedIndex to `index_dir` (atomically replacing any old one).
+
+    With `bm25`, the BM25 doc norms and term bounds are computed and saved too.
+    A `plain` index has its postings (and positions) only, no skip entries,
+    bitmaps or BM25 arrays: enough for a run that is only read back to merge.
+    With a BuildReport, the time spent here is its "write" stage, and the
+    report and any `extra` fields go into the meta before the index is
+    published, so a published index is never rewritten.
+    """
+    with dump_cache.building(index_dir) as tmp_dir:
+        with report.stage("write") if report is not None else nullcontext():
+            meta = write_index_files(index, tmp_dir, source, fields, bm25, plain)
+        meta["build"] = report.as_dict() if report is not None else None
+        meta.update(extra)
+        with open(os.path.join(tmp_dir, META), "w") as f:
+            json.dump(meta, f, indent=1)
+    return meta
+
+
+def write_index_files(index, out_dir, source, fields, bm25, plain):
+    """The array files of save_index, written to `out_dir`; returns the meta."""
+    terms, store = index.terms, index.postings_store
+    arrays = {
+        "terms.blocks": terms.block_offsets,
+        "postings.bin": store.data,
+        "postings.offsets": store.offsets,
+        "postings.df": store.doc_freqs,
+        "docs.ids": index.doc_ids,
+        "docs.lengths": index.doc_lengths,
+    }
+    names = dict(ARRAYS)
+    if not plain:
+        arrays["postings.skips"] = (store.skips if store.skips is not None else build_skips(store)).ravel()
+        tids, offsets, data = build_bitmaps(store, index.n_docs)
+        arrays.update({"bitmaps.bin": data, "bitmaps.terms": tids, "bitmaps.offsets": offsets})
+        names.update({**SKIP_ARRAYS, **BITMAP_ARRAYS})
+    if index.positions is not None:
+        arrays["positions.bin"] = index.positions.data
+        arrays["positions.blocks"] = index.positions.blocks
+        names.update(POSITION_ARRAYS)
+    if bm25 and not plain:
+        arrays["docs.norms"] = doc_norms(index.doc_lengths)
+        arrays["postings.bounds"] = term_bounds(store, arrays["docs.norms"])
+        names.update(BM25_ARRAYS)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "source": source,
+        "fields": list(fields),
+        "analyzer": index.analyzer.config,
+        "terms": len(terms),
+        "docs": index.n_docs,
+        "postings": store.n_postings,
+        "positions": index.positions is not None,
+        "skips": not plain,
+        "bitmaps": not plain,
+        "bm25": {"k1": BM25_K1, "b": BM25_B} if bm25 and not plain else None,
+        "counts": {name: int(len(arrays[name])) for name in names},
+    }
+    with open(os.path.join(out_dir, "terms.blob"), "wb") as f:
+        f.write(terms.blob)
+    for name, dtype in names.items():
+        np.asarray(arrays[name], dtype=dtype).tofile(os.path.join(out_dir, name))
+    return meta
+
+
+def add_chunk(builder, chunk, fields, report):
+    """Extract, analyze and invert one chunk of rows into `builder`."""
+    with report.stage("extract"):
+        texts = document_texts(chunk, fields)
+    with report.stage("analyze"):
+        term_ids = list(builder.analyzer.analyze_many(texts, builder.vocabulary))
+    with report.stage("invert"):
+        builder.add_batch(chunk["Id"].tolist(), term_ids)
+
+
+def build_index(path, index_dir=None, fields=DEFAULT_FIELDS, analyzer=default_analyzer,
+                memory_budget=None, workers=None, positions=False):
+    """Index a dump file in one pass and save it; returns the index meta.
+
+    Each chunk of rows is parsed, HTML-stripped and analyzed once straight
+    into term ids; IndexBuilder.add_batch counts the frequencies of the
+    whole chunk with numpy, so neither pandas rows nor token lists are kept.
+    With `memory_budget` (bytes) the build spills sorted runs to disk and
+    merges them instead of holding the whole index in memory (see spimi.py).
+    With `workers` > 1 document shards are inverted in parallel processes
+    (see sharded_build.py); the result is byte-identical either way.
+    `positions` also stores in-document positions for phrase/NEAR queries.
+    """
+    path = dump_reader.resolve_dump_path(path)
+    index_dir = index_dir or index_dir_for(path, fields)
+    report = BuildReport()
+    if memory_budget and workers and workers > 1:
+        raise ValueError("memory_budget and workers cannot be combined")
+    if memory_budget:
+        import spimi
+
+        return spimi.build_index_spimi(path, index_dir, memory_budget, fields, analyzer, report,
+                                       positions=positions)
+    if workers and workers > 1:
+        import sharded_build
+
+        return sharded_build.build_index_sharded(path, index_dir, workers, fields, analyzer, report,
+                                                 positions=positions)
+    source = dump_cache.source_fingerprint(path)
+    builder = IndexBuilder(analyzer, positions)
+    for chunk in report.timed("parse", dump_reader.iter_chunks(path, ["Id"] + list(fields))):
+        add_chunk(builder, chunk, fields, report)
+    with report.stage("finalize"):
+        index = builder.build()
+        del builder
+    return save_index(index, index_dir, source, fields, report=report)
+
+
+# -----------------------
+# Read
+# -----------------------
+def map_array(path, dtype, count):
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def load_index(index_dir, analyzer=default_analyzer):
+    """Open a saved index; every array is a read-only memory map."""
+    with open(os.path.join(index_dir, META)) as f:
+        meta = json.load(f)
+    if meta.get("version") != INDEX_VERSION:
+        raise ValueError(f"{index_dir}: index version {meta.get('version')}, expected {INDEX_VERSION}")
+    arrays = {name: map_array(os.path.join(index_dir, name), dtype, meta["counts"][name])
+              for name, dtype in ARRAYS.items()}
+    blob_path = os.path.join(index_dir, "terms.blob")
+    blob = b""
+    if os.path.getsize(blob_path):
+        with open(blob_path, "rb") as f:
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    terms = TermDictionary(blob, arrays["terms.blocks"], meta["terms"])
+    skips = None
+    if meta.get("skips"):
+        skips = map_array(os.path.join(index_dir, "postings.skips"), np.int64,
+                          meta["counts"]["postings.skips"]).reshape(-1, 3)
+    postings = PostingsStore(arrays["postings.bin"], arrays["postings.offsets"], arrays["postings.df"], skips)
+    positions = None
+    if meta.get("positions"):
+        data, blocks = (map_array(os.path.join(index_dir, name), dtype, meta["counts"][name])
+                        for name, dtype in POSITION_ARRAYS.items())
+        positions = PositionsStore(data, blocks, arrays["postings.df"])
+    index = InvertedIndex(terms, postings, arrays["docs.ids"], arrays["docs.lengths"], analyzer, positions)
+    if meta.get("bm25"):
+        norms, bounds = (map_array(os.path.join(index_dir, name), dtype, meta["counts"][name])
+                         for name, dtype in BM25_ARRAYS.items())
+        index.bm25 = {"params": meta["bm25"], "norms": norms, "bounds": bounds}
+    if meta.get("bitmaps"):
+        data, tids, offsets = (map_array(os.path.join(index_dir, name), dtype, meta["counts"][name])
+                               for name, dtype in BITMAP_ARRAYS.items())
+        index.bitmaps = BitmapStore(tids, offsets, data)
+    index.meta = meta
+    return index
+
+
+def open_index(path, index_dir=None, fields=DEFAULT_FIELDS, analyzer=default_analyzer, workers=None,
+               positions=False):
+    """Open the saved index of a dump file, (re)building it (with `workers`) if missing or stale.
+
+    An index saved with positions also serves callers that do not need them.
+    """
+    path = dump_reader.resolve_dump_path(path)
+    index_dir = index_dir or index_dir_for(path, fields)
+    fresh = dump_cache.fresh_meta(path, os.path.join(index_dir, META), {
+        "version": INDEX_VERSION,
+        "fields": list(fields),
+        "analyzer": analyzer.config,
+        "positions": lambda stored: stored or not positions,
+    })
+    if fresh is None:
+        build_index(path, index_dir, fields, analyzer, workers=workers, positions=positions)
+    return load_index(index_dir, analyzer)
+
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text):
+    """'512M' / '2G' / '1048576' -> bytes."""
+    text = str(text).strip().upper().removesuffix("B")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the on-disk inverted index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index a dump file")
+    build.add_argument("dump", nargs="+", help="Posts.xml (or .zip)")
+    build.add_argument("--fields", nargs="+", default=list(DEFAULT_FIELDS))
+    build.add_argument("--out", help="index directory (default: next to the dump cache)")
+    build.add_argument("--memory-budget", type=parse_size,
+                       help="spill sorted runs to disk above this much build state, e.g. 512M")
+    build.add_argument("--workers", type=int, default=1, help="build document shards in N processes")
+    build.add_argument("--positions", action="store_true", help="store positions for phrase/NEAR queries")
+    info = commands.add_parser("info", help="print the meta of a built index")
+    info.add_argument("dump")
+    info.add_argument("--fields", nargs="+", default=list(DEFAULT_FIELDS))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        for dump_path in args.dump:
+            dump_path = dump_reader.resolve_dump_path(dump_path)
+            index_dir = args.out or index_dir_for(dump_path, args.fields)
+            start = time.time()
+            meta = build_index(dump_path, index_dir, args.fields, memory_budget=args.memory_budget,
+                               workers=args.workers, positions=args.positions)
+            print(f"{dump_path}: {meta['docs']} docs, {meta['terms']} terms, "
+                  f"{meta['postings']} postings in {time.time() - start:.2f}s -> {index_dir}"
+                  + (f" ({meta['runs']} runs merged)" if "runs" in meta else ""))
+            print(format_build(meta))
+    else:
+        index_dir = index_dir_for(dump_reader.resolve_dump_path(args.dump), args.fields)
+        with open(os.path.join(index_dir, META)) as f:
+            print(json.dumps(json.load(f), indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+# inverted_index.py
+# Inverted index keyed by integer term ids from a front-coded TermDictionary,
+# with compressed array-backed posting lists (see postings.py).
+#
+#   builder = IndexBuilder()
+#   for post_id, text in posts:
+#       builder.add_document(post_id, text)
+#   index = builder.build()
+#   docids, freqs = index.postings("sekiro")   # internal docIDs, sorted
+#   index.post_ids(docids)                     # -> Stack Exchange post Ids
+#
+#   builder = IndexBuilder(positions=True)     # also keep in-document positions
+#   index.phrase(["elden", "ring"])            # docIDs with the exact phrase
+#   index.near(["moonlight", "butterfly"], 3)  # within 3 terms, either order
+#
+#   index.cache_postings(64 << 20)             # keep hot terms' decoded postings (LRU)
+#
+# Internal docIDs are dense (0..N-1, in the order documents were added);
+# doc_ids maps them back to post Ids.
+from array import array
+
+import numpy as np
+
+from analyzer import default_analyzer
+from lru_cache import LRUCache
+from postings import PositionsStore, PostingsStore, decode_flat, encode_positions, term_batches
+from roaring import RoaringBitmap
+from term_dictionary import freeze_vocabulary
+
+EMPTY_POSTINGS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+# Above this length ratio, intersections binary-search the short list in the long one
+GALLOP_RATIO = 16
+ITER_BATCH_POSTINGS = 1 << 22
+POSTINGS_CACHE_BYTES = 64 << 20
+
+
+class IndexBuilder:
+    """Accumulates (term, doc, freq) triples in flat arrays under provisional term ids.
+
+    With `positions`, the in-document positions of every posting are kept
+    too (as gaps), for phrase and NEAR queries.
+    """
+
+    def __init__(self, analyzer=default_analyzer, positions=False):
+        self.analyzer = analyzer
+        self.vocabulary = {}        # term -> provisional id (build time only)
+        self.term_ids = array("i")  # one entry per posting
+        self.docids = array("i")
+        self.freqs = array("i")
+        self.doc_ids = array("q")   # internal docID -> post Id
+        self.doc_lengths = array("i")
+        self.position_gaps = array("i") if positions else None  # freqs[i] entries per posting
+
+    def add_document(self, post_id, text=None, tokens=None):
+        """Index one document from raw text, or from already analyzed tokens."""
+        if tokens is None:
+            tokens = self.analyzer.analyze(text)
+        vocabulary = self.vocabulary
+        ids = [vocabulary.setdefault(t, len(vocabulary)) for t in tokens]
+        self.add_batch([post_id], [np.array(ids, dtype=np.int32)])
+
+    def add_batch(self, post_ids, term_id_arrays):
+        """Index many documents given as term-id arrays from analyzer.analyze_many.
+
+        The ids must come from self.vocabulary. Frequencies are counted for
+        the whole batch at once by sorting (docID, term id) keys, so no
+        per-document dict or token list is built.
+        """
+        lengths = np.fromiter((len(a) for a in term_id_arrays), dtype=np.int64,
+                              count=len(term_id_arrays))
+        first = len(self.doc_ids)
+        self.doc_ids.extend(post_ids)
+        self.doc_lengths.extend(lengths.tolist())
+        if not lengths.sum():
+            return
+        tids = np.concatenate(term_id_arrays).astype(np.int64)
+        docs = np.repeat(np.arange(first, first + len(lengths), dtype=np.int64), lengths)
+        # Stable sort: the occurrences of each (doc, term) stay in position order
+        order = np.argsort((docs << 32) | tids, kind="stable")
+        keys = ((docs << 32) | tids)[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        freqs = np.diff(np.r_[starts, len(keys)])
+        keys = keys[starts]
+        self.docids.frombytes((keys >> 32).astype(np.int32).tobytes())
+        self.term_ids.frombytes((keys & 0xFFFFFFFF).astype(np.int32).tobytes())
+        self.freqs.frombytes(freqs.astype(np.int32).tobytes())
+        if self.position_gaps is not None:
+            positions = (np.arange(len(tids)) - np.repeat(np.cumsum(lengths) - lengths, lengths))[order]
+            gaps = np.diff(positions, prepend=0)
+            gaps[starts] = positions[starts]
+            self.position_gaps.frombytes(gaps.astype(np.int32).tobytes())
+
+    def build(self):
+        terms, remap = freeze_vocabulary(self.vocabulary)
+        term_ids = remap[np.frombuffer(self.term_ids, dtype=np.int32)]
+        # Postings were appended in docID order, so a stable sort by term keeps them sorted
+        order = np.argsort(term_ids, kind="stable")
+        counts = np.bincount(term_ids, minlength=len(terms))
+        del term_ids
+        freqs = np.frombuffer(self.freqs, dtype=np.int32)[order]
+        postings = PostingsStore.from_flat(counts, np.frombuffer(self.docids, dtype=np.int32)[order], freqs)
+        positions = None
+        if self.position_gaps is not None:
+            # Move each posting's run of gaps along with the posting
+            all_freqs = np.frombuffer(self.freqs, dtype=np.int32).astype(np.int64)
+            sources = np.cumsum(all_freqs) - all_freqs
+            freqs = freqs.astype(np.int64)
+            within = np.arange(int(freqs.sum())) - np.repeat(np.cumsum(freqs) - freqs, freqs)
+            gaps = np.frombuffer(self.position_gaps, dtype=np.int32)[np.repeat(sources[order], freqs) + within]
+            data, blocks = encode_positions(counts, freqs, gaps)
+            positions = PositionsStore(data, blocks, counts)
+        return InvertedIndex(
+            terms,
+            postings,
+            np.frombuffer(self.doc_ids, dtype=np.int64).copy(),
+            np.frombuffer(self.doc_lengths, dtype=np.int32).copy(),
+            self.analyzer,
+            positions,
+        )
+
+
+def intersect_sorted(a, b):
+    """Intersection of two sorted unique docID arrays.
+
+    Similar sizes: a linear merge (intersect1d). Very different sizes:
+    each element of the short list is binary-searched in the long one
+    (O(short * log long), the galloping case), so the long list is never
+    merged through.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    if len(b) > GALLOP_RATIO * len(a):
+        return a[sorted_member(a, b)]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def sorted_member(values, sorted_array):
+    """Mask of `values` found in `sorted_array` (binary search, no re-sorting)."""
+    if not len(sorted_array):
+        return np.zeros(len(values), dtype=bool)
+    idx = np.minimum(np.searchsorted(sorted_array, values), len(sorted_array) - 1)
+    return sorted_array[idx] == values
+
+
+class InvertedIndex:
+    def __init__(self, terms, postings, doc_ids, doc_lengths, analyzer=default_analyzer, positions=None):
+        self.terms = terms
+        self.postings_store = postings
+        self.doc_ids = doc_ids          # internal docID -> post Id
+        self.doc_lengths = doc_lengths  # internal docID -> number of terms
+        self.analyzer = analyzer
+        self.positions = positions      # PositionsStore, or None if built without positions
+        self.bm25 = None                # saved BM25 norms and bounds, see bm25.py
+        self.bitmaps = None             # roaring.BitmapStore of the frequent terms, if saved
+        self.postings_cache = None      # LRUCache of decoded postings, see cache_postings
+
+    def __len__(self):
+        return len(self.terms)
+
+    @property
+    def n_docs(self):
+        return len(self.doc_ids)
+
+    @property
+    def avg_doc_length(self):
+        """Mean doc length over the indexed docs (BM25's avg_len)."""
+        return float(np.mean(self.doc_lengths)) if len(self.doc_lengths) else 0.0
+
+    @property
+    def generation(self):
+        """Changes whenever the indexed content does (never, for a saved index)."""
+        return 0
+
+    def term_id(self, term):
+        return self.terms.get(term)
+
+    def doc_freq(self, term):
+        tid = self.terms.get(term)
+        return 0 if tid is None else int(self.postings_store.doc_freqs[tid])
+
+    def cache_postings(self, max_bytes=POSTINGS_CACHE_BYTES):
+        """Keep the decoded postings of recently used terms, up to `max_bytes` (LRU)."""
+        self.postings_cache = LRUCache(max_bytes=max_bytes, generation=lambda: self.generation)
+        return self.postings_cache
+
+    def postings(self, term):
+        """(docids, freqs) for a term; empty arrays if the term is unknown."""
+        if self.postings_cache is not None:
+            return self.postings_cache.get(term, lambda: self.read_postings(term))
+        return self.read_postings(term)
+
+    def read_postings(self, term):
+        """postings(term), decoded from the store."""
+        tid = self.terms.get(term)
+        if tid is None:
+            return EMPTY_POSTINGS
+        return self.postings_store.get(tid)
+
+    def iter_postings(self, batch_postings=ITER_BATCH_POSTINGS):
+        """Every posting as flat (term ids, docids, freqs) batches of about `batch_postings`."""
+        store = self.postings_store
+        dfs = np.asarray(store.doc_freqs, dtype=np.int64)
+        for lo, hi in term_batches(dfs, batch_postings):
+            docids, freqs = decode_flat(store.data, store.offsets, dfs, lo, hi)
+            yield np.repeat(np.arange(lo, hi), dfs[lo:hi]), docids, freqs
+
+    def cursor(self, term):
+        """Block-by-block cursor over a term's postings (see daat.py); None if the term is unknown."""
+        tid = self.terms.get(term)
+        return None if tid is None else self.postings_store.cursor(tid)
+
+    def docs(self, term):
+        """Sorted internal docIDs containing a term."""
+        return self.postings(term)[0]
+
+    def bitmap(self, term):
+        """RoaringBitmap of the docs containing a term (the saved one for frequent terms)."""
+        tid = self.terms.get(term)
+        if tid is not None and self.bitmaps is not None:
+            saved = self.bitmaps.get(tid)
+            if saved is not None:
+                return saved
+        return RoaringBitmap.from_sorted(self.docs(term))
+
+    def post_ids(self, docids):
+        return self.doc_ids[docids]
+
+    def all_docs(self):
+        """Every internal docID (the universe NOT is taken against)."""
+        return np.arange(self.n_docs, dtype=np.int64)
+
+    # -----------------------
+    # Set operations and TF scoring over internal docIDs
+    # -----------------------
+    def docs_within(self, term, within):
+        """Sorted docIDs among the sorted `within` that contain a term.
+
+        A list much longer than `within` is not decoded: the cursor's skip
+        entries lead straight to the blocks that can hold those docs.
+        """
+        if self.doc_freq(term) > GALLOP_RATIO * len(within):
+            return within[self.cursor(term).seek(within)[0]]
+        return intersect_sorted(within, self.docs(term))
+
+    def intersect(self, terms, within=None):
+        """Sorted docIDs containing every term (rarest lists first), only among `within` if given."""
+        if not terms:
+            return EMPTY_POSTINGS[0] if within is None else within
+        # Cheapest first by document frequency, before decoding anything
+        result = within
+        for term in sorted(set(terms), key=self.doc_freq):
+            result = self.docs(term) if result is None else self.docs_within(term, result)
+            if not len(result):
+                break
+        return result
+
+    def union(self, terms):
+        """Sorted docIDs containing any term (an OR of their bitmaps)."""
+        return RoaringBitmap.union(*(self.bitmap(t) for t in terms)).to_array()
+
+    # -----------------------
+    # Positional queries: positions are only decoded for docs that already
+    # passed the docID intersection
+    # -----------------------
+    def occurrences(self, term, docids):
+        """Flat (i, position) pairs: `term` occurs at `position` in docids[i] (all must contain it)."""
+        if self.positions is None:
+            raise ValueError("index was built without positions; rebuild with positions=True")
+        tid = self.terms.get(term)
+        term_docids, freqs = self.postings_store.get(tid)
+        return self.positions.get(tid, np.searchsorted(term_docids, docids), freqs)
+
+    def phrase(self, terms, within=None):
+        """Sorted docIDs where `terms` occur consecutively (positions count analyzed terms).
+
+        `within` optionally limits the check to those (sorted) docIDs.
+        """
+        candidates = self.intersect(terms, within)
+        if len(terms) < 2 or not len(candidates):
+            return candidates
+        # Shift the i-th term's positions back by i; a phrase start survives every
+        # intersection. Keys come out of occurrences() sorted and unique, and the
+        # fewest occurrences are probed against the rest.
+        term_keys = []
+        for i, term in enumerate(terms):
+            owner, positions = self.occurrences(term, candidates)
+            term_keys.append((owner << 32) | (positions - i + len(terms)))
+        term_keys.sort(key=len)
+        keys = term_keys[0]
+        for other in term_keys[1:]:
+            keys = keys[sorted_member(keys, other)]
+        owners = keys >> 32
+        return candidates[owners[np.r_[True, owners[1:] != owners[:-1]]]] if len(owners) else owners
+
+    def near(self, terms, k, within=None):
+        """Sorted docIDs where each pair of adjacent `terms` occurs within `k` positions (either order)."""
+        candidates = self.intersect(terms, within)
+        if len(terms) < 2 or not len(candidates):
+            return candidates
+        keep = np.ones(len(candidates), dtype=bool)
+        previous = None
+        for term in terms:
+            owner, positions = self.occurrences(term, candidates)
+            keys = (owner << 32) | positions  # sorted
+            if previous is not None:
+                # Nearest occurrence of the previous term on either side, within the same doc
+                idx = np.searchsorted(previous, keys)
+                close = np.zeros(len(keys), dtype=bool)
+                for side in (idx - 1, idx):
+                    ok = (side >= 0) & (side < len(previous))
+                    other = previous[np.clip(side, 0, len(previous) - 1)]
+                    close |= ok & (other >> 32 == keys >> 32) & (np.abs(other - keys) <= k)
+                matched = np.zeros(len(candidates), dtype=bool)
+                matched[keys[close] >> 32] = True
+                keep &= matched
+            previous = keys
+        return candidates[keep]
+
+    def tf_scores(self, terms):
+        """(docids, scores): summed term frequencies; repeated query terms count again."""
+        hits = [self.postings(t) for t in terms]
+        if not hits:
+            return EMPTY_POSTINGS
+        docids = np.concatenate([d for d, _ in hits])
+        freqs = np.concatenate([f for _, f in hits])
+        docs, inverse = np.unique(docids, return_inverse=True)
+        return docs, np.bincount(inverse, weights=freqs, minlength=len(docs)).astype(np.int64)
+
+    def top_k(self, docids, scores, k):
+        """Best `k` docIDs by score (ties broken by docID), as post Ids with scores."""
+        if k <= 0:
+            docids, scores = docids[:0], scores[:0]
+        elif len(docids) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            cutoff = scores[keep].min()
+            # Re-include every doc tied at the cutoff so tie-breaking is deterministic
+            keep = np.flatnonzero(scores >= cutoff)
+            docids, scores = docids[keep], scores[keep]
+        order = np.lexsort((docids, -scores))[:k]
+        return self.post_ids(docids[order]), scores[order]
+
+    def stats(self):
+        """Size report for the postings, for comparison with the old dict/set layout."""
+        store = self.postings_store
+        return {
+            "terms": len(self.terms),
+            "postings": store.n_postings,
+            "postings_bytes": store.nbytes,
+            "bytes_per_posting": store.nbytes / max(store.n_postings, 1),
+            "vocabulary_bytes": self.terms.nbytes,
+            "positions_bytes": self.positions.nbytes if self.positions is not None else 0,
+            "bitmaps_bytes": self.bitmaps.nbytes if self.bitmaps is not None else 0,
+        }
@@ -0,0 +1,116 @@
+# lru_cache.py
+# Bounded least-recently-used cache with hit/miss counters.
+#
+#   cache = LRUCache(max_entries=1024, max_bytes=64 << 20, generation=lambda: index.generation)
+#   docids, freqs = cache.get("sekiro", lambda: index.read_postings("sekiro"))
+#   cache.stats()   # {"entries": ..., "bytes": ..., "hits": ..., "misses": ..., ...}
+#
+# Entries are evicted oldest-use first once there are more than
+# `max_entries` of them or their numpy arrays add up to more than
+# `max_bytes`. With a `generation` callable (InvertedIndex.generation), the
+# whole cache is dropped as soon as the generation it returns changes, so a
+# cached value is never served for an index that has since been updated or
+# merged; a value computed while the generation changed is not stored.
+# Cached arrays are made read-only, since every hit hands out the same ones.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def value_nbytes(value):
+    """Bytes held by the numpy arrays in a value (a tuple or list of them, or one)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(v) for v in value)
+    return 0
+
+
+def freeze(value):
+    """Mark the numpy arrays in a value read-only."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            freeze(v)
+    return value
+
+
+class LRUCache:
+    """Thread-safe LRU map bounded by entries and/or bytes, emptied when `generation()` changes."""
+
+    def __init__(self, max_entries=None, max_bytes=None, generation=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.generation = generation
+        self.seen_generation = generation() if generation is not None else None
+        self.entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def validate(self):
+        """Drop every entry if the generation moved on; returns the current generation."""
+        if self.generation is not None:
+            generation = self.generation()
+            if generation != self.seen_generation:
+                if self.entries:
+                    self.invalidations += 1
+                self.entries.clear()
+                self.nbytes = 0
+                self.seen_generation = generation
+        return self.seen_generation
+
+    def get(self, key, compute):
+        """Cached value of `key`, or compute() stored under it."""
+        with self.lock:
+            generation = self.validate()
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = compute()
+        self.put(key, value, generation)
+        return value
+
+    def put(self, key, value, generation=None):
+        size = value_nbytes(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self.lock:
+            current = self.validate()
+            if generation is not None and current != generation:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self.entries[key] = (freeze(value), size)
+            self.nbytes += size
+            while self.entries and ((self.max_entries is not None and len(self.entries) > self.max_entries)
+                                    or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
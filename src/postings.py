@@ -0,0 +1,482 @@
+# postings.py
+# Compressed posting lists: sorted internal docID arrays with parallel
+# frequency arrays, stored as delta + varint bytes.
+#
+# One posting list is encoded as
+#     [varint docID gaps ...][varint freqs ...]
+# where the first gap is the first docID itself. All lists of an index live
+# in one uint8 buffer addressed by per-term offsets, so the whole postings
+# file can later be memory-mapped as-is.
+#
+# Lists longer than SKIP_BLOCK postings also get skip entries, kept beside
+# the postings (a saved index's postings.skips): for every block of
+# SKIP_BLOCK postings, the block's last docID and the byte offsets of its
+# first gap and first freq within the list. PostingCursor.skip_to / seek
+# binary-search the last docIDs and decode only the blocks that can hold
+# the docIDs asked for, so checking a few docs against a long list never
+# decodes the whole list.
+import numpy as np
+
+MAX_VARINT_BYTES = 5  # enough for any uint32
+POSITION_BLOCK = 128  # postings per positions block (the unit decoded for a candidate)
+CURSOR_BLOCK = 128    # postings decoded per PostingCursor step
+SKIP_BLOCK = 128      # postings per skip entry (the unit skip_to / seek decode)
+
+
+# -----------------------
+# Vectorized varint codec
+# -----------------------
+def varint_lengths(values):
+    """Encoded size in bytes of each value."""
+    v = np.asarray(values)
+    nbytes = np.ones(v.shape, dtype=np.int64)
+    for k in range(1, MAX_VARINT_BYTES):
+        nbytes += v >= (1 << (7 * k))
+    return nbytes
+
+
+def varint_encode(values):
+    """LEB128-encode an array of non-negative ints (< 2**32) into uint8."""
+    v = np.asarray(values, dtype=np.uint64)
+    if v.size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    nbytes = varint_lengths(v)
+    ends = np.cumsum(nbytes)
+    starts = ends - nbytes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+    for k in range(MAX_VARINT_BYTES):
+        has = nbytes > k
+        if not has.any():
+            break
+        byte = (v[has] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[has] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has] + k] = (byte | more).astype(np.uint8)
+    return out
+
+
+def varint_decode(buf):
+    """Decode a uint8 buffer of back-to-back varints into an int64 array."""
+    buf = np.asarray(buf, dtype=np.uint8)
+    if buf.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts + 1
+    if lengths.max() == 1:
+        return buf.astype(np.int64)
+    shifts = np.arange(buf.size, dtype=np.int64) - np.repeat(starts, lengths)
+    parts = (buf & 0x7F).astype(np.int64) << (7 * shifts)
+    return np.add.reduceat(parts, starts)
+
+
+# -----------------------
+# Posting list codec
+# -----------------------
+def encode_postings(docids, freqs):
+    """Encode one sorted posting list as uint8 (gaps, then freqs)."""
+    docids = np.asarray(docids, dtype=np.int64)
+    gaps = np.diff(docids, prepend=0)
+    return np.concatenate([varint_encode(gaps), varint_encode(freqs)])
+
+
+def decode_postings(buf, n):
+    """Inverse of encode_postings for a list of `n` postings -> (docids, freqs)."""
+    values = varint_decode(buf)
+    return np.cumsum(values[:n]), values[n:]
+
+
+class PostingsStore:
+    """All posting lists of an index in one buffer, addressed by term id."""
+
+    def __init__(self, data, offsets, doc_freqs, skips=None):
+        self.data = data            # uint8, possibly a memmap
+        self.offsets = offsets      # int64[n_terms + 1]
+        self.doc_freqs = doc_freqs  # int64[n_terms], postings per term
+        self.skips = skips          # int64[n_blocks, 3], see build_skips; None: no skipping
+        self.skip_base = skip_blocks(doc_freqs) if skips is not None else None
+
+    @classmethod
+    def from_flat(cls, counts, docids, freqs):
+        data, offsets = encode_flat(counts, docids, freqs)
+        return cls(data, offsets, np.asarray(counts, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.doc_freqs)
+
+    def get(self, tid):
+        """(docids, freqs) arrays of one term."""
+        start, stop = self.offsets[tid], self.offsets[tid + 1]
+        return decode_postings(self.data[start:stop], int(self.doc_freqs[tid]))
+
+    def cursor(self, tid):
+        """PostingCursor over one term's list (with its skip entries, if any)."""
+        start, stop = self.offsets[tid], self.offsets[tid + 1]
+        skips = None
+        if self.skips is not None and self.skip_base[tid + 1] > self.skip_base[tid]:
+            skips = np.asarray(self.skips[self.skip_base[tid]:self.skip_base[tid + 1]])
+        return PostingCursor(self.data[start:stop], int(self.doc_freqs[tid]), skips)
+
+    @property
+    def n_postings(self):
+        return int(self.doc_freqs.sum())
+
+    @property
+    def nbytes(self):
+        skips = self.skips.nbytes if self.skips is not None else 0
+        return int(self.data.nbytes + self.offsets.nbytes + self.doc_freqs.nbytes + skips)
+
+
+def encode_flat(counts, docids, freqs):
+    """Encode many posting lists at once.
+
+    `docids`/`freqs` hold all postings sorted by term id, then docID;
+    `counts[t]` is the length of term t's list. Returns (data, offsets) laid
+    out exactly as repeated encode_postings calls would.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    docids = np.asarray(docids, dtype=np.int64)
+    starts = np.cumsum(counts) - counts
+    n = len(docids)
+    term_of = np.repeat(np.arange(len(counts)), counts)
+    prev = np.empty(n, dtype=np.int64)
+    if n:
+        prev[0] = 0
+        prev[1:] = docids[:-1]
+        prev[starts[counts > 0]] = 0
+    # Value slot of posting i of term t: gaps at starts[t] + i, freqs after them
+    pos = np.arange(n, dtype=np.int64) + starts[term_of]
+    values = np.empty(2 * n, dtype=np.int64)
+    values[pos] = docids - prev
+    values[pos + counts[term_of]] = freqs
+    data = varint_encode(values)
+    # Bytes per term = sum of the varint lengths of its 2 * count values
+    value_bytes = varint_lengths(values)
+    term_bytes = np.bincount(np.repeat(np.arange(len(counts)), 2 * counts),
+                             weights=value_bytes, minlength=len(counts)).astype(np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(term_bytes, out=offsets[1:])
+    return data, offsets
+
+
+def decode_flat(data, offsets, doc_freqs, lo, hi):
+    """Inverse of encode_flat for terms lo..hi-1 -> flat (docids, freqs), term by term."""
+    counts = np.asarray(doc_freqs[lo:hi], dtype=np.int64)
+    values = varint_decode(data[offsets[lo]:offsets[hi]])
+    n = int(counts.sum())
+    starts = np.cumsum(counts) - counts                  # first posting of each term
+    term_of = np.repeat(np.arange(len(counts)), counts)
+    pos = np.arange(n, dtype=np.int64) + starts[term_of]  # gap slot, as in encode_flat
+    gaps = values[pos]
+    freqs = values[pos + counts[term_of]]
+    # Per-term prefix sums of the gaps give back the docIDs
+    totals = np.cumsum(gaps)
+    docids = totals - (totals[starts] - gaps[starts])[term_of] if n else gaps
+    return docids, freqs
+
+
+def term_batches(doc_freqs, batch_postings):
+    """(lo, hi) term ranges of about `batch_postings` postings each, for decode_flat."""
+    dfs = np.asarray(doc_freqs, dtype=np.int64)
+    cuts = np.searchsorted(np.cumsum(dfs), np.arange(batch_postings, dfs.sum(), batch_postings))
+    edges = [0] + sorted(set(cuts.tolist()) - {0, len(dfs)}) + [len(dfs)]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def gather(data, starts, lengths):
+    """data[starts[0]:starts[0] + lengths[0]] + ... as one array."""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    index = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+    return data[index]
+
+
+# -----------------------
+# Skip entries
+# -----------------------
+def skip_blocks(doc_freqs):
+    """First skip entry of every term, with the total appended (lists up to SKIP_BLOCK have none)."""
+    dfs = np.asarray(doc_freqs, dtype=np.int64)
+    n_blocks = np.where(dfs > SKIP_BLOCK, (dfs + SKIP_BLOCK - 1) // SKIP_BLOCK, 0)
+    base = np.zeros(len(dfs) + 1, dtype=np.int64)
+    np.cumsum(n_blocks, out=base[1:])
+    return base
+
+
+def build_skips(store, batch_postings=1 << 22):
+    """Skip table of a PostingsStore, decoding it in batches.
+
+    One int64 row (last docID, gap byte, freq byte) per SKIP_BLOCK postings
+    of every list longer than SKIP_BLOCK; byte offsets are relative to the
+    start of the list. Rows are in term order, see skip_blocks.
+    """
+    dfs = np.asarray(store.doc_freqs, dtype=np.int64)
+    tables = [np.zeros((0, 3), dtype=np.int64)]
+    for lo, hi in term_batches(dfs, batch_postings):
+        counts = dfs[lo:hi]
+        if not (counts > SKIP_BLOCK).any():
+            continue
+        buf = np.asarray(store.data[store.offsets[lo]:store.offsets[hi]])
+        value_starts = np.r_[0, np.flatnonzero(buf < 0x80)[:-1] + 1]  # byte of every value slot
+        docids, _ = decode_flat(store.data, store.offsets, dfs, lo, hi)
+        starts = np.cumsum(counts) - counts
+        term_of = np.repeat(np.arange(len(counts)), counts)
+        within = np.arange(len(docids)) - starts[term_of]
+        heads = np.flatnonzero((within % SKIP_BLOCK == 0) & (counts[term_of] > SKIP_BLOCK))
+        tids = term_of[heads]
+        # Value slots as in encode_flat: a term's gaps from 2 * starts[t], then its freqs
+        first_slot = 2 * starts[tids]
+        gap_slot = first_slot + within[heads]
+        list_start = value_starts[first_slot]
+        last = docids[np.minimum(heads + SKIP_BLOCK, starts[tids] + counts[tids]) - 1]
+        tables.append(np.stack([last, value_starts[gap_slot] - list_start,
+                                value_starts[gap_slot + counts[tids]] - list_start], axis=1))
+    return np.concatenate(tables)
+
+
+def decode_skip_blocks(buf, skips, count, blocks):
+    """(docids, freqs) of the given sorted skip blocks of one list, block after block."""
+    blocks = np.asarray(blocks, dtype=np.int64)
+    last, gap_at, freq_at = skips[:, 0], skips[:, 1], skips[:, 2]
+    gap_end = np.append(gap_at[1:], freq_at[0])[blocks]
+    freq_end = np.append(freq_at[1:], len(buf))[blocks]
+    sizes = np.minimum(SKIP_BLOCK, count - blocks * SKIP_BLOCK)
+    gaps = varint_decode(gather(buf, gap_at[blocks], gap_end - gap_at[blocks]))
+    freqs = varint_decode(gather(buf, freq_at[blocks], freq_end - freq_at[blocks]))
+    # Every block's gaps continue from the previous block's last docID
+    prev = np.where(blocks > 0, last[np.maximum(blocks - 1, 0)], 0)
+    return segmented_cumsum(gaps, sizes) + np.repeat(prev, sizes), freqs
+
+
+# -----------------------
+# Cursors: a posting list read CURSOR_BLOCK postings at a time
+# -----------------------
+def skip_varints(buf, n, pos=0, chunk=1 << 16):
+    """Byte offset just past the n-th varint after `pos`, scanning `chunk` bytes at a time."""
+    while n:
+        part = np.asarray(buf[pos:pos + chunk])
+        ends = np.flatnonzero(part < 0x80)
+        if len(ends) >= n:
+            return pos + int(ends[n - 1]) + 1
+        n -= len(ends)
+        pos += len(part)
+    return pos
+
+
+def read_varints(buf, pos, n):
+    """Decode `n` varints starting at byte `pos` -> (values, next pos)."""
+    part = np.asarray(buf[pos:pos + n * MAX_VARINT_BYTES])
+    end = int(np.flatnonzero(part < 0x80)[n - 1]) + 1
+    return varint_decode(part[:end]), pos + end
+
+
+def match_sorted(docids, freqs, targets):
+    """(hit mask over targets, freqs of the hits) for sorted targets looked up in sorted docids."""
+    if not len(docids):
+        return np.zeros(len(targets), dtype=bool), freqs[:0]
+    at = np.minimum(np.searchsorted(docids, targets), len(docids) - 1)
+    hit = docids[at] == targets
+    return hit, freqs[at[hit]]
+
+
+class PostingCursor:
+    """Streams an encoded posting list (see encode_postings) in blocks, in O(block) memory.
+
+    next_block reads the list front to back; skip_to moves forward to a
+    docID, and seek looks up many docIDs at once. With skip entries both
+    decode only the SKIP_BLOCK blocks that can hold the docIDs asked for.
+    """
+
+    def __init__(self, buf, count, skips=None):
+        self.buf = buf      # the list's bytes: count gaps, then count freqs
+        self.count = count
+        self.skips = skips  # this list's rows of the skip table, or None
+        self.read = 0       # postings returned so far
+        self.last = 0       # last docID returned
+        self.gap_pos = 0
+        self.freq_pos = int(skips[0, 2]) if skips is not None else skip_varints(buf, count)
+        self.block = None   # rest of the block skip_to stopped in
+
+    def next_block(self, size=CURSOR_BLOCK):
+        """Next (docids, freqs) block of up to `size` postings, or None at the end."""
+        n = min(size, self.count - self.read)
+        if n <= 0:
+            return None
+        gaps, self.gap_pos = read_varints(self.buf, self.gap_pos, n)
+        freqs, self.freq_pos = read_varints(self.buf, self.freq_pos, n)
+        docids = self.last + np.cumsum(gaps)
+        self.last = int(docids[-1])
+        self.read += n
+        return docids, freqs
+
+    def jump(self, block):
+        """Continue reading at skip block `block`."""
+        self.read = block * SKIP_BLOCK
+        self.last = int(self.skips[block - 1, 0]) if block else 0
+        self.gap_pos, self.freq_pos = int(self.skips[block, 1]), int(self.skips[block, 2])
+
+    def skip_to(self, docid):
+        """Move to the first posting with docID >= docid -> (docid, freq), or None past the end.
+
+        Targets must not decrease between calls; don't mix with next_block.
+        """
+        if self.block is None or self.block[0][-1] < docid:
+            self.block = None
+            if self.skips is not None:
+                block = int(np.searchsorted(self.skips[:, 0], docid))
+                if block == len(self.skips):
+                    self.read = self.count
+                    return None
+                if block * SKIP_BLOCK >= self.read:
+                    self.jump(block)
+            while self.block is None or self.block[0][-1] < docid:
+                self.block = self.next_block(SKIP_BLOCK)
+                if self.block is None:
+                    return None
+        docids, freqs = self.block
+        i = int(np.searchsorted(docids, docid))
+        self.block = docids[i:], freqs[i:]
+        return int(docids[i]), int(freqs[i])
+
+    def seek(self, docids):
+        """(hit mask, freqs of the hits) for sorted `docids`, anywhere in the list.
+
+        Does not move the cursor.
+        """
+        docids = np.asarray(docids, dtype=np.int64)
+        if self.skips is None:
+            return match_sorted(*decode_postings(self.buf, self.count), docids)
+        blocks = np.searchsorted(self.skips[:, 0], docids)
+        blocks = blocks[blocks < len(self.skips)]
+        blocks = blocks[np.r_[True, blocks[1:] != blocks[:-1]]] if len(blocks) else blocks
+        if 2 * len(blocks) > len(self.skips):
+            # Most of the list is needed anyway: one plain decode is cheaper
+            return match_sorted(*decode_postings(self.buf, self.count), docids)
+        return match_sorted(*decode_skip_blocks(self.buf, self.skips, self.count, blocks), docids)
+
+
+class ArrayCursor:
+    """PostingCursor interface over already decoded (docids, freqs)."""
+
+    def __init__(self, docids, freqs):
+        self.docids, self.freqs = docids, freqs
+        self.read = 0
+
+    def next_block(self, size=CURSOR_BLOCK):
+        if self.read >= len(self.docids):
+            return None
+        lo, self.read = self.read, self.read + size
+        return self.docids[lo:self.read], self.freqs[lo:self.read]
+
+    def skip_to(self, docid):
+        self.read += int(np.searchsorted(self.docids[self.read:], docid))
+        if self.read >= len(self.docids):
+            return None
+        return int(self.docids[self.read]), int(self.freqs[self.read])
+
+    def seek(self, docids):
+        return match_sorted(self.docids, self.freqs, np.asarray(docids, dtype=np.int64))
+
+
+# -----------------------
+# Positions
+# -----------------------
+def encode_positions(counts, freqs, gaps):
+    """Encode the positions of many posting lists at once.
+
+    `gaps` holds, posting by posting in the same order as encode_flat's
+    input, the `freqs[i]` positions of posting i as gaps (first one from 0).
+    Returns (data, blocks): varint bytes plus the byte offset of every
+    POSITION_BLOCK-th posting of each term, closed by len(data).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    freqs = np.asarray(freqs, dtype=np.int64)
+    data = varint_encode(gaps)
+    n = len(freqs)
+    posting_bytes = np.bincount(np.repeat(np.arange(n), freqs), weights=varint_lengths(gaps),
+                                minlength=n).astype(np.int64)
+    posting_starts = np.cumsum(posting_bytes) - posting_bytes
+    within = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+    heads = np.flatnonzero(within % POSITION_BLOCK == 0)
+    return data, np.append(posting_starts[heads], len(data))
+
+
+def position_blocks(doc_freqs):
+    """First block number of every term, with the total appended."""
+    n_blocks = (np.asarray(doc_freqs, dtype=np.int64) + POSITION_BLOCK - 1) // POSITION_BLOCK
+    base = np.zeros(len(n_blocks) + 1, dtype=np.int64)
+    np.cumsum(n_blocks, out=base[1:])
+    return base
+
+
+def segmented_cumsum(values, lengths):
+    """Cumulative sums restarting at every segment of `lengths` (gaps -> positions)."""
+    totals = np.cumsum(values)
+    nonempty = lengths > 0
+    firsts = (np.cumsum(lengths) - lengths)[nonempty]
+    return totals - np.repeat(totals[firsts] - values[firsts], lengths[nonempty])
+
+
+class PositionsStore:
+    """Positions of every posting, decoded one POSITION_BLOCK of postings at a time."""
+
+    def __init__(self, data, blocks, doc_freqs):
+        self.data = data      # uint8, possibly a memmap
+        self.blocks = blocks  # int64 byte offsets, see encode_positions
+        self.block_base = position_blocks(doc_freqs)
+
+    def byte_range(self, lo, hi):
+        """Bytes holding the positions of terms lo..hi-1."""
+        return int(self.blocks[self.block_base[lo]]), int(self.blocks[self.block_base[hi]])
+
+    def get(self, tid, indexes, freqs):
+        """Positions of the postings at sorted `indexes` of term `tid`.
+
+        `freqs` are the term's decoded frequencies. Returns flat (owner,
+        positions) where owner[j] is the position in `indexes` of the posting
+        that positions[j] belongs to. Only blocks holding a requested posting
+        are decoded.
+        """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        if not len(indexes):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        needed = np.unique(indexes // POSITION_BLOCK)
+        base = self.block_base[tid]
+        starts = np.asarray(self.blocks[base + needed], dtype=np.int64)
+        lengths = np.asarray(self.blocks[base + needed + 1], dtype=np.int64) - starts
+        # Gather the needed blocks' bytes and postings in one go
+        firsts = needed * POSITION_BLOCK
+        sizes = np.minimum(firsts + POSITION_BLOCK, len(freqs)) - firsts
+        postings = gather(np.arange(len(freqs)), firsts, sizes)
+        posting_freqs = np.asarray(freqs, dtype=np.int64)[postings]
+        values = segmented_cumsum(varint_decode(gather(self.data, starts, lengths)), posting_freqs)
+        wanted = np.zeros(len(postings), dtype=bool)
+        wanted[np.searchsorted(postings, indexes)] = True
+        owner = np.repeat(np.cumsum(wanted) - 1, posting_freqs)
+        wanted = np.repeat(wanted, posting_freqs)
+        return owner[wanted], values[wanted]
+
+    @property
+    def nbytes(self):
+        return int(self.data.nbytes + self.blocks.nbytes)
+
+
+class PostingsWriter:
+    """Appends encoded posting lists in term-id order."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offsets = [0]
+        self.doc_freqs = []
+
+    def add(self, docids, freqs):
+        encoded = encode_postings(docids, freqs)
+        self.chunks.append(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+        self.doc_freqs.append(len(docids))
+
+    def finish(self):
+        data = np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.uint8)
+        return PostingsStore(data, np.array(self.offsets, dtype=np.int64),
+                             np.array(self.doc_freqs, dtype=np.int64))
@@ -1,15 +1,16 @@
 import os
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
 import textstat
 import matplotlib.pyplot as plt
 import seaborn as sns
+from dump_reader import load_posts, resolve_dump_path
+from html_text import html_to_text_many
 
 # -----------------------
 # 0️⃣ Define file path
 # -----------------------
-posts_file = "data/Posts.xml"
+posts_file = resolve_dump_path("data/Posts.xml")  # .zip archives are read directly
 
 # Check if file exists
 if not os.path.exists(posts_file):
@@ -18,15 +19,13 @@ if not os.path.exists(posts_file):
 # -----------------------
 # 1️⃣ Load Posts.xml
 # -----------------------
-df = pd.read_xml(posts_file, parser="lxml")
+df = load_posts(posts_file, columns=['Id', 'PostTypeId', 'ParentId', 'CreationDate', 'Title', 'Body', 'Tags'])
 
 # Filter questions and answers
 questions_df = df[df['PostTypeId'] == 1].copy()
 answers_df = df[df['PostTypeId'] == 2].copy()
 
-# Convert to datetime
-questions_df['CreationDate'] = pd.to_datetime(questions_df['CreationDate'])
-answers_df['CreationDate'] = pd.to_datetime(answers_df['CreationDate'])
+# CreationDate is already parsed to datetime by the reader
 
 # -----------------------
 # 2️⃣ First answer time
@@ -48,12 +47,7 @@ questions_df['time_to_answer'] = (
 # -----------------------
 
 # Clean HTML from body
-def clean_text(html):
-    if pd.isna(html):
-        return ""
-    return BeautifulSoup(str(html), 'html.parser').get_text()
-
-questions_df['Body_text'] = questions_df['Body'].apply(clean_text)
+questions_df['Body_text'] = html_to_text_many(questions_df['Body'])
 
 # Question length (words)
 questions_df['body_word_count'] = questions_df['Body_text'].apply(lambda x: len(x.split()))
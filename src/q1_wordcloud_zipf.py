@@ -1,9 +1,7 @@
 # === IMPORTS ===
 from collections import Counter
-import xml.etree.ElementTree as ET
 import pandas as pd
 import re
-from html import unescape
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
@@ -12,6 +10,8 @@ from wordcloud import WordCloud
 import numpy as np
 import os
 from google.colab import files  # <-- for downloading files
+from dump_reader import load_posts, load_comments
+from html_text import html_to_text_many
 
 # === DOWNLOAD NLTK DATA ===
 nltk.download('punkt')
@@ -19,22 +19,8 @@ nltk.download('punkt_tab')
 nltk.download('stopwords')
 
 # === HELPERS ===
-def load_posts(file_path, max_rows=None):
-    rows = []
-    context = ET.iterparse(file_path, events=('end',))
-    for event, elem in context:
-        if elem.tag == 'row':
-            rows.append(elem.attrib.copy())
-            elem.clear()
-        if max_rows and len(rows) >= max_rows:
-            break
-    return pd.DataFrame(rows)
-
 def clean_html(text):
-    if not isinstance(text, str):
-        return ''
-    text = unescape(text)
-    text = re.sub(r'<[^>]+>', ' ', text)
+    # Tags are already stripped and entities unescaped by html_to_text_many
     text = re.sub(r'http\S+', ' ', text)
     text = re.sub(r'[^A-Za-z\s]', ' ', text)
     text = re.sub(r'\s+', ' ', text)
@@ -47,15 +33,15 @@ comments_path = os.path.join(data_dir, "Comments.xml")
 
 # === LOAD DATA ===
 print(f"Loading posts from {posts_path} ...")
-posts_df = load_posts(posts_path)  # load all posts
+posts_df = load_posts(posts_path, columns=['Id', 'Body'])  # load all posts
 print("Loaded posts:", posts_df.shape)
 
 print(f"Loading comments from {comments_path} ...")
-comments_df = load_posts(comments_path)  # load all comments
+comments_df = load_comments(comments_path, columns=['Id', 'Text'])  # load all comments
 print("Loaded comments:", comments_df.shape)
 
 # === PREPROCESS TEXT ===
-bodies_clean = posts_df['Body'].astype(str).fillna('').map(clean_html)
+bodies_clean = pd.Series(html_to_text_many(posts_df['Body'])).map(clean_html)
 all_text = " ".join(bodies_clean.tolist()).lower()
 tokens = word_tokenize(all_text)
 tokens_alpha = [t for t in tokens if t.isalpha()]
@@ -1,63 +1,36 @@
 # === IMPORTS ===
-from collections import Counter
-import xml.etree.ElementTree as ET
-import pandas as pd
+import time
 import matplotlib.pyplot as plt
 import os
 from google.colab import files  # for downloading files
-
-# === HELPER: load posts safely from XML ===
-def load_posts(file_path, max_rows=None):
-    rows = []
-    context = ET.iterparse(file_path, events=('end',))
-    for event, elem in context:
-        if elem.tag == 'row':
-            rows.append(elem.attrib.copy())
-            elem.clear()
-        if max_rows and len(rows) >= max_rows:
-            break
-    return pd.DataFrame(rows)
+from tag_index import open_tag_index
 
 # === FILE PATHS (Colab-friendly) ===
 project_dir = "/content/IR_Project01"  # adjust if your repo is elsewhere
 data_dir = os.path.join(project_dir, "data")
 posts_path = os.path.join(data_dir, "Posts.xml")
 
-# === LOAD POSTS ===
-print(f"Loading posts from {posts_path} ...")
-posts_df = load_posts(posts_path)  # Load all posts
-print("Loaded posts:", posts_df.shape)
-
-if 'Tags' not in posts_df.columns:
-    raise RuntimeError("No 'Tags' column found in Posts.xml rows. Check the XML structure.")
-
-# === FUNCTION TO SPLIT TAGS ===
-def extract_tags(tag_string):
-    if pd.isna(tag_string):
-        return []
-    return [t for t in str(tag_string).split("|") if t]
-
-# === APPLY FUNCTION ===
-posts_df['Tags_list'] = posts_df['Tags'].apply(extract_tags)
-
-# === FLATTEN ALL TAGS ===
-all_tags = [tag for tags in posts_df['Tags_list'] for tag in tags]
-
-# === COUNT FREQUENCY OF TAGS ===
-tag_freq = Counter(all_tags)
+# === OPEN THE TAG INDEX ===
+# Tag -> docID bitmaps, built on first use and cached next to the dump (see tag_index.py)
+print(f"Opening the tag index of {posts_path} ...")
+start = time.perf_counter()
+tag_index = open_tag_index(posts_path)
+print(f"Tag index ready: {len(tag_index)} tags over {tag_index.n_docs} posts "
+      f"in {time.perf_counter() - start:.2f}s")
 
 # === TOP-10 MOST COMMON TAGS ===
-top_10_tags = tag_freq.most_common(10)
+# Posts per tag come straight from the index; tag_index.facets(docids) gives the same for a result set
+top_10_tags = tag_index.top(10)
 print("Top-10 most common question tags:")
 for i, (tag, count) in enumerate(top_10_tags, 1):
     print(f"{i}. {tag}: {count} occurrences")
 
 # === TOP-20 FOR DISTRIBUTION + 'Other' CATEGORY ===
-top_20_tags = tag_freq.most_common(20)
+top_20_tags = tag_index.top(20)
 tags, counts = zip(*top_20_tags)
 
 # Count "Other" tags
-total_all_tags = sum(tag_freq.values())
+total_all_tags = int(tag_index.counts.sum())
 count_top_20 = sum(counts)
 count_other = total_all_tags - count_top_20
 
@@ -1,27 +1,12 @@
 # === IMPORTS ===
 import os
-import xml.etree.ElementTree as ET
-import pandas as pd
 import nltk
 from nltk.tokenize import word_tokenize
+from dump_reader import load_posts
 
 # === DOWNLOAD NLTK DATA ===
 nltk.download('punkt')
 
-# -----------------------
-# Helper: load posts safely from XML
-# -----------------------
-def load_posts(file_path, max_rows=None):
-    rows = []
-    context = ET.iterparse(file_path, events=('end',))
-    for event, elem in context:
-        if elem.tag == 'row':
-            rows.append(elem.attrib.copy())
-            elem.clear()
-        if max_rows and len(rows) >= max_rows:
-            break
-    return pd.DataFrame(rows)
-
 # -----------------------
 # Load Posts.xml into posts_df
 # -----------------------
@@ -38,7 +23,7 @@ def load_posts(file_path, max_rows=None):
 # -----------------------
 data_dir = os.path.join(os.getcwd(), "data")  # adjust if needed
 posts_path = os.path.join(data_dir, "Posts.xml")
-posts_df = load_posts(posts_path)  # Load all posts
+posts_df = load_posts(posts_path, columns=['Id', 'PostTypeId', 'ParentId', 'AcceptedAnswerId', 'Title', 'Body'])  # Load all posts
 
 # Fill missing Body and Title to avoid errors
 posts_df['Body'] = posts_df['Body'].fillna('')
@@ -62,7 +47,7 @@ posts_df['t_words'], posts_df['t_sentences'] = zip(*posts_df['Title'].astype(str
 # 2️⃣ Filter answers
 # PostTypeId = 2 → answer
 # -----------------------
-answers_df = posts_df[posts_df['PostTypeId'] == '2'].copy()
+answers_df = posts_df[posts_df['PostTypeId'] == 2].copy()
 answers_df['a_words'], answers_df['a_sentences'] = zip(*answers_df['Body'].astype(str).map(count_words_sentences))
 
 # -----------------------
@@ -83,7 +68,7 @@ print("\nAverage number of answers per question:", avg_answers_per_question)
 # -----------------------
 # 5️⃣ Number of questions with no answers
 # -----------------------
-question_ids = posts_df[posts_df['PostTypeId'] == '1']['Id']
+question_ids = posts_df[posts_df['PostTypeId'] == 1]['Id']
 questions_with_answers = answers_df['ParentId'].unique()
 questions_no_answers = set(question_ids) - set(questions_with_answers)
 print("Number of questions with no answers:", len(questions_no_answers))
@@ -91,7 +76,7 @@ print("Number of questions with no answers:", len(questions_no_answers))
 # -----------------------
 # 6️⃣ Number of questions with accepted answers
 # -----------------------
-questions_with_accepted_answer = posts_df[posts_df['PostTypeId'] == '1']['AcceptedAnswerId'].dropna()
+questions_with_accepted_answer = posts_df[posts_df['PostTypeId'] == 1]['AcceptedAnswerId'].dropna()
 print("Number of questions with an accepted answer:", len(questions_with_accepted_answer))
 
 # # -----------------------
@@ -4,30 +4,17 @@
 # ===============================
 
 import pandas as pd
-import xml.etree.ElementTree as ET
 import matplotlib.pyplot as plt
 import nltk
 from nltk.tokenize import word_tokenize
+from dump_reader import load_posts
+from doc_store import open_doc_store
 
 # -----------------------
 # Download NLTK resources
 # -----------------------
 nltk.download('punkt')
 
-# -----------------------
-# Helper: Load Posts.xml safely
-# -----------------------
-def load_posts(file_path, max_rows=None):
-    rows = []
-    context = ET.iterparse(file_path, events=('end',))
-    for event, elem in context:
-        if elem.tag == 'row':
-            rows.append(elem.attrib.copy())
-            elem.clear()
-        if max_rows and len(rows) >= max_rows:
-            break
-    return pd.DataFrame(rows)
-
 # # -----------------------
 # # File path to your Posts.xml
 # # -----------------------
@@ -38,7 +25,7 @@ def load_posts(file_path, max_rows=None):
 # File path to your Posts.xml
 # -----------------------
 posts_path = "/content/IR_Project01/data/Posts.xml"  # adjust path
-posts_df = load_posts(posts_path, max_rows=None)  # <-- Load all posts
+posts_df = load_posts(posts_path, columns=['Id', 'PostTypeId', 'ParentId', 'Title', 'Body', 'Tags'])  # <-- Load all posts
 
 
 # -----------------------
@@ -61,6 +48,10 @@ def count_words(text):
 posts_df['q_words'] = posts_df['Body'].map(count_words)
 posts_df['t_words'] = posts_df['Title'].map(count_words)
 
+# Bodies are only needed for the counts; samples are fetched from the doc store
+posts_df = posts_df.drop(columns=['Body', 'Title'])
+docs = open_doc_store(posts_path)
+
 # -----------------------
 # Process Tags: convert pipe-separated string to list
 # -----------------------
@@ -74,12 +65,12 @@ posts_df['Tags_list'] = posts_df['Tags'].map(extract_tags)
 # -----------------------
 # Filter only questions
 # -----------------------
-questions_df = posts_df[posts_df['PostTypeId'] == '1'].copy()
+questions_df = posts_df[posts_df['PostTypeId'] == 1].copy()
 
 # -----------------------
 # Count number of answers per question
 # -----------------------
-answers_df = posts_df[posts_df['PostTypeId'] == '2'].copy()
+answers_df = posts_df[posts_df['PostTypeId'] == 2].copy()
 answers_count = answers_df.groupby('ParentId').size()
 questions_df['num_answers'] = questions_df['Id'].map(answers_count).fillna(0).astype(int)
 
@@ -94,7 +85,7 @@ sample_unanswered = unanswered.sample(5, random_state=42)
 print("Examples of unanswered questions (first 300 characters):\n")
 for i, row in sample_unanswered.iterrows():
     print(f"Question ID: {row['Id']}")
-    print(row['Body'][:300])
+    print((docs.get(row['Id'], 'Body') or '')[:300])
     print("---\n")
 
 # -----------------------
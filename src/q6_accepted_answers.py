@@ -5,13 +5,16 @@
 import pandas as pd
 import numpy as np
 from scipy.stats import spearmanr
+from dump_reader import load_posts
 
 # -----------------------
 # 0️⃣ Load Posts.xml safely
 # -----------------------
 posts_path = "/content/IR_Project01/data/Posts.xml"  # adjust path
+# Columns come back typed: int Id/PostTypeId, nullable ParentId/AcceptedAnswerId/OwnerUserId
 try:
-    df = pd.read_xml(posts_path, xpath="//row")
+    df = load_posts(posts_path, columns=['Id', 'PostTypeId', 'ParentId', 'AcceptedAnswerId',
+                                         'CreationDate', 'Score', 'OwnerUserId', 'Title'])
 except Exception as e:
     print("Error loading XML:", e)
     df = pd.DataFrame()
@@ -19,24 +22,11 @@ except Exception as e:
 if df.empty:
     raise ValueError("Posts.xml could not be loaded or is empty.")
 
-# -----------------------
-# 1️⃣ Ensure columns exist and correct types
-# -----------------------
-for col in ['PostTypeId', 'Score', 'OwnerUserId', 'ParentId', 'Id', 'AcceptedAnswerId', 'CreationDate', 'Title']:
-    if col not in df.columns:
-        df[col] = np.nan
-
-df['PostTypeId'] = df['PostTypeId'].astype(str)
-df['Score'] = pd.to_numeric(df['Score'], errors='coerce')
-df['OwnerUserId'] = pd.to_numeric(df['OwnerUserId'], errors='coerce')
-df['ParentId'] = pd.to_numeric(df['ParentId'], errors='coerce')
-df['Id'] = pd.to_numeric(df['Id'], errors='coerce')
-
 # -----------------------
 # 2️⃣ Filter questions and answers
 # -----------------------
-questions = df[df['PostTypeId'] == '1'].copy()
-answers = df[df['PostTypeId'] == '2'].copy()
+questions = df[df['PostTypeId'] == 1].copy()
+answers = df[df['PostTypeId'] == 2].copy()
 
 questions['has_accepted'] = questions['AcceptedAnswerId'].notnull()
 
@@ -75,7 +65,7 @@ user_reputation = {uid: np.random.randint(1, 5000) for uid in accepted_answers['
 accepted_answers['Reputation'] = accepted_answers['OwnerUserId'].map(user_reputation)
 
 if not accepted_answers.empty:
-    corr, _ = spearmanr(accepted_answers['Score'], accepted_answers['Reputation'])
+    corr, _ = spearmanr(accepted_answers['Score'].astype(float), accepted_answers['Reputation'])
     print(f"Spearman correlation between accepted answer score and reputation: {corr:.3f}")
 else:
     print("No accepted answers with score and user ID available for correlation.")
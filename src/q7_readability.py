@@ -1,8 +1,8 @@
-import pandas as pd
-from bs4 import BeautifulSoup
 import textstat
 from scipy.stats import pearsonr
 import matplotlib.pyplot as plt
+from dump_reader import load_posts
+from html_text import html_to_text_many
 
 # -----------------------
 # 1️⃣ Load Posts.xml (absolute path for Colab)
@@ -10,19 +10,14 @@ import matplotlib.pyplot as plt
 posts_path = "/content/IR_Project01/data/Posts.xml"
 
 try:
-    df = pd.read_xml(posts_path, xpath="//row")
+    df = load_posts(posts_path, columns=['Id', 'Body', 'AnswerCount'])
 except FileNotFoundError:
     raise FileNotFoundError(f"❌ Could not find Posts.xml at {posts_path}")
 
 # -----------------------
 # 2️⃣ Clean HTML from Body
 # -----------------------
-def clean_text(x):
-    if pd.isna(x):
-        return ""
-    return BeautifulSoup(str(x), 'html.parser').get_text()
-
-df['Body_text'] = df['Body'].apply(clean_text)
+df['Body_text'] = html_to_text_many(df['Body'])
 
 # -----------------------
 # 3️⃣ Compute readability (Flesch Reading Ease)
@@ -32,7 +27,7 @@ df['readability'] = df['Body_text'].apply(textstat.flesch_reading_ease)
 # -----------------------
 # 4️⃣ Separate answered and unanswered questions
 # -----------------------
-df['AnswerCount'] = pd.to_numeric(df['AnswerCount'], errors='coerce').fillna(0)
+df['AnswerCount'] = df['AnswerCount'].fillna(0).astype(int)
 answered = df[df['AnswerCount'] > 0]
 unanswered = df[df['AnswerCount'] == 0]
 
@@ -1,23 +1,14 @@
-import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.neighbors import NearestNeighbors
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import string
-
-# -----------------------
-# 1️⃣ Setup
-# -----------------------
-nltk.download('punkt')
-nltk.download('stopwords')
-stop_words = set(stopwords.words('english'))
+from dump_reader import load_posts
+from doc_store import open_doc_store
+from analyzer import default_analyzer
 
 # -----------------------
 # 2️⃣ Load Posts.xml
 # -----------------------
 posts_path = "/content/IR_Project01/data/Posts.xml"
-df = pd.read_xml(posts_path, xpath="//row")
+df = load_posts(posts_path, columns=['Id', 'PostTypeId', 'Title', 'Body'])
 
 # Keep only questions (PostTypeId == 1)
 df_questions = df[df['PostTypeId'] == 1].copy()
@@ -28,14 +19,7 @@ df_questions[['Title', 'Body']] = df_questions[['Title', 'Body']].fillna("")
 # -----------------------
 # 3️⃣ Normalize text
 # -----------------------
-def normalize_text(text):
-    text = str(text).lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    tokens = [word for word in word_tokenize(text) if word.isalpha() and word not in stop_words]
-    return tokens
-
-df_questions['norm_title'] = df_questions['Title'].apply(normalize_text)
-df_questions['norm_body'] = df_questions['Body'].apply(normalize_text)
+normalize_text = default_analyzer.analyze
 
 # Combine for TF-IDF (keep some stopwords to avoid empty vocabulary)
 df_questions['combined_text'] = df_questions['Title'].astype(str) + " " + df_questions['Body'].astype(str)
@@ -52,6 +36,11 @@ print(f"Number of questions to process: {len(df_questions)}")
 vectorizer = TfidfVectorizer(stop_words='english', max_features=50000)  # limit features to save memory
 X = vectorizer.fit_transform(df_questions['combined_text'])
 
+# Row i of X is question_ids[i]; the texts themselves are no longer needed
+question_ids = df_questions['Id'].to_numpy()
+del df, df_questions
+docs = open_doc_store(posts_path)
+
 # -----------------------
 # 6️⃣ Nearest neighbors (batch processing to save memory)
 # -----------------------
@@ -83,15 +72,17 @@ print(f"Total duplicate question pairs found: {len(duplicate_pairs)}")
 # 7️⃣ Inspect some duplicate pairs
 # -----------------------
 for i, j in duplicate_pairs[:5]:
-    title_i = set(df_questions.iloc[i]['norm_title'])
-    title_j = set(df_questions.iloc[j]['norm_title'])
-    body_i = set(df_questions.iloc[i]['norm_body'])
-    body_j = set(df_questions.iloc[j]['norm_body'])
+    # Only the inspected pairs are normalized, fetched by Id from the doc store
+    id_i, id_j = question_ids[i], question_ids[j]
+    title_i = set(normalize_text(docs.get(id_i, 'Title') or ""))
+    title_j = set(normalize_text(docs.get(id_j, 'Title') or ""))
+    body_i = set(normalize_text(docs.get(id_i, 'Body') or ""))
+    body_j = set(normalize_text(docs.get(id_j, 'Body') or ""))
 
     common_title = title_i.intersection(title_j)
     common_body = body_i.intersection(body_j)
 
-    print(f"Question {df_questions.iloc[i]['Id']} and Question {df_questions.iloc[j]['Id']} are duplicates")
+    print(f"Question {id_i} and Question {id_j} are duplicates")
     print(f"Title common terms ({len(common_title)}): {common_title}")
     print(f"Body common terms ({len(common_body)}): {common_body}")
     print("-" * 80)
@@ -1,13 +1,13 @@
 import os
-import pandas as pd
-import xml.etree.ElementTree as ET
 import re
+from dump_reader import load_posts, load_comments, resolve_dump_path
+from doc_store import open_doc_store
 
 # -----------------------
 # 0️⃣ Define file paths
 # -----------------------
-posts_file = "data/Posts.xml"
-comments_file = "data/Comments.xml"
+posts_file = resolve_dump_path("data/Posts.xml")  # .zip archives are read directly
+comments_file = resolve_dump_path("data/Comments.xml")
 
 # Check if files exist
 if not os.path.exists(posts_file):
@@ -18,34 +18,16 @@ if not os.path.exists(comments_file):
 # -----------------------
 # 1️⃣ Parse Posts
 # -----------------------
-posts_tree = ET.parse(posts_file)
-posts_root = posts_tree.getroot()
-
-posts_data = []
-for row in posts_root.findall("row"):
-    post_id = row.attrib.get("Id")
-    title = row.attrib.get("Title", "")
-    body = row.attrib.get("Body", "")
-    posts_data.append({"Id": post_id, "Title": title, "Body": body})
-
-df = pd.DataFrame(posts_data)
-df['Id'] = df['Id'].astype(int)
+# Only Ids are needed for the merge; Title/Body of the sampled posts come from the doc store
+df = load_posts(posts_file, columns=["Id"])
+docs = open_doc_store(posts_file)
 
 # -----------------------
 # 2️⃣ Parse Comments
 # -----------------------
-comments_tree = ET.parse(comments_file)
-comments_root = comments_tree.getroot()
-
-comments_data = []
-for row in comments_root.findall("row"):
-    cid = row.attrib.get("Id")
-    pid = row.attrib.get("PostId")
-    text = row.attrib.get("Text", "")
-    comments_data.append({"CommentId": cid, "PostId": pid, "Text": text})
-
-comments_df = pd.DataFrame(comments_data)
-comments_df['PostId'] = comments_df['PostId'].astype(int)
+comments_df = load_comments(comments_file, columns=["Id", "PostId", "Text"])
+comments_df = comments_df.rename(columns={"Id": "CommentId"})
+comments_df["Text"] = comments_df["Text"].fillna("")
 
 # -----------------------
 # 3️⃣ Merge Posts with Comments
@@ -56,7 +38,7 @@ posts_with_comments = merged_df[merged_df['Text'].notnull()]
 # -----------------------
 # 4️⃣ Sample 5 posts
 # -----------------------
-sample_posts = posts_with_comments[['Id', 'Title', 'Body', 'Text']].sample(5, random_state=42)
+sample_posts = posts_with_comments[['Id', 'Text']].sample(5, random_state=42)
 
 # -----------------------
 # 5️⃣ Simple comment analysis function
@@ -80,8 +62,8 @@ def analyze_comment(comment):
 # 6️⃣ Print examples with analysis
 # -----------------------
 for post_id, group in sample_posts.groupby('Id'):
-    title = group['Title'].iloc[0]
-    body = group['Body'].iloc[0]
+    title = docs.get(post_id, "Title") or ""
+    body = docs.get(post_id, "Body") or ""
     print(f"\nPost ID: {post_id}, Title: {title}\nBody (first 200 chars): {body[:200]}...\n")
 
     for comment in group['Text']:
@@ -0,0 +1,155 @@
+# query_cache.py
+# Result cache for repeated queries, on top of a posting-list cache for hot terms.
+#
+#   python src/query_cache.py bench data/Posts.xml       # skewed query stream, cached vs not
+#
+#   cache = QueryCache(index, open_metadata(posts_path))  # metadata: doc_metadata.DocMetadata, optional
+#   post_ids = cache.boolean('"elden ring" boss')         # query_parser.search, memoized
+#   post_ids, scores = cache.top_k("elden ring boss", 10, filters="type:question")
+#   cache.stats()                                         # hit/miss counters of both caches
+#
+# Results are keyed by the analyzed query, not its text: a Boolean query by
+# its parsed syntax tree (so "Elden Ring" and "elden  ring" share an entry),
+# a ranked query by its sorted analyzed terms, plus k, the ranking model and
+# the filter expression with its predicates sorted. Both caches are LRU and
+# bounded (results by count and bytes, postings by bytes), and both are
+# emptied when the index generation changes (a SegmentedIndex bumps it on
+# every add, delete and merge; a saved index never changes). Filters are
+# evaluated on the metadata re-aligned to the index's docIDs of the current
+# generation, since adds and merges renumber a SegmentedIndex. Decoded
+# postings are cached on the index itself (InvertedIndex.cache_postings),
+# so BM25, TF scoring and Boolean evaluation all share them.
+import argparse
+import time
+
+import numpy as np
+
+from bm25 import BM25
+from daat import tf_top_k
+from lru_cache import LRUCache
+from query_parser import evaluate, parse
+
+RESULT_CACHE_ENTRIES = 4096
+RESULT_CACHE_BYTES = 32 << 20
+MODELS = ("bm25", "tf")
+
+
+def normalize_filters(filters):
+    """A filter expression with its predicates in a canonical order ("" for none)."""
+    return " ".join(sorted(filters.lower().split())) if filters else ""
+
+
+class QueryCache:
+    """Memoized Boolean and ranked queries over one index."""
+
+    def __init__(self, index, metadata=None, max_entries=RESULT_CACHE_ENTRIES, max_bytes=RESULT_CACHE_BYTES,
+                 postings_bytes=None):
+        self.index = index
+        self.metadata = metadata  # DocMetadata of the dump, for filters
+        self.aligned = None       # metadata in the index's docID order, see filter_metadata
+        self.aligned_generation = None
+        self.results = LRUCache(max_entries, max_bytes, generation=lambda: index.generation)
+        if index.postings_cache is None:
+            if postings_bytes is None:
+                index.cache_postings()
+            elif postings_bytes:
+                index.cache_postings(postings_bytes)
+        self.scorer = None
+        self.scorer_generation = None
+
+    def bm25(self):
+        """BM25 scorer of the current generation (doc norms change with the index)."""
+        if self.scorer is None or self.scorer_generation != self.index.generation:
+            self.scorer_generation = self.index.generation
+            self.scorer = BM25(self.index)
+        return self.scorer
+
+    def filter_metadata(self):
+        """Metadata aligned to the docIDs of the current generation (they move with every update)."""
+        if self.aligned is None or self.aligned_generation != self.index.generation:
+            self.aligned_generation = self.index.generation
+            self.aligned = self.metadata.aligned(self.index.doc_ids)
+        return self.aligned
+
+    def allowed(self, filters):
+        if self.metadata is None:
+            raise ValueError("filters need the dump's DocMetadata")
+        return self.filter_metadata().mask(filters)
+
+    def boolean(self, query, default_operator="AND", filters=None):
+        """Post Ids matching a Boolean query (and filters), as query_parser.search."""
+        node = parse(query, self.index.analyzer, default_operator)
+        filters = normalize_filters(filters)
+
+        def run():
+            within = np.flatnonzero(self.allowed(filters)) if filters else None
+            return self.index.post_ids(evaluate(node, self.index, within))
+        return self.results.get(("boolean", repr(node), filters), run)
+
+    def top_k(self, query, k, filters=None, model="bm25"):
+        """Best `k` (post Ids, scores) of a query (text or analyzed terms) by BM25 or summed TF."""
+        if model not in MODELS:
+            raise ValueError(f"unknown model {model!r}, expected one of {MODELS}")
+        terms = self.index.analyzer.analyze(query) if isinstance(query, str) else list(query)
+        filters = normalize_filters(filters)
+
+        def run():
+            allowed = self.allowed(filters) if filters else None
+            if model == "bm25":
+                return self.bm25().top_k(terms, k, allowed=allowed)
+            return tf_top_k(self.index, terms, k, allowed=allowed)
+        return self.results.get((model, tuple(sorted(terms)), k, filters), run)
+
+    def clear(self):
+        self.results.clear()
+        if self.index.postings_cache is not None:
+            self.index.postings_cache.clear()
+
+    def stats(self):
+        postings = self.index.postings_cache
+        return {"results": self.results.stats(), "postings": postings.stats() if postings is not None else None}
+
+
+def main(argv=None):
+    import dump_reader
+    from index_store import open_index
+
+    parser = argparse.ArgumentParser(description="Query cache: latency of a skewed query stream, cached vs not.")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("dump", help="Posts.xml (or .zip)")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=2000, help="length of the query stream")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    index = open_index(dump_reader.resolve_dump_path(args.dump))
+    distinct = ["game", "play game", "elden ring boss", "dark souls playstation xbox",
+                "how to beat the final boss in sekiro", "download games playstation",
+                "witcher crashes constantly", "skyrim mods reinstall", "gta online load",
+                "upgrade the horse", "moonlight butterfly dark souls", "grafted scion elden ring",
+                "xbox controller pc", "save file location", "multiplayer lag fix", "steam refund"]
+    # Zipf-like popularity: query i is drawn with weight 1 / (i + 1)
+    weights = 1 / np.arange(1, len(distinct) + 1)
+    rng = np.random.default_rng(args.seed)
+    stream = rng.choice(len(distinct), args.queries, p=weights / weights.sum())
+
+    scorer = BM25(index)
+    start = time.perf_counter()
+    for i in stream:
+        scorer.top_k(index.analyzer.analyze(distinct[i]), args.k)
+    uncached = time.perf_counter() - start
+
+    cache = QueryCache(index)
+    start = time.perf_counter()
+    for i in stream:
+        cache.top_k(distinct[i], args.k)
+    cached = time.perf_counter() - start
+
+    print(f"uncached {args.queries / uncached:10.0f} queries/s")
+    print(f"cached   {args.queries / cached:10.0f} queries/s")
+    for name, stats in cache.stats().items():
+        print(f"{name:<8} {stats}")
+
+
+if __name__ == "__main__":
+    main()
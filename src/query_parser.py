@@ -0,0 +1,314 @@
+# query_parser.py
+# Boolean query language: AND, OR, NOT, parentheses, "phrases", a NEAR/k b.
+#
+#   python src/query_parser.py data/Posts.xml '(sekiro OR "elden ring") AND boss NOT "dark souls"'
+#
+#   node = parse('sekiro AND (boss OR "final fight") NOT dlc')
+#   docids = evaluate(node, index)            # sorted internal docIDs
+#   post_ids = search(index, "witcher 3 NOT crash")
+#   post_ids = search(index, "witcher 3", within=metadata.docids("type:question score>=5"))
+#
+# Grammar (operators are upper-case words; adjacent clauses without an
+# operator are joined with the default operator, AND unless told otherwise):
+#   query   := or
+#   or      := and ("OR" and)*
+#   and     := unary (["AND"] unary)*
+#   unary   := "NOT" unary | primary
+#   primary := "(" query ")" | '"' words '"' | word ["NEAR/k" word]
+# "a NOT b" reads as "a AND NOT b". Words are analyzed with the index's
+# analyzer; words it drops (stopwords, numbers) drop out of the query.
+#
+# Planning: the children of an AND are evaluated cheapest first, by an
+# estimate from document frequencies (no postings are decoded to plan).
+# Every later child, negations included, is only evaluated within the docs
+# still matching, so phrases check positions for those docs alone, and
+# evaluation stops as soon as the result is empty. A term checked against
+# far fewer docs than it occurs in is looked up through its posting list's
+# skip entries (InvertedIndex.docs_within), so only the blocks that can hold
+# those docs are decoded; lists of similar length are merged. An OR (or a
+# NOT) that is not limited to earlier matches is computed on roaring
+# bitmaps: frequent terms have theirs saved in the index, so OR-ing them is
+# word-wise work per 64K docs, with no postings decoded (see roaring.py).
+# Metadata filters (doc_metadata.py) come in as `within`, so the very first
+# clause is already checked against the filtered docs only.
+import argparse
+import re
+import time
+
+import numpy as np
+
+from analyzer import default_analyzer
+from inverted_index import EMPTY_POSTINGS, sorted_member
+from roaring import RoaringBitmap
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"?|(NEAR/\d+)|([^\s()"]+))')
+OPERATORS = {"AND", "OR", "NOT"}
+
+
+# -----------------------
+# Syntax tree
+# -----------------------
+class Term:
+    def __init__(self, term):
+        self.term = term
+
+    def __repr__(self):
+        return f"Term({self.term!r})"
+
+
+class Phrase:
+    def __init__(self, terms, slop=None):
+        self.terms = terms
+        self.slop = slop  # None: exact phrase; k: every adjacent pair within k positions
+
+    def __repr__(self):
+        return f"Phrase({self.terms!r})" if self.slop is None else f"Near({self.terms!r}, {self.slop})"
+
+
+class And:
+    def __init__(self, children):
+        self.children = children
+
+    def __repr__(self):
+        return f"And({self.children!r})"
+
+
+class Or:
+    def __init__(self, children):
+        self.children = children
+
+    def __repr__(self):
+        return f"Or({self.children!r})"
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def __repr__(self):
+        return f"Not({self.child!r})"
+
+
+# -----------------------
+# Parser
+# -----------------------
+def tokenize(query):
+    """(kind, text) tokens: "(", ")", "phrase", "near", "op" or "word"."""
+    tokens = []
+    for match in TOKEN.finditer(query):
+        open_paren, close_paren, phrase, near, word = match.groups()
+        if open_paren:
+            tokens.append(("(", open_paren))
+        elif close_paren:
+            tokens.append((")", close_paren))
+        elif phrase is not None:
+            tokens.append(("phrase", phrase))
+        elif near:
+            tokens.append(("near", near))
+        elif word in OPERATORS:
+            tokens.append(("op", word))
+        elif word:
+            tokens.append(("word", word))
+    return tokens
+
+
+class Parser:
+    """Recursive-descent parser over tokenize() output; unbalanced parentheses raise ValueError."""
+
+    def __init__(self, query, analyzer, default_operator="AND"):
+        self.tokens = tokenize(query)
+        self.pos = 0
+        self.analyzer = analyzer
+        self.default_operator = default_operator.upper()
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise ValueError(f"unexpected {self.peek()[1]!r} in query")
+        return node
+
+    def starts_clause(self):
+        return self.peek()[0] in ("word", "phrase", "(")
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while True:
+            if self.peek() == ("op", "OR"):
+                self.take()
+            elif not (self.default_operator == "OR" and self.starts_clause()):
+                break
+            children.append(self.parse_and())
+        return combine(Or, children)
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while True:
+            if self.peek() == ("op", "AND"):
+                self.take()
+            elif self.peek() != ("op", "NOT") and not (self.default_operator == "AND" and self.starts_clause()):
+                break
+            children.append(self.parse_unary())
+        return combine(And, children)
+
+    def parse_unary(self):
+        if self.peek() == ("op", "NOT"):
+            self.take()
+            child = self.parse_unary()
+            return Not(child) if child is not None else None
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, text = self.take()
+        if kind == "(":
+            node = self.parse_or()
+            if self.take()[0] != ")":
+                raise ValueError("missing ')' in query")
+            return node
+        if kind == "phrase":
+            terms = self.analyzer.analyze(text)
+            return phrase_node(terms)
+        if kind == "word":
+            terms = self.analyzer.analyze(text)
+            if self.peek()[0] == "near":
+                slop = int(self.take()[1].split("/")[1])
+                kind, right = self.take()
+                if kind != "word":
+                    raise ValueError("NEAR/k needs a word on both sides")
+                terms = terms + self.analyzer.analyze(right)
+                return phrase_node(terms, slop)
+            # "half-life" analyzes to one term; anything longer is matched as a phrase
+            return phrase_node(terms)
+        raise ValueError(f"unexpected {text!r} in query" if text else "query ends too early")
+
+
+def phrase_node(terms, slop=None):
+    if not terms:
+        return None
+    if len(terms) == 1:
+        return Term(terms[0])
+    return Phrase(terms, slop)
+
+
+def combine(cls, children):
+    """cls(children) without dropped (None) children; a single child stands alone."""
+    children = [c for c in children if c is not None]
+    if not children:
+        return None
+    if len(children) == 1:
+        return children[0]
+    return cls(children)
+
+
+def parse(query, analyzer=default_analyzer, default_operator="AND"):
+    """Syntax tree of a query (None if every word was dropped by the analyzer)."""
+    return Parser(query, analyzer, default_operator).parse()
+
+
+# -----------------------
+# Planner / evaluator
+# -----------------------
+def cost(node, index):
+    """Estimated number of matching docs, from document frequencies only."""
+    if isinstance(node, Term):
+        return index.doc_freq(node.term)
+    if isinstance(node, Phrase):
+        return min(index.doc_freq(t) for t in node.terms)
+    if isinstance(node, And):
+        positive = [cost(c, index) for c in node.children if not isinstance(c, Not)]
+        return min(positive) if positive else index.n_docs
+    if isinstance(node, Or):
+        return sum(cost(c, index) for c in node.children)
+    return index.n_docs - cost(node.child, index)
+
+
+def evaluate(node, index, within=None):
+    """Sorted internal docIDs matching a syntax tree (only among `within`, if given)."""
+    if node is None:
+        return EMPTY_POSTINGS[0]
+    if isinstance(node, Term):
+        return index.docs(node.term) if within is None else index.docs_within(node.term, within)
+    if isinstance(node, Phrase):
+        if node.slop is None:
+            return index.phrase(node.terms, within)
+        return index.near(node.terms, node.slop, within)
+    if isinstance(node, Or):
+        if within is None:
+            return RoaringBitmap.union(*(as_bitmap(c, index) for c in node.children)).to_array()
+        lists = [evaluate(c, index, within) for c in node.children]
+        return np.unique(np.concatenate(lists))
+    if isinstance(node, Not):
+        if within is None:
+            return (RoaringBitmap.from_sorted(index.all_docs()) - as_bitmap(node.child, index)).to_array()
+        return subtract(within, evaluate(node.child, index, within))
+    # And: positive clauses cheapest first, each only checked against the docs
+    # still matching, then the negations
+    positive = sorted((c for c in node.children if not isinstance(c, Not)), key=lambda c: cost(c, index))
+    negative = sorted((c.child for c in node.children if isinstance(c, Not)), key=lambda c: cost(c, index))
+    result = within
+    for child in positive:
+        result = evaluate(child, index, result)
+        if not len(result):
+            return result
+    if result is None:
+        result = index.all_docs()
+    for child in negative:
+        if not len(result):
+            break
+        result = subtract(result, evaluate(child, index, result))
+    return result
+
+
+def as_bitmap(node, index):
+    """RoaringBitmap of a subtree's matches; a frequent term's comes saved with the index."""
+    if isinstance(node, Term):
+        return index.bitmap(node.term)
+    return RoaringBitmap.from_sorted(evaluate(node, index))
+
+
+def subtract(docids, excluded):
+    """docids without the (sorted) excluded docIDs."""
+    if not len(excluded):
+        return docids
+    return docids[~sorted_member(docids, excluded)]
+
+
+def search(index, query, default_operator="AND", within=None):
+    """Post Ids matching a query (among the `within` docIDs, if given), in internal docID order."""
+    return index.post_ids(evaluate(parse(query, index.analyzer, default_operator), index, within))
+
+
+def main(argv=None):
+    import dump_reader
+    from index_store import open_index
+
+    parser = argparse.ArgumentParser(description="Run a Boolean query against the on-disk index.")
+    parser.add_argument("dump", help="Posts.xml (or .zip)")
+    parser.add_argument("query")
+    parser.add_argument("--operator", default="AND", choices=["AND", "OR"], help="between bare words")
+    parser.add_argument("-n", type=int, default=20, help="post Ids to print")
+    parser.add_argument("--filter", help='metadata filter, e.g. "type:question score>=5" (see doc_metadata.py)')
+    args = parser.parse_args(argv)
+
+    path = dump_reader.resolve_dump_path(args.dump)
+    index = open_index(path, positions=True)
+    within = None
+    if args.filter:
+        from doc_metadata import open_metadata
+        within = open_metadata(path).aligned(index.doc_ids).docids(args.filter)
+    node = parse(args.query, index.analyzer, args.operator)
+    start = time.perf_counter()
+    docids = evaluate(node, index, within)
+    print(f"{node}\n{len(docids)} matches in {(time.perf_counter() - start) * 1e3:.2f} ms")
+    print(index.post_ids(docids[:args.n]).tolist())
+
+
+if __name__ == "__main__":
+    main()
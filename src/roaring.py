@@ -0,0 +1,318 @@
+# roaring.py
+# Roaring-style compressed bitmaps over internal docIDs.
+#
+#   a = RoaringBitmap.from_sorted(index.docs("game"))
+#   b = index.bitmap("play")                 # saved for frequent terms, no postings decoded
+#   (a | b).to_array()                       # sorted docIDs; also &, - (AND NOT), len()
+#   RoaringBitmap.union(*bitmaps)            # many-way OR, word-wise per chunk
+#
+# DocIDs are split into 64K chunks by their high 16 bits. Each chunk holds
+# its low 16 bits in whichever container is smallest:
+#   ARRAY   sorted uint16 values          (2 bytes per doc, at most 4096 docs)
+#   BITMAP  1024 uint64 words             (8 KB, any number of docs)
+#   RUN     (first, last) uint16 pairs    (4 bytes per run of consecutive docs)
+# Operations on two bitmaps or arrays stay on sorted values; as soon as a
+# bitmap is involved, the chunk is combined 64 docs per machine word
+# (&, |, &~) and the result is re-packed into the best container. An OR of
+# frequent terms is thus a few thousand word ops per chunk, whatever the
+# number of docs.
+#
+# to_bytes / from_bytes use a flat layout, 8-byte aligned:
+#   int64 n, int64[n, 3] (key, kind, count), then each container's payload
+# so a bitmap read from a memory-mapped file is a set of views, not a copy.
+# An index keeps the bitmaps of its most frequent terms (BitmapStore,
+# bitmaps.* in index_store.py); the others are built from their postings.
+import numpy as np
+
+ARRAY, BITMAP, RUN = 0, 1, 2
+CHUNK_BITS = 16
+CHUNK = 1 << CHUNK_BITS
+ARRAY_MAX = 4096                 # above this many docs a bitmap is smaller than an array
+BITMAP_WORDS = CHUNK // 64
+BITMAP_BYTES = BITMAP_WORDS * 8
+# Terms in at least this many docs (and 1/16 of the collection) get a saved bitmap
+BITMAP_MIN_DF = 4096
+PAYLOAD_DTYPES = {ARRAY: np.uint16, BITMAP: np.uint64, RUN: np.uint16}
+
+
+# -----------------------
+# Containers: (kind, data) for the low 16 bits of one chunk
+# -----------------------
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def bit_counts(words):
+    """Set bits of every uint64 word."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return BYTE_BITS[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+def popcount(words):
+    """Number of set bits in a uint64 array."""
+    return int(bit_counts(words).sum())
+
+
+def from_values(values):
+    """Smallest container for sorted unique low bits."""
+    values = np.asarray(values, dtype=np.int64)
+    card = len(values)
+    breaks = np.flatnonzero(np.diff(values) != 1) + 1
+    n_runs = len(breaks) + 1
+    if 4 * n_runs < min(2 * card, BITMAP_BYTES):
+        firsts = values[np.r_[0, breaks]]
+        lasts = values[np.r_[breaks - 1, card - 1]]
+        return RUN, np.stack([firsts, lasts], axis=1).astype(np.uint16)
+    if card <= ARRAY_MAX:
+        return ARRAY, values.astype(np.uint16)
+    bits = np.zeros(CHUNK, dtype=bool)
+    bits[values] = True
+    return BITMAP, np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def from_words(words):
+    """Smallest container for a chunk's bitmap words (None if empty)."""
+    card = popcount(words)
+    if not card:
+        return None
+    # A run starts at every set bit whose lower neighbour is clear
+    carry = np.r_[np.uint64(0), words[:-1] >> np.uint64(63)]
+    n_runs = popcount(words & ~((words << np.uint64(1)) | carry))
+    if card <= ARRAY_MAX or 4 * n_runs < BITMAP_BYTES:
+        return from_values(to_values((BITMAP, words)))
+    return BITMAP, words
+
+
+def to_values(container):
+    """Sorted low bits of a container, as int64."""
+    kind, data = container
+    if kind == ARRAY:
+        return data.astype(np.int64)
+    if kind == BITMAP:
+        return np.flatnonzero(np.unpackbits(data.view(np.uint8), bitorder="little"))
+    firsts, lasts = data[:, 0].astype(np.int64), data[:, 1].astype(np.int64)
+    lengths = lasts - firsts + 1
+    return np.repeat(firsts - (np.cumsum(lengths) - lengths), lengths) + np.arange(int(lengths.sum()))
+
+
+def to_words(container):
+    """A container as 1024 bitmap words."""
+    kind, data = container
+    if kind == BITMAP:
+        return data
+    bits = np.zeros(CHUNK, dtype=bool)
+    if kind == ARRAY:
+        bits[data] = True
+    else:
+        edges = np.zeros(CHUNK + 1, dtype=np.int32)
+        np.add.at(edges, data[:, 0].astype(np.int64), 1)
+        np.add.at(edges, data[:, 1].astype(np.int64) + 1, -1)
+        bits = np.cumsum(edges[:-1]) > 0
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def cardinality(container):
+    kind, data = container
+    if kind == ARRAY:
+        return len(data)
+    if kind == BITMAP:
+        return popcount(data)
+    return int((data[:, 1].astype(np.int64) - data[:, 0] + 1).sum())
+
+
+def contains(container, values):
+    """Membership of sorted low bits `values` in a container."""
+    kind, data = container
+    values = np.asarray(values, dtype=np.int64)
+    if kind == ARRAY:
+        at = np.minimum(np.searchsorted(data, values), len(data) - 1)
+        return data[at] == values
+    if kind == BITMAP:
+        return (data[values >> 6] >> (values & 63).astype(np.uint64)) & np.uint64(1) == 1
+    at = np.searchsorted(data[:, 0], values, side="right") - 1
+    return (at >= 0) & (values <= data[np.maximum(at, 0), 1])
+
+
+def and_containers(a, b):
+    if a[0] != ARRAY and b[0] == ARRAY:
+        a, b = b, a
+    if a[0] == ARRAY:
+        values = to_values(a)
+        values = values[contains(b, values)]
+        return from_values(values) if len(values) else None
+    return from_words(to_words(a) & to_words(b))
+
+
+def andnot_containers(a, b):
+    if a[0] == ARRAY:
+        values = to_values(a)
+        values = values[~contains(b, values)]
+        return from_values(values) if len(values) else None
+    return from_words(to_words(a) & ~to_words(b))
+
+
+def or_containers(containers):
+    if len(containers) == 1:
+        return containers[0]
+    if all(c[0] == ARRAY for c in containers) and sum(len(c[1]) for c in containers) <= ARRAY_MAX:
+        values = np.concatenate([c[1] for c in containers]).astype(np.int64)
+        values.sort()
+        return from_values(values[np.r_[True, values[1:] != values[:-1]]])
+    words = to_words(containers[0]).copy()
+    for c in containers[1:]:
+        words |= to_words(c)
+    return from_words(words)
+
+
+# -----------------------
+# Bitmaps
+# -----------------------
+class RoaringBitmap:
+    """A set of docIDs as per-chunk containers; keys are the chunks' high bits, ascending."""
+
+    def __init__(self, keys=(), containers=()):
+        self.keys = list(keys)
+        self.containers = list(containers)
+
+    @classmethod
+    def from_sorted(cls, docids):
+        """Bitmap of sorted unique docIDs."""
+        docids = np.asarray(docids, dtype=np.int64)
+        high = docids >> CHUNK_BITS
+        cuts = np.flatnonzero(np.diff(high)) + 1
+        keys, containers = [], []
+        for part in np.split(docids, cuts) if len(docids) else []:
+            keys.append(int(part[0] >> CHUNK_BITS))
+            containers.append(from_values(part & (CHUNK - 1)))
+        return cls(keys, containers)
+
+    def __len__(self):
+        return sum(cardinality(c) for c in self.containers)
+
+    def __repr__(self):
+        return f"RoaringBitmap({len(self)} docs in {len(self.keys)} chunks)"
+
+    def to_array(self):
+        """Sorted docIDs, as int64."""
+        parts = [to_values(c) + (key << CHUNK_BITS) for key, c in zip(self.keys, self.containers)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def contains(self, docids):
+        """Membership of sorted docIDs, as a bool array."""
+        docids = np.asarray(docids, dtype=np.int64)
+        found = np.zeros(len(docids), dtype=bool)
+        high = docids >> CHUNK_BITS
+        for key, container in zip(self.keys, self.containers):
+            lo, hi = np.searchsorted(high, [key, key + 1])
+            if hi > lo:
+                found[lo:hi] = contains(container, docids[lo:hi] & (CHUNK - 1))
+        return found
+
+    def __and__(self, other):
+        keys, containers = [], []
+        theirs = dict(zip(other.keys, other.containers))
+        for key, container in zip(self.keys, self.containers):
+            if key in theirs:
+                result = and_containers(container, theirs[key])
+                if result is not None:
+                    keys.append(key)
+                    containers.append(result)
+        return RoaringBitmap(keys, containers)
+
+    def __sub__(self, other):
+        """AND NOT."""
+        keys, containers = [], []
+        theirs = dict(zip(other.keys, other.containers))
+        for key, container in zip(self.keys, self.containers):
+            result = andnot_containers(container, theirs[key]) if key in theirs else container
+            if result is not None:
+                keys.append(key)
+                containers.append(result)
+        return RoaringBitmap(keys, containers)
+
+    def __or__(self, other):
+        return RoaringBitmap.union(self, other)
+
+    @staticmethod
+    def union(*bitmaps):
+        """OR of any number of bitmaps, each chunk combined in one pass."""
+        chunks = {}
+        for bitmap in bitmaps:
+            for key, container in zip(bitmap.keys, bitmap.containers):
+                chunks.setdefault(key, []).append(container)
+        keys = sorted(chunks)
+        return RoaringBitmap(keys, [or_containers(chunks[key]) for key in keys])
+
+    # -----------------------
+    # Serialization
+    # -----------------------
+    def to_bytes(self):
+        """Flat uint8 layout (see the header comment), a multiple of 8 bytes long."""
+        table = np.zeros((len(self.keys), 3), dtype=np.int64)
+        payloads = []
+        for i, (key, (kind, data)) in enumerate(zip(self.keys, self.containers)):
+            table[i] = key, kind, len(data)
+            payload = np.ascontiguousarray(data, dtype=PAYLOAD_DTYPES[kind]).view(np.uint8).ravel()
+            payloads += [payload, np.zeros(-len(payload) % 8, dtype=np.uint8)]
+        header = np.array([len(self.keys)], dtype=np.int64).view(np.uint8)
+        return np.concatenate([header, table.view(np.uint8).ravel()] + payloads)
+
+    @classmethod
+    def from_bytes(cls, buf):
+        """Inverse of to_bytes; containers are views into `buf`."""
+        buf = np.asarray(buf)
+        n = int(buf[:8].view(np.int64)[0])
+        table = buf[8:8 + 24 * n].view(np.int64).reshape(n, 3)
+        pos = 8 + 24 * n
+        keys, containers = [], []
+        for key, kind, count in table.tolist():
+            dtype = PAYLOAD_DTYPES[kind]
+            width = 2 if kind == RUN else 1
+            size = count * width * np.dtype(dtype).itemsize
+            data = buf[pos:pos + size].view(dtype)
+            keys.append(key)
+            containers.append((kind, data.reshape(count, 2) if kind == RUN else data))
+            pos += size + (-size % 8)
+        return cls(keys, containers)
+
+    @property
+    def nbytes(self):
+        return sum(data.nbytes for _, data in self.containers) + 24 * len(self.keys) + 8
+
+
+# -----------------------
+# Saved bitmaps of frequent terms
+# -----------------------
+def bitmap_terms(doc_freqs, n_docs):
+    """Term ids frequent enough to keep a bitmap for."""
+    return np.flatnonzero(np.asarray(doc_freqs) >= max(BITMAP_MIN_DF, n_docs // 16))
+
+
+def build_bitmaps(store, n_docs):
+    """(term ids, offsets, data) of the saved bitmaps of a PostingsStore's frequent terms."""
+    tids = bitmap_terms(store.doc_freqs, n_docs)
+    parts = [RoaringBitmap.from_sorted(store.get(int(tid))[0]).to_bytes() for tid in tids]
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    data = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+    return tids.astype(np.int64), offsets, data
+
+
+class BitmapStore:
+    """Saved bitmaps (see build_bitmaps), looked up by term id."""
+
+    def __init__(self, tids, offsets, data):
+        self.tids = tids        # int64, ascending
+        self.offsets = offsets  # int64[len(tids) + 1] into data
+        self.data = data        # uint8, possibly a memmap
+
+    def get(self, tid):
+        """RoaringBitmap of a term, or None if it has no saved bitmap."""
+        i = int(np.searchsorted(self.tids, tid))
+        if i == len(self.tids) or self.tids[i] != tid:
+            return None
+        return RoaringBitmap.from_bytes(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    @property
+    def nbytes(self):
+        return int(self.data.nbytes + self.offsets.nbytes + self.tids.nbytes)
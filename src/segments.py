@@ -0,0 +1,454 @@
+# segments.py
+# Incrementally updatable index: immutable segments plus tombstones.
+#
+#   python src/segments.py update data/Posts.xml     # first run: full build; later: the delta
+#   python src/segments.py merge data/Posts.xml      # compact now, per the merge policy
+#   python src/segments.py info data/Posts.xml
+#
+#   index = open_segments(posts_path)                # same query API as InvertedIndex
+#   index.add_documents([123], ["new or edited text"])
+#   index.delete([456])
+#
+# Each segment is a saved index (index_store format) that is never modified
+# after it is written. New and edited posts go into a new small segment;
+# the old version of an edited post and deleted posts are only marked in
+# the owning segment's tombstone bitmap (<segment>.deleted, packed bits over
+# its docIDs). Queries concatenate the live postings of all segments, with
+# segment i's docIDs shifted behind segments 0..i-1. The BM25 statistics
+# (n_docs, doc_freq, avg_doc_length) count live docs only, so scores match a
+# fresh build of the live posts; doc_freq is each segment's stored df minus
+# its tombstoned hits, found through the skip entries without decoding the
+# whole list. A log-style merge policy
+# compacts adjacent small segments, or one segment with many deletions, on a
+# background thread with spimi.merge_runs, dropping tombstoned docs on the way.
+# manifest.json lists the segments in order and is replaced atomically; a
+# single writer process is assumed.
+import argparse
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import dump_cache
+import dump_reader
+import index_store
+import spimi
+from analyzer import default_analyzer
+from inverted_index import EMPTY_POSTINGS, ITER_BATCH_POSTINGS, IndexBuilder, InvertedIndex, intersect_sorted
+from postings import ArrayCursor
+from roaring import RoaringBitmap
+from term_dictionary import TermDictionary
+
+# Merge policy
+MAX_SEGMENTS = 8       # above this, merge MERGE_FACTOR adjacent segments
+MERGE_FACTOR = 4
+PURGE_RATIO = 0.3      # rewrite a segment once this fraction of it is deleted
+MERGE_BATCH_POSTINGS = 1 << 22
+
+DATE_COLUMNS = ["CreationDate", "LastEditDate"]
+
+
+def segments_dir_for(path, fields=index_store.DEFAULT_FIELDS):
+    return dump_cache.cache_dir_for(path) + ".segments-" + "-".join(f.lower() for f in fields)
+
+
+class Segment:
+    def __init__(self, name, index, deleted):
+        self.name = name
+        self.index = index
+        self.deleted = deleted  # bool per segment docID
+        self.deleted_docids = np.flatnonzero(deleted)
+
+    @property
+    def n_live(self):
+        return self.index.n_docs - int(np.count_nonzero(self.deleted))
+
+
+class SegmentedIndex(InvertedIndex):
+    """Read/write view over a segments directory; docIDs are global across segments.
+
+    Term ids are positions in the merged vocabulary of all segments (stable
+    until the next reload), so term_id, iter_postings and everything built
+    on them work as for a saved index.
+    """
+
+    def __init__(self, segments_dir, analyzer=default_analyzer):
+        self.dir = segments_dir
+        self.analyzer = analyzer
+        self.lock = threading.RLock()
+        self.merge_thread = None
+        self.postings_store = None      # postings live in the segments
+        self.positions = None           # kept per segment, see occurrences()
+        self.bm25 = None                # norms change with every update; BM25 computes them
+        self.bitmaps = None
+        self.postings_cache = None
+        self.reload()
+
+    # -----------------------
+    # Manifest and tombstones
+    # -----------------------
+    def reload(self):
+        with self.lock:
+            self.manifest = dump_cache.read_manifest(self.dir)
+            self.segments = [self.load_segment(name) for name in self.manifest["segments"]]
+            self.bases = np.cumsum([0] + [seg.index.n_docs for seg in self.segments])
+            self.doc_ids = np.concatenate([np.asarray(s.index.doc_ids) for s in self.segments]
+                                          or [np.zeros(0, dtype=np.int64)])
+            self.doc_lengths = np.concatenate([np.asarray(s.index.doc_lengths) for s in self.segments]
+                                              or [np.zeros(0, dtype=np.int32)])
+            self.vocabulary = None
+
+    def load_segment(self, name):
+        index = index_store.load_index(os.path.join(self.dir, name), self.analyzer)
+        deleted = np.zeros(index.n_docs, dtype=bool)
+        path = os.path.join(self.dir, name + ".deleted")
+        if os.path.exists(path):
+            bits = np.fromfile(path, dtype=np.uint8)
+            deleted = np.unpackbits(bits, count=index.n_docs).astype(bool)
+        return Segment(name, index, deleted)
+
+    def write_tombstones(self, seg):
+        path = os.path.join(self.dir, seg.name + ".deleted")
+        np.packbits(seg.deleted).tofile(path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def commit(self, segments, **fields):
+        self.manifest["generation"] += 1
+        self.manifest["segments"] = segments
+        self.manifest.update(fields)
+        dump_cache.write_manifest(self.dir, self.manifest)
+
+    def new_segment_name(self):
+        self.manifest["next_segment"] += 1
+        return f"seg-{self.manifest['next_segment']:06d}"
+
+    # -----------------------
+    # Queries (intersect/union/tf_scores/top_k come from InvertedIndex)
+    # -----------------------
+    def merged_vocabulary(self):
+        """(TermDictionary of every segment's terms, per-segment tid -> merged tid maps)."""
+        with self.lock:
+            if self.vocabulary is None:
+                terms, maps = spimi.merge_vocabularies([seg.index for seg in self.segments])
+                self.vocabulary = TermDictionary.from_sorted_terms(terms), maps
+            return self.vocabulary
+
+    @property
+    def terms(self):
+        return self.merged_vocabulary()[0]
+
+    @property
+    def n_docs(self):
+        return sum(seg.n_live for seg in self.segments)
+
+    @property
+    def generation(self):
+        """Manifest generation: bumped by every add, delete and merge."""
+        return self.manifest["generation"]
+
+    def read_postings(self, term):
+        """Live (docids, freqs) of a term across all segments, in global docIDs."""
+        with self.lock:
+            segments, bases = self.segments, self.bases
+        docids, freqs = [], []
+        for seg, base in zip(segments, bases):
+            d, f = seg.index.postings(term)
+            if len(d):
+                live = ~seg.deleted[d]
+                docids.append(d[live] + base)
+                freqs.append(f[live])
+        if not docids:
+            return EMPTY_POSTINGS
+        return np.concatenate(docids), np.concatenate(freqs)
+
+    @property
+    def avg_doc_length(self):
+        live = self.all_docs()
+        return float(np.mean(self.doc_lengths[live])) if len(live) else 0.0
+
+    def doc_freq(self, term):
+        """Live docs containing a term: per segment, the stored df minus the tombstoned hits."""
+        with self.lock:
+            segments = self.segments
+        n = 0
+        for seg in segments:
+            df = seg.index.doc_freq(term)
+            if df and len(seg.deleted_docids):
+                hit, _ = seg.index.cursor(term).seek(seg.deleted_docids)
+                df -= int(np.count_nonzero(hit))
+            n += df
+        return n
+
+    def all_docs(self):
+        return np.flatnonzero(~np.concatenate([seg.deleted for seg in self.segments]
+                                              or [np.zeros(0, dtype=bool)]))
+
+    def docs_within(self, term, within):
+        return intersect_sorted(within, self.docs(term))
+
+    def bitmap(self, term):
+        return RoaringBitmap.from_sorted(self.docs(term))
+
+    def iter_postings(self, batch_postings=ITER_BATCH_POSTINGS):
+        """Live postings as (merged term ids, global docids, freqs) batches, segment by segment."""
+        with self.lock:
+            segments, bases = self.segments, self.bases
+            _, maps = self.merged_vocabulary()
+        for seg, base, tid_map in zip(segments, bases, maps):
+            for tids, docids, freqs in seg.index.iter_postings(batch_postings):
+                live = ~seg.deleted[docids]
+                yield tid_map[tids[live]], docids[live] + base, freqs[live]
+
+    def cursor(self, term):
+        docids, freqs = self.postings(term)
+        return ArrayCursor(docids, freqs) if len(docids) else None
+
+    def occurrences(self, term, docids):
+        """Positions per segment (phrase/near come from InvertedIndex); docids must be live."""
+        with self.lock:
+            segments, bases = self.segments, self.bases
+        cuts = np.searchsorted(docids, bases)
+        owners, positions = [], []
+        for seg, base, lo, hi in zip(segments, bases, cuts[:-1], cuts[1:]):
+            if hi > lo:
+                owner, pos = seg.index.occurrences(term, docids[lo:hi] - base)
+                owners.append(owner + lo)
+                positions.append(pos)
+        if not owners:
+            return EMPTY_POSTINGS
+        return np.concatenate(owners), np.concatenate(positions)
+
+    def stats(self):
+        stats = [seg.index.stats() for seg in self.segments]
+        postings = sum(s["postings"] for s in stats)
+        postings_bytes = sum(s["postings_bytes"] for s in stats)
+        return {
+            "segments": len(self.segments),
+            "live_docs": self.n_docs,
+            "deleted_docs": int(sum(np.count_nonzero(seg.deleted) for seg in self.segments)),
+            "postings": postings,
+            "postings_bytes": postings_bytes,
+            "bytes_per_posting": postings_bytes / max(postings, 1),
+            "vocabulary_bytes": sum(s["vocabulary_bytes"] for s in stats),
+            "positions_bytes": sum(s["positions_bytes"] for s in stats),
+            "bitmaps_bytes": sum(s["bitmaps_bytes"] for s in stats),
+        }
+
+    # -----------------------
+    # Updates
+    # -----------------------
+    def delete(self, post_ids):
+        """Tombstone every live version of the given posts; returns how many were deleted."""
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        n = 0
+        with self.lock:
+            for seg in self.segments:
+                hit = np.isin(seg.index.doc_ids, post_ids) & ~seg.deleted
+                if hit.any():
+                    seg.deleted |= hit
+                    seg.deleted_docids = np.flatnonzero(seg.deleted)
+                    n += int(np.count_nonzero(hit))
+                    self.write_tombstones(seg)
+            if n:
+                self.commit(self.manifest["segments"])
+        return n
+
+    def add_documents(self, post_ids, texts, merge=True):
+        """Index new or edited posts as one new segment (older versions get tombstoned)."""
+        post_ids = [int(pid) for pid in post_ids]
+        if not post_ids:
+            return None
+        builder = IndexBuilder(self.analyzer, self.manifest.get("positions", False))
+        builder.add_batch(post_ids, list(self.analyzer.analyze_many(texts, builder.vocabulary)))
+        index = builder.build()
+        with self.lock:
+            self.delete(post_ids)
+            name = self.new_segment_name()
+            index_store.save_index(index, os.path.join(self.dir, name), fields=self.manifest["fields"])
+            self.commit(self.manifest["segments"] + [name])
+            self.reload()
+        if merge:
+            self.maybe_merge(background=True)
+        return name
+
+    # -----------------------
+    # Merging
+    # -----------------------
+    def plan_merge(self):
+        """(first, stop) slice of adjacent segments to merge next, or None."""
+        live = [seg.n_live for seg in self.segments]
+        if len(live) > MAX_SEGMENTS:
+            windows = [(sum(live[i:i + MERGE_FACTOR]), i) for i in range(len(live) - MERGE_FACTOR + 1)]
+            _, first = min(windows)
+            return first, first + MERGE_FACTOR
+        for i, seg in enumerate(self.segments):
+            if seg.index.n_docs and np.count_nonzero(seg.deleted) > PURGE_RATIO * seg.index.n_docs:
+                return i, i + 1
+        return None
+
+    def maybe_merge(self, background=False):
+        """Run the merge policy until it is satisfied, optionally on a background thread."""
+        if background:
+            if self.merge_thread is None or not self.merge_thread.is_alive():
+                self.merge_thread = threading.Thread(target=self.maybe_merge, daemon=True)
+                self.merge_thread.start()
+            return
+        while self.merge_once():
+            pass
+
+    def wait_for_merges(self):
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+
+    def merge_once(self):
+        with self.lock:
+            plan = self.plan_merge()
+            if plan is None:
+                return False
+            sources = self.segments[plan[0]:plan[1]]
+            names = [seg.name for seg in sources]
+            snapshot = [~seg.deleted for seg in sources]
+            name = self.new_segment_name()
+            dump_cache.write_manifest(self.dir, self.manifest)
+        # The expensive part runs without the lock; queries and updates continue meanwhile
+        seg_dir = os.path.join(self.dir, name)
+        work_dir = seg_dir + ".merging"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        try:
+            merged = spimi.merge_runs([os.path.join(self.dir, n) for n in names], work_dir,
+                                      MERGE_BATCH_POSTINGS, self.analyzer, live=snapshot)
+            index_store.save_index(merged, seg_dir, fields=self.manifest["fields"])
+            del merged
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        with self.lock:
+            # Carry over deletions that happened while merging
+            current = {seg.name: seg for seg in self.segments}
+            deleted = np.concatenate([current[n].deleted[keep] for n, keep in zip(names, snapshot)])
+            merged_seg = Segment(name, None, deleted)
+            if deleted.any():
+                self.write_tombstones(merged_seg)
+            segments = self.manifest["segments"]
+            first = segments.index(names[0])
+            self.commit(segments[:first] + [name] + segments[first + len(names):])
+            self.reload()
+            for n in names:
+                shutil.rmtree(os.path.join(self.dir, n), ignore_errors=True)
+                tombstones = os.path.join(self.dir, n + ".deleted")
+                if os.path.exists(tombstones):
+                    os.remove(tombstones)
+        return True
+
+
+# -----------------------
+# Create / open / update from a dump
+# -----------------------
+def create_segments(path, segments_dir=None, fields=index_store.DEFAULT_FIELDS, workers=None,
+                    positions=False):
+    """Start a segments directory whose first segment is a full build of the dump."""
+    path = dump_reader.resolve_dump_path(path)
+    segments_dir = segments_dir or segments_dir_for(path, fields)
+    shutil.rmtree(segments_dir, ignore_errors=True)
+    os.makedirs(segments_dir)
+    name = "seg-000001"
+    index_store.build_index(path, os.path.join(segments_dir, name), fields, workers=workers,
+                            positions=positions)
+    manifest = {
+        "version": index_store.INDEX_VERSION,
+        "fields": list(fields),
+        "positions": positions,
+        "generation": 1,
+        "next_segment": 1,
+        "segments": [name],
+        "watermark": str(dump_watermark(path)),
+    }
+    dump_cache.write_manifest(segments_dir, manifest)
+    return manifest
+
+
+def open_segments(path, segments_dir=None, fields=index_store.DEFAULT_FIELDS, analyzer=default_analyzer,
+                  positions=False):
+    """Open the segmented index of a dump, creating it with a full build if missing (or without positions)."""
+    path = dump_reader.resolve_dump_path(path)
+    segments_dir = segments_dir or segments_dir_for(path, fields)
+    manifest = dump_cache.read_manifest(segments_dir)
+    if manifest is None or (positions and not manifest.get("positions")):
+        create_segments(path, segments_dir, fields, positions=positions)
+    return SegmentedIndex(segments_dir, analyzer)
+
+
+def last_changed(chunk):
+    """Per row: the later of CreationDate and LastEditDate."""
+    return chunk[DATE_COLUMNS].max(axis=1)
+
+
+def dump_watermark(path):
+    """Latest creation/edit time in a dump."""
+    latest = [last_changed(chunk).max() for chunk in dump_reader.iter_chunks(path, DATE_COLUMNS)]
+    return pd.Series(latest, dtype="datetime64[ns]").max()
+
+
+def update_from_dump(index, path):
+    """Bring a SegmentedIndex up to date with a refreshed dump.
+
+    Posts created or edited after the stored watermark are indexed into one
+    new segment; posts missing from the dump are tombstoned. Returns counts.
+    """
+    path = dump_reader.resolve_dump_path(path)
+    fields = index.manifest["fields"]
+    watermark = pd.Timestamp(index.manifest["watermark"])
+    changed_ids, texts, seen, latest = [], [], [], [watermark]
+    for chunk in dump_reader.iter_chunks(path, ["Id"] + DATE_COLUMNS + fields):
+        seen.append(chunk["Id"].to_numpy())
+        changed = last_changed(chunk)
+        latest.append(changed.max())
+        delta = chunk[(changed > watermark).to_numpy()]
+        if len(delta):
+            changed_ids.extend(delta["Id"].tolist())
+            texts.extend(index_store.document_texts(delta, fields))
+    seen = np.concatenate(seen) if seen else np.zeros(0, dtype=np.int64)
+    live_ids = index.doc_ids[~np.concatenate([seg.deleted for seg in index.segments])]
+    removed = np.setdiff1d(live_ids, seen)
+    with index.lock:
+        n_removed = index.delete(removed)
+        if changed_ids:
+            index.add_documents(changed_ids, texts, merge=False)
+        index.commit(index.manifest["segments"], watermark=str(pd.Series(latest, dtype="datetime64[ns]").max()))
+    index.maybe_merge(background=True)
+    return {"indexed": len(changed_ids), "deleted": n_removed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the segmented (incremental) index of a dump.")
+    parser.add_argument("command", choices=["update", "merge", "info"])
+    parser.add_argument("dump", help="Posts.xml (or .zip)")
+    parser.add_argument("--fields", nargs="+", default=list(index_store.DEFAULT_FIELDS))
+    parser.add_argument("--workers", type=int, default=1, help="processes for the initial full build")
+    parser.add_argument("--positions", action="store_true", help="store positions (initial full build)")
+    args = parser.parse_args(argv)
+
+    path = dump_reader.resolve_dump_path(args.dump)
+    segments_dir = segments_dir_for(path, args.fields)
+    start = time.time()
+    if args.command == "update" and dump_cache.read_manifest(segments_dir) is None:
+        create_segments(path, segments_dir, args.fields, args.workers, args.positions)
+        print(f"Full build in {time.time() - start:.2f}s -> {segments_dir}")
+        return
+    index = SegmentedIndex(segments_dir)
+    if args.command == "update":
+        counts = update_from_dump(index, path)
+        print(f"Indexed {counts['indexed']} new/edited posts, deleted {counts['deleted']} "
+              f"in {time.time() - start:.2f}s")
+    elif args.command == "merge":
+        index.maybe_merge()
+    index.wait_for_merges()
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# sharded_build.py
+# Parallel index construction: one partial index per docID range, merged
+# into exactly the bytes a serial build writes.
+#
+#   python src/index_store.py build data/Posts.xml --workers 8
+#
+# The documents are split into `workers` consecutive shards. A shard is a row
+# range of the columnar dump cache or, without a cache, a <row-aligned byte
+# range of the XML. Each worker process inverts its shard with its own
+# IndexBuilder and saves it as a run (a small sorted index, like SPIMI runs).
+# Shards cover consecutive docID ranges in document order, so
+# spimi.merge_runs only has to place each run's lists after the previous
+# runs' lists, with no re-sorting. The merged index is byte-identical to
+# the serial build_index output.
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import dump_cache
+import dump_reader
+import index_store
+import spimi
+from analyzer import default_analyzer
+from inverted_index import IndexBuilder
+
+MERGE_BATCH_POSTINGS = 1 << 22
+
+
+def plan_shards(path, columns, workers):
+    """Consecutive shards in document order: ("rows", start, stop) or ("bytes", start, stop)."""
+    schema = dump_reader.schema_for(path)
+    cached = dump_reader.cached_source(path, columns, schema, workers)
+    if cached is not None:
+        n_rows = cached[0]["rows"]
+        cuts = [n_rows * i // workers for i in range(workers + 1)]
+        return [("rows", a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+    if dump_reader.use_parallel(path, workers):
+        return [("bytes", a, b) for a, b in dump_reader.row_byte_ranges(path, workers)]
+    return None
+
+
+def shard_chunks(path, shard, columns):
+    kind, start, stop = shard
+    if kind == "rows":
+        manifest = dump_cache.fresh_manifest(path)
+        yield from dump_cache.iter_cached_chunks(path, manifest, columns, dump_reader.DEFAULT_CHUNK_SIZE,
+                                                 start=start, stop=stop)
+    else:
+        yield dump_reader.parse_byte_range(path, start, stop, columns, dump_reader.schema_for(path))
+
+
+def build_shard(path, shard, fields, analyzer, run_dir, positions=False):
+    """Worker: invert one shard and save it as a run; returns (run_dir, stage report)."""
+    report = index_store.BuildReport()
+    builder = IndexBuilder(analyzer, positions)
+    for chunk in report.timed("parse", shard_chunks(path, shard, ["Id"] + list(fields))):
+        index_store.add_chunk(builder, chunk, fields, report)
+    with report.stage("finalize"):
+        index = builder.build()
+        del builder
+    with report.stage("write"):
+        index_store.save_index(index, run_dir, fields=fields, plain=True)
+    return run_dir, report.as_dict()
+
+
+def build_index_sharded(path, index_dir, workers, fields=index_store.DEFAULT_FIELDS,
+                        analyzer=default_analyzer, report=None, positions=False):
+    """Index a dump with `workers` processes; returns the index meta."""
+    path = dump_reader.resolve_dump_path(path)
+    report = report or index_store.BuildReport()
+    shards = plan_shards(path, ["Id"] + list(fields), workers)
+    if not shards:
+        # A .zip without a usable cache cannot be split; fall back to one process
+        return index_store.build_index(path, index_dir, fields, analyzer, positions=positions)
+    source = dump_cache.source_fingerprint(path)
+    runs_dir = dump_cache.building_dir(index_dir, "runs")
+    try:
+        run_dirs = [os.path.join(runs_dir, f"shard-{i:05d}") for i in range(len(shards))]
+        with report.stage("shards"), ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build_shard, path, shard, fields, analyzer, run_dir, positions)
+                       for shard, run_dir in zip(shards, run_dirs)]
+            for future in futures:
+                # Worker stage times are summed (CPU time across processes, not wall time)
+                report.add(future.result()[1])
+        with report.stage("merge"):
+            index = spimi.merge_runs(run_dirs, runs_dir, MERGE_BATCH_POSTINGS, analyzer)
+        meta = index_store.save_index(index, index_dir, source, fields, report=report, runs=len(run_dirs),
+                                      workers=workers)
+        del index
+    finally:
+        shutil.rmtree(runs_dir, ignore_errors=True)
+    return meta
@@ -0,0 +1,222 @@
+# spimi.py
+# External-memory (SPIMI) index construction under a fixed RAM budget.
+#
+#   python src/index_store.py build data/Posts.xml --memory-budget 512M
+#
+# Documents are inverted in memory by an IndexBuilder with its own, fresh
+# vocabulary. When the builder's estimated footprint reaches the budget it is
+# frozen into a run: a small sorted, compressed index written with
+# save_index(plain=True), postings only (the merge just decodes them, so
+# runs get no skips, bitmaps or BM25 arrays). Runs go to a scratch
+# directory of their own next to the index (<index dir>.runs-XXXX/), so
+# concurrent builds of the same index never delete each other's runs.
+# After the last document the runs are k-way merged term by term
+# (heapq.merge over their sorted dictionaries) and the merged posting lists
+# are streamed to disk, so peak memory is one run plus the per-term offsets
+# of the final index, whatever the dump size.
+import heapq
+import os
+import shutil
+
+import numpy as np
+
+import dump_cache
+import dump_reader
+import index_store
+from analyzer import default_analyzer
+from inverted_index import IndexBuilder, InvertedIndex
+from postings import (PositionsStore, PostingsStore, decode_flat, encode_flat, encode_positions, term_batches,
+                      varint_decode)
+from term_dictionary import TermDictionary
+
+# Rough per-item costs of an IndexBuilder, used to decide when to flush a run
+BYTES_PER_POSTING = 12   # term id, docID and freq as int32
+BYTES_PER_TERM = 150     # str object + dict slot in the build vocabulary
+BYTES_PER_DOC = 12       # post Id (int64) + doc length (int32)
+BYTES_PER_POSITION = 4   # one int32 gap per occurrence, with positions
+# Decoded postings held by one merge batch cost ~48 bytes each (int64 docID,
+# freq, term id and target slot), so a batch gets budget // 48 of them
+MERGE_BYTES_PER_POSTING = 48
+CHUNK_SIZE = 10_000      # rows per chunk, so the budget is checked often
+
+
+def builder_bytes(builder):
+    return (len(builder.term_ids) * BYTES_PER_POSTING
+            + len(builder.vocabulary) * BYTES_PER_TERM
+            + len(builder.doc_ids) * BYTES_PER_DOC
+            + len(builder.position_gaps or ()) * BYTES_PER_POSITION)
+
+
+# -----------------------
+# Runs
+# -----------------------
+def write_run(builder, runs_dir, n_runs):
+    run_dir = os.path.join(runs_dir, f"run-{n_runs:05d}")
+    index_store.save_index(builder.build(), run_dir, fields=(), plain=True)
+    return run_dir
+
+
+def iter_run_terms(run_no, run):
+    for tid, term in enumerate(run.terms):
+        yield term, run_no, tid
+
+
+def merge_vocabularies(runs):
+    """Sorted union of the run vocabularies, plus run tid -> merged tid maps."""
+    terms = []
+    run_maps = [np.empty(len(run.terms), dtype=np.int64) for run in runs]
+    for term, run_no, tid in heapq.merge(*(iter_run_terms(i, run) for i, run in enumerate(runs))):
+        if not terms or terms[-1] != term:
+            terms.append(term)
+        run_maps[run_no][tid] = len(terms) - 1
+    return terms, run_maps
+
+
+def live_doc_freqs(run, keep, batch_postings):
+    """Postings per term of a run counting only docIDs where `keep` is True."""
+    store = run.postings_store
+    if keep is None:
+        return np.asarray(store.doc_freqs)
+    dfs = np.asarray(store.doc_freqs)
+    out = np.zeros(len(dfs), dtype=np.int64)
+    for lo, hi in term_batches(dfs, batch_postings):
+        docids, _ = decode_flat(store.data, store.offsets, dfs, lo, hi)
+        slot = np.repeat(np.arange(hi - lo), dfs[lo:hi])
+        out[lo:hi] = np.bincount(slot[keep[docids]], minlength=hi - lo)
+    return out
+
+
+def merge_runs(run_dirs, work_dir, batch_postings, analyzer=default_analyzer, live=None):
+    """K-way merge saved runs into one InvertedIndex whose postings are a memmap in `work_dir`.
+
+    Runs hold consecutive document ranges, so a term's merged list is the
+    concatenation of its per-run lists in run order, shifted by each run's
+    first docID. Terms are merged in batches of about `batch_postings`
+    postings: a batch is a contiguous term-id range in every run, so each
+    run contributes one bulk decode_flat, scattered into place, and each
+    batch one encode_flat. Positions, if the runs have them, travel with
+    their postings as raw gaps (each posting's gaps restart from 0, so they
+    never need re-basing) and are re-encoded per batch.
+
+    `live` optionally gives one bool mask per run (None = keep all): docs
+    where it is False are dropped, the rest renumbered densely, and terms
+    left without postings are dropped (segment merges purge deletes this way).
+    """
+    runs = [index_store.load_index(d, analyzer) for d in run_dirs]
+    live = live or [None] * len(runs)
+    ranks = [None if keep is None else np.cumsum(keep) - 1 for keep in live]
+    n_live = [run.n_docs if keep is None else int(np.count_nonzero(keep)) for run, keep in zip(runs, live)]
+    bases = np.cumsum([0] + n_live)
+    terms, run_maps = merge_vocabularies(runs)
+    doc_freqs = np.zeros(len(terms), dtype=np.int64)
+    for run, run_map, keep in zip(runs, run_maps, live):
+        doc_freqs[run_map] += live_doc_freqs(run, keep, batch_postings)
+    if any(keep is not None for keep in live):
+        kept = doc_freqs > 0
+        # A dropped term maps onto the previous kept id; its postings are all filtered out
+        new_ids = np.cumsum(kept) - 1
+        terms = [term for term, k in zip(terms, kept.tolist()) if k]
+        run_maps = [new_ids[run_map] for run_map in run_maps]
+        doc_freqs = doc_freqs[kept]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    batches = term_batches(doc_freqs, batch_postings)  # in merged term ids
+
+    with_positions = all(run.positions is not None for run in runs)
+    postings_path = os.path.join(work_dir, "postings.bin")
+    positions_path = os.path.join(work_dir, "positions.bin")
+    position_blocks, position_bytes = [], 0
+    with open(postings_path, "wb") as out, open(positions_path, "wb") as positions_out:
+        for lo, hi in batches:
+            counts = doc_freqs[lo:hi]
+            n = int(counts.sum())
+            starts = np.cumsum(counts) - counts  # first slot of each term in the batch
+            filled = np.zeros(hi - lo, dtype=np.int64)
+            docids, freqs = np.empty(n, dtype=np.int64), np.empty(n, dtype=np.int64)
+            placed = []  # (slots, freqs, gaps) per run, placed once every freq is known
+            for run, run_map, base, keep, rank in zip(runs, run_maps, bases, live, ranks):
+                store = run.postings_store
+                r_lo, r_hi = np.searchsorted(run_map, [lo, hi])
+                run_docids, run_freqs = decode_flat(store.data, store.offsets, store.doc_freqs, r_lo, r_hi)
+                local = run_map[r_lo:r_hi] - lo
+                run_counts = np.asarray(store.doc_freqs[r_lo:r_hi])
+                if with_positions:
+                    start, stop = run.positions.byte_range(r_lo, r_hi)
+                    run_gaps = varint_decode(run.positions.data[start:stop])
+                if keep is not None:
+                    alive = keep[run_docids]
+                    if with_positions:
+                        run_gaps = run_gaps[np.repeat(alive, run_freqs)]
+                    slot = np.repeat(np.arange(r_hi - r_lo), run_counts)[alive]
+                    run_counts = np.bincount(slot, minlength=r_hi - r_lo)
+                    run_docids, run_freqs = rank[run_docids[alive]], run_freqs[alive]
+                # Scatter this run's lists behind the earlier runs' parts of the same terms;
+                # docID ranges do not overlap, so nothing needs re-sorting
+                term_of = np.repeat(local, run_counts)
+                within = np.arange(len(run_docids)) - np.repeat(np.cumsum(run_counts) - run_counts, run_counts)
+                pos = starts[term_of] + filled[term_of] + within
+                docids[pos] = run_docids + base
+                freqs[pos] = run_freqs
+                np.add.at(filled, local, run_counts)
+                if with_positions:
+                    placed.append((pos, run_freqs, run_gaps))
+            data, batch_offsets = encode_flat(counts, docids, freqs)
+            out.write(data.tobytes())
+            offsets[lo + 1:hi + 1] = offsets[lo] + batch_offsets[1:]
+            if with_positions:
+                gaps = np.empty(int(freqs.sum()), dtype=np.int64)
+                value_starts = np.cumsum(freqs) - freqs
+                for pos, run_freqs, run_gaps in placed:
+                    within = np.arange(len(run_gaps)) - np.repeat(np.cumsum(run_freqs) - run_freqs, run_freqs)
+                    gaps[np.repeat(value_starts[pos], run_freqs) + within] = run_gaps
+                data, blocks = encode_positions(counts, freqs, gaps)
+                positions_out.write(data.tobytes())
+                position_blocks.append(blocks[:-1] + position_bytes)
+                position_bytes += len(data)
+
+    data = index_store.map_array(postings_path, np.uint8, int(offsets[-1]))
+    postings = PostingsStore(data, offsets, doc_freqs)
+    positions = None
+    if with_positions:
+        blocks = np.concatenate(position_blocks + [[position_bytes]]).astype(np.int64)
+        positions = PositionsStore(index_store.map_array(positions_path, np.uint8, position_bytes),
+                                   blocks, doc_freqs)
+    doc_ids = np.concatenate([np.asarray(run.doc_ids) if keep is None else np.asarray(run.doc_ids)[keep]
+                              for run, keep in zip(runs, live)])
+    doc_lengths = np.concatenate([np.asarray(run.doc_lengths) if keep is None
+                                  else np.asarray(run.doc_lengths)[keep] for run, keep in zip(runs, live)])
+    return InvertedIndex(TermDictionary.from_sorted_terms(terms), postings, doc_ids, doc_lengths, analyzer,
+                         positions)
+
+
+# -----------------------
+# Build
+# -----------------------
+def build_index_spimi(path, index_dir, memory_budget, fields=index_store.DEFAULT_FIELDS,
+                      analyzer=default_analyzer, report=None, chunk_size=CHUNK_SIZE, positions=False):
+    """Index a dump within `memory_budget` bytes of build state; returns the index meta."""
+    path = dump_reader.resolve_dump_path(path)
+    source = dump_cache.source_fingerprint(path)
+    report = report or index_store.BuildReport()
+    runs_dir = dump_cache.building_dir(index_dir, "runs")
+    try:
+        run_dirs = []
+        builder = IndexBuilder(analyzer, positions)
+        chunks = dump_reader.iter_chunks(path, ["Id"] + list(fields), chunk_size=chunk_size)
+        for chunk in report.timed("parse", chunks):
+            index_store.add_chunk(builder, chunk, fields, report)
+            if builder_bytes(builder) >= memory_budget:
+                with report.stage("flush"):
+                    run_dirs.append(write_run(builder, runs_dir, len(run_dirs)))
+                    builder = IndexBuilder(analyzer, positions)
+        if len(builder.doc_ids) or not run_dirs:
+            with report.stage("flush"):
+                run_dirs.append(write_run(builder, runs_dir, len(run_dirs)))
+        del builder
+        with report.stage("merge"):
+            batch = max(memory_budget // MERGE_BYTES_PER_POSTING, 1 << 16)
+            index = merge_runs(run_dirs, runs_dir, batch, analyzer)
+        meta = index_store.save_index(index, index_dir, source, fields, report=report, runs=len(run_dirs))
+        del index
+    finally:
+        shutil.rmtree(runs_dir, ignore_errors=True)
+    return meta
@@ -0,0 +1,162 @@
+# tag_index.py
+# Tag -> docID bitmaps, with facet counts (top tags) over any set of posts.
+#
+#   python src/tag_index.py top data/Posts.xml -n 20
+#   python src/tag_index.py facets data/Posts.xml '"elden ring" AND boss' -n 10
+#
+#   tags = open_tag_index(posts_path)       # builds on first use
+#   tags.top(10)                            # [(tag, posts)], whole dump
+#   tags.facets(docids, 10)                 # top tags among a result set
+#   tags.facets(tags.docids_for(post_ids))  # ... given post Ids (ranked results)
+#   tags.bitmap("dark-souls")               # RoaringBitmap of the tag's posts
+#
+# The tag index is a saved index (index_store format) of the Tags field,
+# analyzed with the KeywordAnalyzer, so it is cached, versioned and rebuilt
+# like any other index. Its internal docIDs are the dump's row order, the
+# same as in every other index of the dump, so docIDs from
+# query_parser.evaluate or BM25 scoring can be passed straight in (a
+# SegmentedIndex's cannot).
+#
+# Facet counts are bitmap intersection cardinalities, |tag AND candidates|
+# for every tag at once, chunk by chunk as in roaring.py: a tag's dense
+# 64K chunks (more than ARRAY_MAX posts) are ANDed with the candidates'
+# words and popcounted, its sparse chunks' docIDs are probed against the
+# candidate bits. The chunks come from one decode of the whole (small) tag
+# postings on first use, so no per-tag bitmaps are saved beyond the usual
+# frequent-term ones. All tags go through a handful of numpy calls; without
+# a candidate set the counts are just the tags' document frequencies.
+import argparse
+import time
+
+import numpy as np
+
+import dump_reader
+import index_store
+from analyzer import keyword_analyzer
+from postings import decode_flat
+from roaring import ARRAY_MAX, CHUNK, CHUNK_BITS, RoaringBitmap, bit_counts
+
+TAG_FIELDS = ("Tags",)
+
+
+class TagIndex:
+    """Facet counts over the Tags field's InvertedIndex."""
+
+    def __init__(self, index):
+        self.index = index
+        self.doc_ids = index.doc_ids
+        self.counts = np.asarray(index.postings_store.doc_freqs, dtype=np.int64)  # posts per tag
+        self.layout = None      # see build_layout, made on first use
+        self.post_order = None  # argsort of doc_ids, for docids_for
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def n_docs(self):
+        return len(self.doc_ids)
+
+    def tag(self, tid):
+        return self.index.terms.term(tid)
+
+    def bitmap(self, tag):
+        """RoaringBitmap of the posts carrying a tag."""
+        return self.index.bitmap(tag.lower())
+
+    def docids_for(self, post_ids):
+        """Sorted internal docIDs of post Ids (unknown Ids are dropped)."""
+        if self.post_order is None:
+            self.post_order = np.argsort(self.doc_ids, kind="stable")
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        sorted_ids = np.asarray(self.doc_ids)[self.post_order]
+        at = np.minimum(np.searchsorted(sorted_ids, post_ids), max(len(sorted_ids) - 1, 0))
+        found = sorted_ids[at] == post_ids if len(sorted_ids) else np.zeros(len(post_ids), dtype=bool)
+        return np.unique(self.post_order[at[found]])
+
+    def build_layout(self):
+        """Every tag's postings split into dense chunks (bitmap words) and sparse docIDs."""
+        store = self.index.postings_store
+        docids, _ = decode_flat(store.data, store.offsets, self.counts, 0, len(self.counts))
+        owner = np.repeat(np.arange(len(self.counts)), self.counts)
+        # (tag, chunk) groups are contiguous: postings are sorted by tag, then docID
+        key = docids >> CHUNK_BITS
+        starts = np.flatnonzero(np.r_[True, (owner[1:] != owner[:-1]) | (key[1:] != key[:-1])])
+        sizes = np.diff(np.r_[starts, len(docids)])
+        dense = sizes > ARRAY_MAX
+        in_dense = np.repeat(dense, sizes)
+        bits = np.zeros((int(dense.sum()), CHUNK), dtype=bool)
+        row = np.repeat(np.cumsum(dense) - 1, sizes)[in_dense]
+        bits[row, docids[in_dense] & (CHUNK - 1)] = True
+        self.layout = {
+            "sparse_docids": docids[~in_dense],
+            "sparse_owner": owner[~in_dense],
+            "dense_words": np.packbits(bits, axis=1, bitorder="little").view(np.uint64),
+            "dense_owner": owner[starts[dense]],
+            "dense_key": key[starts[dense]],
+        }
+        return self.layout
+
+    def tag_counts(self, docids=None):
+        """Posts per tag id among sorted internal `docids` (a RoaringBitmap also works)."""
+        if docids is None:
+            return self.counts
+        if isinstance(docids, RoaringBitmap):
+            docids = docids.to_array()
+        layout = self.layout or self.build_layout()
+        n_chunks = (self.n_docs >> CHUNK_BITS) + 1
+        candidates = np.zeros(n_chunks * CHUNK, dtype=bool)
+        candidates[np.asarray(docids, dtype=np.int64)] = True
+        # Float weights throughout: bincount of an empty group would otherwise come back int64
+        counts = np.bincount(layout["sparse_owner"], weights=candidates[layout["sparse_docids"]].astype(np.float64),
+                             minlength=len(self.counts)).astype(np.float64)
+        if len(layout["dense_owner"]):
+            words = np.packbits(candidates, bitorder="little").view(np.uint64).reshape(n_chunks, -1)
+            overlap = bit_counts(layout["dense_words"] & words[layout["dense_key"]]).sum(axis=1)
+            counts += np.bincount(layout["dense_owner"], weights=overlap, minlength=len(self.counts))
+        return counts.astype(np.int64)
+
+    def facets(self, docids=None, n=10):
+        """Top `n` [(tag, posts)] among `docids` (the whole dump if None), ties by tag name."""
+        counts = self.tag_counts(docids)
+        tids = np.flatnonzero(counts)
+        tids = tids[np.lexsort((tids, -counts[tids]))[:n]]
+        return [(self.tag(int(t)), int(counts[t])) for t in tids]
+
+    def top(self, n=10):
+        """Most used tags of the whole dump."""
+        return self.facets(None, n)
+
+
+def open_tag_index(path, workers=None):
+    """Open the tag index of a dump, (re)building it if missing or stale."""
+    return TagIndex(index_store.open_index(path, fields=TAG_FIELDS, analyzer=keyword_analyzer, workers=workers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tag facet counts over the whole dump or a Boolean query.")
+    parser.add_argument("command", choices=["top", "facets"])
+    parser.add_argument("dump", help="Posts.xml (or .zip)")
+    parser.add_argument("query", nargs="?", help="Boolean query (facets), see query_parser.py")
+    parser.add_argument("-n", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    path = dump_reader.resolve_dump_path(args.dump)
+    tags = open_tag_index(path)
+    docids = None
+    if args.command == "facets":
+        import query_parser
+
+        if not args.query:
+            parser.error("facets needs a query")
+        index = index_store.open_index(path, positions=True)
+        docids = query_parser.evaluate(query_parser.parse(args.query, index.analyzer), index)
+        print(f"{len(docids)} matching posts")
+    start = time.perf_counter()
+    facets = tags.facets(docids, args.n)
+    print(f"{len(tags)} tags, facets in {(time.perf_counter() - start) * 1e3:.2f} ms")
+    for tag, count in facets:
+        print(f"{count:8d}  {tag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# term_dictionary.py
+# Sorted, front-coded vocabulary mapping terms to dense integer ids.
+#
+#   terms, remap = freeze_vocabulary(builder_vocab)   # {term: provisional id}
+#   terms.get("sekiro")  -> 5123  (None if absent)
+#   terms.term(5123)     -> "sekiro"
+#
+# Term ids are ranks in sorted order. Terms are stored as UTF-8 in blocks of
+# BLOCK_SIZE: the first term of a block in full, the others as
+# (shared prefix length, suffix). A lookup bisects the block head terms
+# (in C, via bisect) and then decodes at most one block. Recently looked-up
+# terms are kept in a small bounded dict, so hot query terms resolve at
+# plain dict speed while the full vocabulary stays front-coded.
+from bisect import bisect_right
+
+import numpy as np
+
+BLOCK_SIZE = 16
+LOOKUP_CACHE_SIZE = 65536
+
+
+def write_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(buf, pos):
+    n = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class TermDictionary:
+    """Read-only sorted vocabulary; `blob` may be bytes or a memory-mapped buffer."""
+
+    def __init__(self, blob, block_offsets, n_terms):
+        self.blob = blob
+        self.block_offsets = np.asarray(block_offsets, dtype=np.int64)
+        self.n_terms = int(n_terms)
+        self.offsets = self.block_offsets.tolist()
+        self.heads = [self.read_head(off) for off in self.offsets]
+        self.cache = {}
+
+    @classmethod
+    def from_sorted_terms(cls, terms):
+        """Front-code an already sorted list of unique terms."""
+        out = bytearray()
+        block_offsets = []
+        prev = b""
+        for i, term in enumerate(terms):
+            data = term.encode("utf-8")
+            if i % BLOCK_SIZE == 0:
+                block_offsets.append(len(out))
+                write_varint(out, len(data))
+                out += data
+            else:
+                shared = common_prefix(prev, data)
+                write_varint(out, shared)
+                write_varint(out, len(data) - shared)
+                out += data[shared:]
+            prev = data
+        return cls(bytes(out), block_offsets, len(terms))
+
+    def read_head(self, offset):
+        length, pos = read_varint(self.blob, offset)
+        return bytes(self.blob[pos:pos + length])
+
+    def decode_block(self, block):
+        """All terms of one block as UTF-8 bytes."""
+        blob = self.blob
+        count = min(BLOCK_SIZE, self.n_terms - block * BLOCK_SIZE)
+        length, pos = read_varint(blob, self.offsets[block])
+        prev = bytes(blob[pos:pos + length])
+        pos += length
+        terms = [prev]
+        for _ in range(count - 1):
+            shared, pos = read_varint(blob, pos)
+            length, pos = read_varint(blob, pos)
+            prev = prev[:shared] + bytes(blob[pos:pos + length])
+            pos += length
+            terms.append(prev)
+        return terms
+
+    def __len__(self):
+        return self.n_terms
+
+    def get(self, term, default=None):
+        """Id of `term`, or `default` if it is not in the vocabulary."""
+        tid = self.cache.get(term, -2)
+        if tid == -2:
+            tid = self.search(term)
+            if len(self.cache) >= LOOKUP_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[term] = tid
+        return default if tid < 0 else tid
+
+    def search(self, term):
+        """Uncached lookup: id of `term` or -1."""
+        key = term.encode("utf-8")
+        block = bisect_right(self.heads, key) - 1
+        if block < 0:
+            return -1
+        if self.heads[block] == key:
+            return block * BLOCK_SIZE
+        blob = self.blob
+        count = min(BLOCK_SIZE, self.n_terms - block * BLOCK_SIZE)
+        length, pos = read_varint(blob, self.offsets[block])
+        prev = self.heads[block]
+        pos += length
+        for i in range(1, count):
+            shared, pos = read_varint(blob, pos)
+            length, pos = read_varint(blob, pos)
+            prev = prev[:shared] + bytes(blob[pos:pos + length])
+            pos += length
+            if prev == key:
+                return block * BLOCK_SIZE + i
+            if prev > key:
+                break
+        return -1
+
+    def __getitem__(self, term):
+        tid = self.get(term)
+        if tid is None:
+            raise KeyError(term)
+        return tid
+
+    def __contains__(self, term):
+        return self.get(term) is not None
+
+    def term(self, tid):
+        """Term string for an id."""
+        if not 0 <= tid < self.n_terms:
+            raise IndexError(tid)
+        block, i = divmod(tid, BLOCK_SIZE)
+        return self.decode_block(block)[i].decode("utf-8")
+
+    def __iter__(self):
+        for block in range(len(self.offsets)):
+            for data in self.decode_block(block):
+                yield data.decode("utf-8")
+
+    @property
+    def nbytes(self):
+        return len(self.blob) + self.block_offsets.nbytes + sum(len(h) for h in self.heads)
+
+
+def freeze_vocabulary(vocabulary):
+    """Turn a build-time {term: provisional id} dict into a TermDictionary.
+
+    Returns (terms, remap) where remap[provisional id] is the final (sorted) id.
+    Python str order is code-point order, which is also UTF-8 byte order.
+    """
+    ordered = sorted(vocabulary)
+    remap = np.empty(len(vocabulary), dtype=np.int64)
+    for new_id, term in enumerate(ordered):
+        remap[vocabulary[term]] = new_id
+    return TermDictionary.from_sorted_terms(ordered), remap
@@ -1,87 +1,50 @@
 # term_frequency_inverted_index.py
 import os
-import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
-from collections import Counter, defaultdict
-import nltk
-from nltk.corpus import stopwords
-import string
 import time
-
-# -----------------------
-# 0️⃣ Ensure NLTK stopwords are available
-# -----------------------
-nltk.download('stopwords')
-stop_words = set(stopwords.words('english'))
+from dump_reader import resolve_dump_path
+from analyzer import default_analyzer
+from bm25 import BM25
+from doc_store import open_doc_store
+from index_store import open_index
 
 # -----------------------
 # 1️⃣ Locate Posts.xml
 # -----------------------
-posts_file = "/content/IR_Project01/data/Posts.xml"
+posts_file = resolve_dump_path("/content/IR_Project01/data/Posts.xml")
 if not os.path.exists(posts_file):
-    posts_file = "Posts.xml"
+    posts_file = resolve_dump_path("Posts.xml")
 if not os.path.exists(posts_file):
     raise FileNotFoundError(f"Posts.xml not found in 'data/' or current directory ({os.getcwd()})")
 
 print(f"Using Posts.xml from: {posts_file}")
 
 # -----------------------
-# 2️⃣ Load and clean posts
-# -----------------------
-tree = ET.parse(posts_file)
-root = tree.getroot()
-
-posts = []
-for row in root.findall("row"):
-    post_id = int(row.attrib.get("Id"))
-    body = row.attrib.get("Body", "")
-    text = BeautifulSoup(body, "html.parser").get_text()
-    posts.append((post_id, text))
-
-# -----------------------
-# 3️⃣ Preprocessing function
+# 2️⃣ Open the on-disk index (built on first use, see index_store.py)
 # -----------------------
-def preprocess(text):
-    text = text.lower()
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    tokens = [w for w in text.split() if w.isalpha() and w not in stop_words]
-    return tokens
+# Shared with every other indexer and with query parsing (see analyzer.py)
+preprocess = default_analyzer.analyze
 
-# -----------------------
-# 4️⃣ Build inverted index with term frequency
-# -----------------------
 start_time = time.time()
-inverted_index = defaultdict(dict)  # term -> {post_id: freq}
-
-for post_id, text in posts:
-    tokens = preprocess(text)
-    freqs = Counter(tokens)
-    for term, freq in freqs.items():
-        inverted_index[term][post_id] = freq
-
+inverted_index = open_index(posts_file, fields=["Body"], workers=os.cpu_count())  # mmapped postings
 end_time = time.time()
-print(f"Inverted index built with {len(inverted_index)} unique terms in {end_time - start_time:.2f} seconds")
+print(f"Inverted index ready with {len(inverted_index)} unique terms in {end_time - start_time:.2f} seconds")
+scorer = BM25(inverted_index)  # saved doc norms and per-term bounds
 
 # -----------------------
-# 5️⃣ Term-at-a-time query
+# 3️⃣ Term-at-a-time query (BM25, MaxScore pruning)
 # -----------------------
 def term_at_a_time_search(query, top_k=50):
     query_tokens = preprocess(query)
-    doc_scores = defaultdict(int)  # post_id -> total score
-
-    for term in query_tokens:
-        postings = inverted_index.get(term, {})
-        for post_id, freq in postings.items():
-            doc_scores[post_id] += freq  # sum frequencies
-
-    ranked_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
-    return ranked_docs[:top_k]
+    # High-impact terms first; common terms are only looked up for docs that can still make the top_k
+    post_ids, scores = scorer.top_k(query_tokens, top_k)
+    return list(zip(post_ids.tolist(), scores.tolist()))
 
 # -----------------------
-# 6️⃣ Example usage
+# 4️⃣ Example usage
 # -----------------------
 query = "Playstation"
 results = term_at_a_time_search(query)
-print("Top results (post_id, total_frequency):")
+docs = open_doc_store(posts_file)
+print("Top results (post_id, bm25, title):")
 for pid, score in results:
-    print(pid, score)
+    print(pid, f"{score:.3f}", docs.get(pid, "Title") or "")
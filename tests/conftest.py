@@ -0,0 +1,84 @@
+# conftest.py
+# Shared fixtures: the modules under src/ on the path, and a small synthetic
+# Posts.xml (a few hundred posts over a skewed vocabulary, so the frequent
+# terms get skip entries and the builds split into several runs). Post
+# types, scores, answer counts, dates and tags vary from post to post, for
+# the metadata filters and tag facets.
+import os
+import sys
+from collections import Counter
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import dump_reader  # noqa: E402
+import index_store  # noqa: E402
+from analyzer import default_analyzer  # noqa: E402
+
+N_POSTS = 600
+TAGS = ["elden-ring", "dark-souls", "sekiro", "the-witcher-3", "pc", "xbox", "ps4", "mods", "steam"]
+WORDS = ["elden", "ring", "boss", "souls", "dark", "sekiro", "witcher", "crash", "download", "playstation",
+         "xbox", "steam", "mods", "save", "weapon", "horse", "upgrade", "online", "quest", "ending"]
+
+
+def post_rows(n_posts=N_POSTS, seed=7):
+    """Attributes of synthetic posts, one dict per row; words and tags drawn with Zipf-like weights."""
+    rng = np.random.default_rng(seed)
+    vocabulary = WORDS + [f"rare{i}" for i in range(200)]
+    weights = 1 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    tag_weights = 1 / np.arange(1, len(TAGS) + 1)
+    tag_weights /= tag_weights.sum()
+    rows = []
+    for i in range(n_posts):
+        question = i % 3 != 0
+        row = {
+            "Id": 2 * i + 1,
+            "PostTypeId": 1 if question else 2,
+            "CreationDate": f"{2014 + i % 10}-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00.000",
+            "Score": int(rng.integers(-3, 20)),
+            "Body": "<p>" + " ".join(rng.choice(vocabulary, rng.integers(5, 40), p=weights)) + "</p>",
+        }
+        if question:
+            tags = rng.choice(TAGS, rng.integers(1, 4), replace=False, p=tag_weights)
+            row["Title"] = " ".join(rng.choice(vocabulary, rng.integers(2, 6), p=weights))
+            row["Tags"] = "|" + "|".join(tags) + "|"
+            row["AnswerCount"] = int(rng.integers(0, 4))
+        rows.append(row)
+    return rows
+
+
+def write_posts(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<posts>\n')
+        for row in rows:
+            attributes = " ".join(f"{name}={quoteattr(str(value))}" for name, value in row.items())
+            f.write(f"  <row {attributes} />\n")
+        f.write("</posts>\n")
+
+
+@pytest.fixture(scope="session")
+def posts():
+    return post_rows()
+
+
+@pytest.fixture(scope="session")
+def posts_path(tmp_path_factory, posts):
+    path = str(tmp_path_factory.mktemp("dump") / "Posts.xml")
+    write_posts(path, posts)
+    return path
+
+
+@pytest.fixture(scope="session")
+def expected_postings(posts_path):
+    """Brute-force term -> {post Id: freq} of the synthetic dump, straight from the analyzer."""
+    fields = index_store.DEFAULT_FIELDS
+    table = dump_reader.read_table(posts_path, ["Id"] + list(fields))
+    postings = {}
+    for post_id, text in zip(table["Id"].tolist(), index_store.document_texts(table, fields)):
+        for term, freq in Counter(default_analyzer.analyze(text)).items():
+            postings.setdefault(term, {})[post_id] = freq
+    return postings
@@ -0,0 +1,72 @@
+import string
+
+import numpy as np
+import pytest
+
+import analyzer
+from analyzer import ENGLISH_STOP_WORDS, Analyzer
+
+TEXTS = [
+    "Can I download PlayStation 3 games for my PlayStation 4?",
+    "Don't you think Dark-Souls' bosses are HARD... (really)",
+    "Café ÉLAN naïve Straße über İstanbul",
+    "GTA5 gta-5 x86_64 e-mail 3d",
+    "",
+    "   \t\n  ",
+]
+
+
+def reference(text, stop_words=ENGLISH_STOP_WORDS):
+    """The analysis spelled out: lower-case, delete ASCII punctuation, keep alphabetic non-stopwords."""
+    text = text.lower().translate(str.maketrans("", "", string.punctuation))
+    return [t for t in text.split() if t.isalpha() and t not in stop_words]
+
+
+def test_matches_reference():
+    default = Analyzer()
+    assert default.analyze(TEXTS[0]) == ["download", "playstation", "games", "playstation"]
+    assert default.analyze(TEXTS[1]) == ["dont", "think", "darksouls", "bosses", "hard", "really"]
+    rng = np.random.default_rng(8)
+    words = " ".join(TEXTS).split() + ["the", "THE", "it's", "won't"]
+    texts = TEXTS + [" ".join(rng.choice(words, 12)) for _ in range(50)]
+    for text in texts:
+        assert default.analyze(text) == reference(text), text
+        assert Analyzer(stop_words=()).analyze(text) == reference(text, ()), text
+    assert default.analyze(None) == [] and default(TEXTS[0]) == default.analyze(TEXTS[0])
+
+
+def test_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(analyzer.TermMemo, "MAX_SIZE", 3)
+    memoized = Analyzer()
+    for text in TEXTS * 2:
+        assert memoized.analyze(text) == reference(text)
+        assert len(memoized.terms) <= 3
+
+
+def test_analyze_many_ids():
+    default = Analyzer()
+    vocabulary = {}
+    ids = list(default.analyze_many(TEXTS, vocabulary))
+    terms = {tid: term for term, tid in vocabulary.items()}
+    assert sorted(terms) == list(range(len(vocabulary)))
+    for text, text_ids in zip(TEXTS, ids):
+        assert text_ids.dtype == np.int32
+        assert [terms[tid] for tid in text_ids.tolist()] == default.analyze(text)
+    # Query-time analysis: unknown terms are dropped, the vocabulary does not grow
+    size = len(vocabulary)
+    query_ids, = default.analyze_many(["download unknownword games"], vocabulary, grow=False)
+    assert [terms[tid] for tid in query_ids.tolist()] == ["download", "games"]
+    assert len(vocabulary) == size
+
+
+def test_config_identifies_the_analysis():
+    assert Analyzer().config == Analyzer().config
+    assert Analyzer(stop_words=()).config != Analyzer().config
+    assert Analyzer().config["stem"] is False
+
+
+def test_stemming():
+    pytest.importorskip("nltk")
+    stemmed = Analyzer(stem=True)
+    assert stemmed.analyze("Downloading the games, downloaded") == ["download", "game", "download"]
+    assert stemmed.config != Analyzer().config
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import index_store
+import segments
+from batch_scoring import BatchScorer
+from bm25 import BM25
+from daat import tf_top_k
+
+QUERIES = ["elden ring", "dark souls boss boss", "witcher crash download", "rare3 rare7 steam",
+           "unknownword", "", "mods save weapon horse upgrade online quest ending"]
+
+
+def check_against_per_query(index, k=7):
+    queries = [index.analyzer.analyze(query) for query in QUERIES]
+    bm25 = BM25(index)
+    for (post_ids, scores), terms in zip(BatchScorer(index).top_k(queries, k, batch=3), queries):
+        expected_ids, expected_scores = bm25.top_k(terms, k, prune=False)
+        # Scores agree up to float summation order, so near-ties may pick different docs
+        docids, all_scores = bm25.scores(terms)
+        exhaustive = dict(zip(index.doc_ids[docids].tolist(), all_scores.tolist()))
+        assert len(post_ids) == len(expected_ids)
+        assert np.allclose(scores, expected_scores)
+        assert np.allclose([exhaustive[post_id] for post_id in post_ids.tolist()], scores)
+    for (post_ids, scores), terms in zip(BatchScorer(index, model="tf").top_k(queries, k, batch=3), queries):
+        expected_ids, expected_scores = tf_top_k(index, terms, k)
+        assert np.array_equal(post_ids, expected_ids) and np.array_equal(scores, expected_scores)
+
+
+def test_batch_matches_per_query(posts_path, tmp_path):
+    index_dir = str(tmp_path / "index")
+    index_store.build_index(posts_path, index_dir)
+    check_against_per_query(index_store.load_index(index_dir))
+
+
+def test_batch_matches_per_query_on_segments(posts_path, tmp_path):
+    segments_dir = str(tmp_path / "segments")
+    segments.create_segments(posts_path, segments_dir)
+    index = segments.open_segments(posts_path, segments_dir)
+    index.add_documents([1, 7001], ["elden ring boss edited", "dark souls witcher crash"], merge=False)
+    index.delete([3, 5, 9])
+    check_against_per_query(index)
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        BatchScorer(None, model="bm26")
@@ -0,0 +1,74 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import index_store
+from bm25 import B, BM25, K1
+
+QUERIES = ["elden", "elden ring", "dark souls boss boss", "witcher crash download ending",
+           "mods save weapon horse upgrade online quest ending", "unknownword steam", ""]
+
+
+@pytest.fixture(scope="module")
+def index(posts_path, tmp_path_factory):
+    index_dir = str(tmp_path_factory.mktemp("indexes") / "bm25")
+    index_store.build_index(posts_path, index_dir)
+    return index_store.load_index(index_dir)
+
+
+@pytest.fixture(scope="module")
+def brute_force(posts, expected_postings):
+    """terms -> {post Id: BM25 score}, straight from the formula over the brute-force postings."""
+    lengths = Counter(dict.fromkeys((row["Id"] for row in posts), 0))
+    for docs in expected_postings.values():
+        lengths.update(docs)
+    n, avg = len(lengths), np.mean(list(lengths.values()))
+
+    def scores(terms):
+        out = Counter()
+        for term, qtf in Counter(terms).items():
+            docs = expected_postings.get(term, {})
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for post_id, freq in docs.items():
+                norm = float(np.float32(K1 * (1 - B + B * lengths[post_id] / avg)))
+                out[post_id] += idf * qtf * freq * (K1 + 1) / (freq + norm)
+        return out
+    return scores
+
+
+def test_exhaustive_scores_match_formula(index, brute_force):
+    for query in QUERIES:
+        terms = index.analyzer.analyze(query)
+        docids, scores = BM25(index).scores(terms)
+        got = dict(zip(index.doc_ids[docids].tolist(), scores.tolist()))
+        want = brute_force(terms)
+        assert got.keys() == want.keys(), query
+        assert np.allclose([got[p] for p in want], list(want.values()), rtol=1e-9), query
+
+
+@pytest.mark.parametrize("params", [{}, {"k1": 0.9, "b": 0.4}])
+def test_maxscore_equals_exhaustive(index, params):
+    # The saved norms and bounds serve the default k1/b; other values compute their own
+    scorer = BM25(index, **params)
+    rng = np.random.default_rng(5)
+    allowed = rng.random(index.n_docs) < 0.3
+    for query in QUERIES:
+        terms = index.analyzer.analyze(query)
+        for k in (1, 3, 10, 1000):
+            for mask in (None, allowed):
+                pruned = scorer.top_k(terms, k, allowed=mask)
+                exhaustive = scorer.top_k(terms, k, prune=False, allowed=mask)
+                assert np.array_equal(pruned[0], exhaustive[0]), (query, k)
+                assert np.array_equal(pruned[1], exhaustive[1]), (query, k)
+                if mask is not None:
+                    assert allowed[np.searchsorted(index.doc_ids, pruned[0])].all()
+        assert len(scorer.top_k(terms, 0)[0]) == 0
+
+
+def test_top_k_order(index, brute_force):
+    terms = index.analyzer.analyze("dark souls boss")
+    post_ids, scores = BM25(index).top_k(terms, 20)
+    want = sorted(brute_force(terms).values(), reverse=True)[:20]
+    assert np.allclose(scores, want, rtol=1e-9)
+    assert np.all(np.diff(scores) <= 0)
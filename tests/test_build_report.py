@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+import index_store
+
+
+@pytest.mark.skipif(not index_store.reset_peak_rss(), reason="RSS high-water mark cannot be reset here")
+def test_stage_peak_sees_freed_temporaries():
+    report = index_store.BuildReport()
+    with report.stage("spike"):
+        base = index_store.peak_rss_mb()
+        temporary = np.ones(64 << 17)  # 64 MB, touched, then freed inside the stage
+        del temporary
+    with report.stage("quiet"):
+        np.ones(1 << 10).sum()
+    stages = report.as_dict()
+    assert stages["spike"]["peak_rss_mb"] >= base + 60
+    # The quiet stage does not inherit the spike's high-water mark
+    assert stages["quiet"]["peak_rss_mb"] < stages["spike"]["peak_rss_mb"] - 60
+
+
+def test_nested_stage_peaks_reach_the_enclosing_stage():
+    report = index_store.BuildReport()
+    with report.stage("outer"):
+        with report.stage("inner"):
+            temporary = np.ones(32 << 17)
+            del temporary
+    stages = report.as_dict()
+    assert stages["outer"]["peak_rss_mb"] >= stages["inner"]["peak_rss_mb"]
+    assert stages["outer"]["seconds"] >= stages["inner"]["seconds"]
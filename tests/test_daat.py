@@ -0,0 +1,72 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import index_store
+from bm25 import BM25, BOUND_SLACK, tf_part
+from daat import daat_top_k, tf_top_k
+
+QUERIES = ["elden", "elden ring", "dark souls boss boss", "witcher crash download ending",
+           "mods save weapon horse upgrade online quest ending", "unknownword steam", ""]
+
+
+@pytest.fixture(scope="module")
+def index(posts_path, tmp_path_factory):
+    index_dir = str(tmp_path_factory.mktemp("indexes") / "daat")
+    index_store.build_index(posts_path, index_dir)
+    return index_store.load_index(index_dir)
+
+
+def brute_force_tf(expected_postings, terms, k, allowed_ids=None):
+    scores = Counter()
+    for term in terms:
+        for post_id, freq in expected_postings.get(term, {}).items():
+            if allowed_ids is None or post_id in allowed_ids:
+                scores[post_id] += freq
+    # Post Ids grow with the docIDs, so this is the docID tie-break too
+    best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+    return [post_id for post_id, _ in best], [score for _, score in best]
+
+
+def test_tf_top_k_matches_brute_force(index, expected_postings):
+    allowed = np.random.default_rng(6).random(index.n_docs) < 0.4
+    allowed_ids = set(index.doc_ids[allowed].tolist())
+    for query in QUERIES:
+        terms = index.analyzer.analyze(query)
+        for k in (1, 5, 1000):
+            post_ids, scores = tf_top_k(index, terms, k)
+            assert (post_ids.tolist(), scores.tolist()) == brute_force_tf(expected_postings, terms, k), query
+            post_ids, scores = tf_top_k(index, terms, k, allowed=allowed)
+            assert (post_ids.tolist(), scores.tolist()) == brute_force_tf(expected_postings, terms, k, allowed_ids)
+        assert len(tf_top_k(index, terms, 0)[0]) == 0
+
+
+def test_bm25_daat_equals_exhaustive(index):
+    scorer = BM25(index)
+    allowed = np.random.default_rng(7).random(index.n_docs) < 0.4
+    for query in QUERIES:
+        terms = index.analyzer.analyze(query)
+        for k in (1, 5, 1000):
+            for mask in (None, allowed):
+                daat = scorer.daat_top_k(terms, k, allowed=mask)
+                exhaustive = scorer.top_k(terms, k, prune=False, allowed=mask)
+                assert np.array_equal(daat[0], exhaustive[0]) and np.array_equal(daat[1], exhaustive[1]), query
+
+
+@pytest.mark.parametrize("block", [5, 64])
+def test_small_blocks_and_pruning(index, block):
+    # Many windows per list, so the heap fills early and low-bound cursors switch to seeking
+    scorer = BM25(index)
+    for query in QUERIES:
+        terms = index.analyzer.analyze(query)
+        clauses = scorer.clauses(terms)
+        scorers = [lambda docids, freqs, weight=weight: weight * tf_part(freqs, scorer.norms[docids])
+                   for _, weight, _ in clauses]
+        bounds = [bound * (1 + BOUND_SLACK) for _, _, bound in clauses]
+        for k in (1, 3, 20):
+            cursors = [index.cursor(term) for term, _, _ in clauses]
+            docids, scores = daat_top_k(cursors, scorers, k, block=block, bounds=bounds)
+            expected_ids, expected_scores = scorer.top_k(terms, k, prune=False)
+            assert np.array_equal(index.post_ids(docids), expected_ids), (query, k)
+            assert np.array_equal(scores, expected_scores), (query, k)
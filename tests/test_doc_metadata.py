@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from doc_metadata import open_metadata
+
+# expression -> the same filter over a dump row
+FILTERS = {
+    "type:question": lambda r: r["PostTypeId"] == 1,
+    "type:answer": lambda r: r["PostTypeId"] == 2,
+    "type:2": lambda r: r["PostTypeId"] == 2,
+    "score>=5": lambda r: r["Score"] >= 5,
+    "score<0": lambda r: r["Score"] < 0,
+    "score:1..10": lambda r: 1 <= r["Score"] <= 10,
+    "score>3 score<=7": lambda r: 3 < r["Score"] <= 7,
+    "score:0": lambda r: r["Score"] == 0,
+    "answers>=3": lambda r: r.get("AnswerCount", 0) >= 3,
+    "answers:0": lambda r: r.get("AnswerCount", 0) == 0,
+    "created:2016..2018": lambda r: 2016 <= created(r).year <= 2018,
+    "created>=2020-06": lambda r: created(r) >= datetime(2020, 6, 1),
+    "created:2017-03-03": lambda r: created(r).date() == datetime(2017, 3, 3).date(),
+    "created<2015": lambda r: created(r).year < 2015,
+    "created:..2016-02": lambda r: created(r) < datetime(2016, 3, 1),
+    "unanswered": lambda r: r["PostTypeId"] == 1 and r["AnswerCount"] == 0,
+    "answered type:question score>=0": lambda r: r["PostTypeId"] == 1 and r["AnswerCount"] > 0 and r["Score"] >= 0,
+    "": lambda r: True,
+}
+
+
+def created(row):
+    return datetime.fromisoformat(row["CreationDate"])
+
+
+@pytest.fixture(scope="module")
+def metadata(posts_path):
+    return open_metadata(posts_path)
+
+
+def test_filters_match_rows(metadata, posts):
+    assert len(metadata) == len(posts)
+    for expression, keep in FILTERS.items():
+        expected = [i for i, row in enumerate(posts) if keep(row)]
+        assert metadata.docids(expression).tolist() == expected, expression
+        assert metadata.docids(expression.upper()).tolist() == expected, expression
+
+
+def test_aligned_follows_doc_ids(metadata, posts):
+    ids = np.array([row["Id"] for row in posts])
+    # Another index's docID order: reversed, with a post the dump does not have
+    doc_ids = np.r_[ids[::-1], 999999]
+    aligned = metadata.aligned(doc_ids)
+    rows = posts[::-1]
+    for expression, keep in FILTERS.items():
+        expected = [i for i, row in enumerate(rows) if keep(row)]
+        if not expression:
+            expected.append(len(rows))
+        assert aligned.docids(expression).tolist() == expected, expression
+    assert metadata.aligned(ids) is metadata
+
+
+def test_bad_filters(metadata):
+    for expression in ["bogus", "score>=x", "created:2020-13", "type:comment", "views>3"]:
+        with pytest.raises(ValueError):
+            metadata.mask(expression)
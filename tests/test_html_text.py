@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from html_text import html_to_text, html_to_text_many
+
+BODIES = {
+    "<p>Hello <em>brave</em> new <a href=\"x\">world</a></p>": "Hello brave new world",
+    "<p>one</p><p>two</p>\n\n<ul><li>three</li><li>four</li></ul>": "one\ntwo\nthree\nfour",
+    "<h2>Title</h2><blockquote><p>quoted</p></blockquote>line<br/>break<hr>end": "Title\nquoted\nline\nbreak\nend",
+    "<p>Tom &amp; Jerry &lt;3 &quot;cheese&quot; caf&eacute; &#233;t&#xE9;</p>": 'Tom & Jerry <3 "cheese" café été',
+    "<p>a<!-- hidden <b>comment</b> -->b</p>": "ab",
+    "<p>Use <code>x &lt; y</code> here</p><pre><code>for i in range(3):\n    print(i)\n</code></pre>":
+        "Use x < y here\nfor i in range(3):\n    print(i)",
+    "<table><tr><td>a</td><td>b</td></tr></table><img src=\"pic.png\" alt=\"pic\">": "a\nb",
+    "plain text, no tags": "plain text, no tags",
+    "": "",
+}
+
+
+def test_bodies_to_text():
+    for body, expected in BODIES.items():
+        assert html_to_text(body) == expected, body
+    assert html_to_text(None) == "" and html_to_text(np.nan) == ""
+
+
+def test_code_modes():
+    body = "<p>Run <code>make</code> first</p><pre class=\"lang\"><code>make all\n</code></pre><p>done</p>"
+    assert html_to_text(body) == "Run make first\nmake all\ndone"
+    assert html_to_text(body, code="drop_blocks") == "Run make first\ndone"
+    assert html_to_text(body, code="drop") == "Run   first\ndone"
+    with pytest.raises(ValueError):
+        html_to_text(body, code="strip")
+
+
+def test_many_matches_one_by_one():
+    bodies = list(BODIES) + [None, "<pre>unclosed", "<p>x</p>" * 3, float("nan"), "<code>a</code><pre>b</pre>"]
+    rng = np.random.default_rng(2)
+    bodies += ["".join(rng.choice(list(BODIES), 3)) for _ in range(20)]
+    for code in ("keep", "drop_blocks", "drop"):
+        assert html_to_text_many(bodies, code) == [html_to_text(b, code) for b in bodies]
+    assert html_to_text_many([]) == []
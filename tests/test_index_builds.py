@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import index_store
+
+def index_files(index_dir):
+    return sorted(name for name in os.listdir(index_dir) if name != index_store.META)
+
+
+@pytest.fixture(scope="module")
+def reference(posts_path, tmp_path_factory):
+    index_dir = str(tmp_path_factory.mktemp("indexes") / "memory")
+    index_store.build_index(posts_path, index_dir)
+    return index_dir
+
+
+def test_in_memory_build_matches_brute_force(reference, expected_postings):
+    index = index_store.load_index(reference)
+    expected = expected_postings
+    assert sorted(expected) == list(index.terms)
+    for term, docs in expected.items():
+        docids, freqs = index.postings(term)
+        assert dict(zip(index.doc_ids[docids].tolist(), freqs.tolist())) == docs
+
+
+@pytest.mark.parametrize("options", [{"memory_budget": 16 << 10}, {"workers": 2}], ids=["spimi", "sharded"])
+def test_merged_builds_are_byte_identical(posts_path, reference, tmp_path, options):
+    index_dir = str(tmp_path / "index")
+    meta = index_store.build_index(posts_path, index_dir, **options)
+    assert "merge" in meta["build"]
+    assert index_files(index_dir) == index_files(reference)
+    for name in index_files(reference):
+        with open(os.path.join(reference, name), "rb") as a, open(os.path.join(index_dir, name), "rb") as b:
+            assert a.read() == b.read(), name
+
+
+def test_spimi_build_with_positions(posts_path, tmp_path):
+    indexes = []
+    for name, options in (("memory", {}), ("spimi", {"memory_budget": 16 << 10})):
+        index_dir = str(tmp_path / name)
+        index_store.build_index(posts_path, index_dir, positions=True, **options)
+        indexes.append(index_store.load_index(index_dir))
+    memory, spilled = indexes
+    phrase = memory.phrase(["elden", "ring"])
+    assert len(phrase)
+    assert np.array_equal(spilled.phrase(["elden", "ring"]), phrase)
+
+
+def test_concurrent_spimi_builds(posts_path, reference, tmp_path):
+    index_dir = str(tmp_path / "index")
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(index_store.build_index, posts_path, index_dir, memory_budget=16 << 10)
+                   for _ in range(4)]
+        for future in futures:
+            future.result()
+    for name in index_files(reference):
+        with open(os.path.join(reference, name), "rb") as a, open(os.path.join(index_dir, name), "rb") as b:
+            assert a.read() == b.read(), name
+    assert os.listdir(tmp_path) == ["index"]
+
+
+def test_concurrent_sharded_builds(posts_path, reference, tmp_path):
+    index_dir = str(tmp_path / "index")
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(index_store.build_index, posts_path, index_dir, workers=2) for _ in range(3)]
+        for future in futures:
+            future.result()
+    for name in index_files(reference):
+        with open(os.path.join(reference, name), "rb") as a, open(os.path.join(index_dir, name), "rb") as b:
+            assert a.read() == b.read(), name
+    assert os.listdir(tmp_path) == ["index"]
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from postings import (SKIP_BLOCK, ArrayCursor, PostingsStore, build_skips, decode_flat, decode_postings,
+                      encode_flat, encode_postings, varint_decode, varint_encode)
+
+
+def random_lists(rng, n_terms=40, n_docs=5000):
+    """Sorted posting lists of random lengths (some longer than SKIP_BLOCK) -> (counts, docids, freqs)."""
+    lists = []
+    for _ in range(n_terms):
+        df = int(rng.choice([0, 1, 5, SKIP_BLOCK, SKIP_BLOCK + 1, 3 * SKIP_BLOCK + 17, 1000]))
+        docids = np.sort(rng.choice(n_docs, df, replace=False)).astype(np.int64)
+        lists.append((docids, rng.integers(1, 300, df)))
+    counts = np.array([len(d) for d, _ in lists], dtype=np.int64)
+    docids = np.concatenate([d for d, _ in lists])
+    freqs = np.concatenate([f for _, f in lists])
+    return counts, docids, freqs, lists
+
+
+# -----------------------
+# Varint codec
+# -----------------------
+def test_varint_round_trip_edges():
+    values = np.array([0, 1, 127, 128, 255, 16383, 16384, 2**21 - 1, 2**21, 2**28, 2**32 - 1])
+    assert np.array_equal(varint_decode(varint_encode(values)), values)
+    assert len(varint_encode(np.array([127]))) == 1
+    assert len(varint_encode(np.array([128]))) == 2
+    assert len(varint_encode(np.array([2**32 - 1]))) == 5
+
+
+def test_varint_round_trip_random():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 2**32, 10000) >> rng.integers(0, 32, 10000)
+    assert np.array_equal(varint_decode(varint_encode(values)), values)
+    assert len(varint_decode(varint_encode(np.zeros(0, dtype=np.int64)))) == 0
+
+
+def test_posting_list_round_trip():
+    docids = np.array([3, 4, 200, 201, 70000])
+    freqs = np.array([1, 2, 1, 300, 5])
+    got_docids, got_freqs = decode_postings(encode_postings(docids, freqs), len(docids))
+    assert np.array_equal(got_docids, docids) and np.array_equal(got_freqs, freqs)
+
+
+def test_encode_flat_matches_per_list_encoding():
+    rng = np.random.default_rng(1)
+    counts, docids, freqs, lists = random_lists(rng)
+    data, offsets = encode_flat(counts, docids, freqs)
+    for tid, (d, f) in enumerate(lists):
+        assert np.array_equal(data[offsets[tid]:offsets[tid + 1]], encode_postings(d, f))
+    got_docids, got_freqs = decode_flat(data, offsets, counts, 0, len(counts))
+    assert np.array_equal(got_docids, docids) and np.array_equal(got_freqs, freqs)
+    # Any term range decodes on its own
+    lo, hi = 7, 23
+    start, stop = counts[:lo].sum(), counts[:hi].sum()
+    got_docids, got_freqs = decode_flat(data, offsets, counts, lo, hi)
+    assert np.array_equal(got_docids, docids[start:stop]) and np.array_equal(got_freqs, freqs[start:stop])
+
+
+# -----------------------
+# Skip entries and cursors
+# -----------------------
+@pytest.fixture(scope="module")
+def store_and_lists():
+    rng = np.random.default_rng(2)
+    counts, docids, freqs, lists = random_lists(rng)
+    plain = PostingsStore.from_flat(counts, docids, freqs)
+    skipped = PostingsStore(plain.data, plain.offsets, plain.doc_freqs, build_skips(plain, batch_postings=500))
+    return skipped, lists
+
+
+def test_skip_entries(store_and_lists):
+    store, lists = store_and_lists
+    for tid, (docids, _) in enumerate(lists):
+        rows = store.skips[store.skip_base[tid]:store.skip_base[tid + 1]]
+        if len(docids) <= SKIP_BLOCK:
+            assert len(rows) == 0
+            continue
+        assert len(rows) == -(-len(docids) // SKIP_BLOCK)
+        last = docids[np.minimum(np.arange(1, len(rows) + 1) * SKIP_BLOCK, len(docids)) - 1]
+        assert np.array_equal(rows[:, 0], last)
+
+
+def test_cursor_next_block(store_and_lists):
+    store, lists = store_and_lists
+    for tid, (docids, freqs) in enumerate(lists):
+        cursor = store.cursor(tid)
+        blocks = []
+        while (block := cursor.next_block(50)) is not None:
+            blocks.append(block)
+        got_docids = np.concatenate([b[0] for b in blocks]) if blocks else np.zeros(0, dtype=np.int64)
+        got_freqs = np.concatenate([b[1] for b in blocks]) if blocks else np.zeros(0, dtype=np.int64)
+        assert np.array_equal(got_docids, docids) and np.array_equal(got_freqs, freqs)
+
+
+def brute_skip_to(docids, freqs, target):
+    i = int(np.searchsorted(docids, target))
+    return None if i == len(docids) else (int(docids[i]), int(freqs[i]))
+
+
+def test_cursor_skip_to_and_seek_match_brute_force(store_and_lists):
+    store, lists = store_and_lists
+    rng = np.random.default_rng(3)
+    for tid, (docids, freqs) in enumerate(lists):
+        targets = np.sort(rng.integers(0, 5200, 60))
+        for cursor in (store.cursor(tid), ArrayCursor(docids, freqs)):
+            for target in targets:
+                assert cursor.skip_to(int(target)) == brute_skip_to(docids, freqs, target)
+        # seek: members and non-members, few (skip blocks) and many (full decode)
+        for n in (3, 40, 400):
+            probe = np.unique(np.concatenate([rng.choice(docids, min(n, len(docids)), replace=False)
+                                              if len(docids) else np.zeros(0, dtype=np.int64),
+                                              rng.integers(0, 5200, n)]))
+            for cursor in (store.cursor(tid), ArrayCursor(docids, freqs)):
+                hit, hit_freqs = cursor.seek(probe)
+                expected = np.isin(probe, docids)
+                assert np.array_equal(hit, expected)
+                assert np.array_equal(hit_freqs, freqs[np.searchsorted(docids, probe[expected])])
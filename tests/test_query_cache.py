@@ -0,0 +1,58 @@
+import numpy as np
+
+import query_parser
+import segments
+from bm25 import BM25
+from daat import tf_top_k
+from doc_metadata import open_metadata
+from query_cache import QueryCache
+
+QUERIES = ["elden ring", "dark souls boss", "witcher crash download"]
+FILTERS = ["type:question", "type:question score>=5", "created:2016..2019"]
+
+
+def check_against_uncached(cache, index, metadata):
+    """Every cached query (twice: miss, then hit) equals the same query computed from scratch."""
+    aligned = metadata.aligned(index.doc_ids)
+    for query in QUERIES:
+        terms = index.analyzer.analyze(query)
+        for filters in FILTERS:
+            allowed = aligned.mask(filters)
+            expected = BM25(index).top_k(terms, 5, allowed=allowed)
+            expected_tf = tf_top_k(index, terms, 5, allowed=allowed)
+            expected_ids = query_parser.search(index, query, default_operator="OR",
+                                               within=np.flatnonzero(allowed))
+            for _ in range(2):
+                post_ids, scores = cache.top_k(query, 5, filters=filters)
+                assert np.array_equal(post_ids, expected[0]) and np.allclose(scores, expected[1])
+                post_ids, scores = cache.top_k(query, 5, filters=filters, model="tf")
+                assert np.array_equal(post_ids, expected_tf[0]) and np.array_equal(scores, expected_tf[1])
+                assert np.array_equal(cache.boolean(query, "OR", filters=filters), expected_ids)
+
+
+def test_filters_follow_segment_updates(posts_path, tmp_path, monkeypatch):
+    segments_dir = str(tmp_path / "segments")
+    segments.create_segments(posts_path, segments_dir)
+    index = segments.open_segments(posts_path, segments_dir)
+    metadata = open_metadata(posts_path)
+    cache = QueryCache(index, metadata)
+    check_against_uncached(cache, index, metadata)
+    assert cache.stats()["results"]["hits"] > 0
+
+    # New and edited posts: docIDs grow past the dump's, post 3 (a question) moves to the new segment
+    index.add_documents([3, 9001, 9003], ["elden ring elden ring boss", "elden ring dark souls", "witcher crash"],
+                        merge=False)
+    check_against_uncached(cache, index, metadata)
+    post_ids = cache.boolean("elden ring", filters="type:question").tolist()
+    assert 3 in post_ids
+    assert 9001 not in post_ids  # not in the dump: matches no filter
+    assert 9001 in cache.boolean("elden ring").tolist()
+
+    # A merge that purges tombstones renumbers every docID
+    index.delete(np.arange(1, 400, 2))
+    monkeypatch.setattr(segments, "MAX_SEGMENTS", 1)
+    monkeypatch.setattr(segments, "MERGE_FACTOR", 2)
+    index.maybe_merge()
+    assert len(index.segments) == 1
+    check_against_uncached(cache, index, metadata)
+    assert cache.stats()["results"]["invalidations"] >= 2
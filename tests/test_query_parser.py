@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import index_store
+from query_parser import And, Not, Or, Term, cost, evaluate, parse, search
+
+
+@pytest.fixture(scope="module")
+def index(posts_path, tmp_path_factory):
+    index_dir = str(tmp_path_factory.mktemp("indexes") / "query_parser")
+    index_store.build_index(posts_path, index_dir)
+    return index_store.load_index(index_dir)
+
+
+@pytest.fixture(scope="module")
+def docs(posts, expected_postings):
+    """Brute force: the post Ids containing a term, all posts for "*"."""
+    def matches(term):
+        if term == "*":
+            return {row["Id"] for row in posts}
+        return set(expected_postings.get(term, {}))
+    return matches
+
+
+def test_precedence_and_parentheses():
+    assert repr(parse("elden OR ring boss")) == repr(Or([Term("elden"), And([Term("ring"), Term("boss")])]))
+    assert repr(parse("(elden OR ring) boss")) == repr(And([Or([Term("elden"), Term("ring")]), Term("boss")]))
+    assert repr(parse("elden NOT boss")) == repr(And([Term("elden"), Not(Term("boss"))]))
+    assert repr(parse("NOT (elden OR boss)")) == repr(Not(Or([Term("elden"), Term("boss")])))
+    assert repr(parse("elden ring", default_operator="OR")) == repr(Or([Term("elden"), Term("ring")]))
+    # Words the analyzer drops drop out of the tree
+    assert repr(parse("the elden AND (of OR a)")) == repr(Term("elden"))
+    for bad in ["(elden ring", "elden ring)", "elden AND", "elden NEAR/2 (ring)"]:
+        with pytest.raises(ValueError):
+            parse(bad)
+
+
+def test_boolean_queries_match_brute_force(index, docs):
+    cases = {
+        "elden AND ring": docs("elden") & docs("ring"),
+        "elden OR sekiro NOT boss": docs("elden") | (docs("sekiro") - docs("boss")),
+        "(elden OR sekiro) NOT boss": (docs("elden") | docs("sekiro")) - docs("boss"),
+        "NOT boss": docs("*") - docs("boss"),
+        "NOT (dark OR souls) AND steam": docs("steam") - docs("dark") - docs("souls"),
+        "xbox NOT (steam OR NOT mods)": (docs("xbox") & docs("mods")) - docs("steam"),
+        "(quest OR ending) (witcher OR (crash NOT download))":
+            (docs("quest") | docs("ending")) & (docs("witcher") | (docs("crash") - docs("download"))),
+        "NOT NOT horse": docs("horse"),
+        "unknownword OR quest": docs("quest"),
+        "unknownword AND quest": set(),
+    }
+    for query, expected_ids in cases.items():
+        assert set(search(index, query).tolist()) == expected_ids, query
+    assert set(search(index, "upgrade horse", "OR").tolist()) == docs("upgrade") | docs("horse")
+
+
+def test_within_restricts_every_clause(index, docs):
+    within = np.arange(0, index.n_docs, 3)
+    allowed = set(index.doc_ids[within].tolist())
+    for query, expected_ids in {"elden NOT ring": docs("elden") - docs("ring"),
+                                "NOT boss": docs("*") - docs("boss"),
+                                "steam OR mods": docs("steam") | docs("mods")}.items():
+        assert set(search(index, query, within=within).tolist()) == expected_ids & allowed, query
+
+
+class RecordingIndex:
+    """Index proxy that records which terms get their postings looked up, in order."""
+
+    def __init__(self, index):
+        self.index = index
+        self.looked_up = []
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def docs(self, term):
+        self.looked_up.append(term)
+        return self.index.docs(term)
+
+    def docs_within(self, term, within):
+        self.looked_up.append(term)
+        return self.index.docs_within(term, within)
+
+
+def test_and_evaluates_cheapest_first(index):
+    assert cost(Term("elden"), index) == index.doc_freq("elden")
+    assert cost(Or([Term("elden"), Term("ending")]), index) == index.doc_freq("elden") + index.doc_freq("ending")
+    assert cost(And([Term("elden"), Term("ending")]), index) == min(index.doc_freq("elden"), index.doc_freq("ending"))
+    assert cost(Not(Term("elden")), index) == index.n_docs - index.doc_freq("elden")
+
+    recording = RecordingIndex(index)
+    node = parse("elden AND ring AND ending NOT boss")
+    evaluate(node, recording)
+    dfs = [index.doc_freq(term) for term in ["elden", "ring", "ending"]]
+    expected_order = [term for _, term in sorted(zip(dfs, ["elden", "ring", "ending"]))]
+    # Positive clauses by ascending doc frequency (unless the result empties first), negations last
+    assert recording.looked_up[:1] == expected_order[:1]
+    assert recording.looked_up == (expected_order + ["boss"])[:len(recording.looked_up)]
+
+    # An empty clause ends the AND: the other terms are never looked up
+    recording = RecordingIndex(index)
+    assert len(evaluate(parse("elden AND unknownword AND ring"), recording)) == 0
+    assert recording.looked_up == ["unknownword"]
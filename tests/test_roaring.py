@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from postings import PostingsStore
+from roaring import ARRAY, BITMAP, CHUNK, RUN, BitmapStore, RoaringBitmap, build_bitmaps
+
+
+def sample_docids(rng):
+    """Sorted docIDs spread over several chunks, one of each container kind."""
+    parts = [
+        np.sort(rng.choice(CHUNK, 300, replace=False)),                # sparse: array
+        CHUNK + np.sort(rng.choice(CHUNK, 20000, replace=False)),      # dense: bitmap
+        2 * CHUNK + np.r_[np.arange(100, 9000), np.arange(20000, 40000)],  # runs
+        5 * CHUNK + np.array([0, CHUNK - 1]),
+    ]
+    return np.concatenate(parts).astype(np.int64)
+
+
+@pytest.fixture(scope="module")
+def bitmaps():
+    rng = np.random.default_rng(0)
+    a, b = sample_docids(rng), sample_docids(rng)
+    return a, b, RoaringBitmap.from_sorted(a), RoaringBitmap.from_sorted(b)
+
+
+def test_containers_round_trip(bitmaps):
+    a, _, ra, _ = bitmaps
+    assert [kind for kind, _ in ra.containers] == [ARRAY, BITMAP, RUN, ARRAY]
+    assert np.array_equal(ra.to_array(), a)
+    assert len(ra) == len(a)
+    assert len(RoaringBitmap.from_sorted(np.zeros(0, dtype=np.int64))) == 0
+
+
+def test_set_operations_match_numpy(bitmaps):
+    a, b, ra, rb = bitmaps
+    assert np.array_equal((ra & rb).to_array(), np.intersect1d(a, b))
+    assert np.array_equal((ra | rb).to_array(), np.union1d(a, b))
+    assert np.array_equal((ra - rb).to_array(), np.setdiff1d(a, b))
+    c = np.arange(0, 6 * CHUNK, 7, dtype=np.int64)
+    union = RoaringBitmap.union(ra, rb, RoaringBitmap.from_sorted(c))
+    assert np.array_equal(union.to_array(), np.union1d(np.union1d(a, b), c))
+
+
+def test_contains(bitmaps):
+    a, _, ra, _ = bitmaps
+    probe = np.arange(0, 7 * CHUNK, 13, dtype=np.int64)
+    assert np.array_equal(ra.contains(probe), np.isin(probe, a))
+
+
+def test_serialization_round_trip(bitmaps):
+    a, b, ra, rb = bitmaps
+    for docids, bitmap in ((a, ra), (b, rb)):
+        buf = bitmap.to_bytes()
+        assert len(buf) % 8 == 0
+        back = RoaringBitmap.from_bytes(buf)
+        assert back.keys == bitmap.keys
+        assert [kind for kind, _ in back.containers] == [kind for kind, _ in bitmap.containers]
+        assert np.array_equal(back.to_array(), docids)
+
+
+def test_bitmap_store_matches_postings():
+    rng = np.random.default_rng(1)
+    lists = [np.sort(rng.choice(3 * CHUNK, n, replace=False)) for n in (5000, 10, 70000, 0)]
+    counts = np.array([len(d) for d in lists])
+    docids = np.concatenate(lists).astype(np.int64)
+    store = PostingsStore.from_flat(counts, docids, np.ones(len(docids), dtype=np.int64))
+    tids, offsets, data = build_bitmaps(store, 3 * CHUNK)
+    # Only terms in at least max(BITMAP_MIN_DF, n_docs / 16) docs get a saved bitmap
+    assert tids.tolist() == [2]
+    saved = BitmapStore(tids, offsets, data)
+    assert np.array_equal(saved.get(2).to_array(), lists[2])
+    assert saved.get(0) is None and saved.get(1) is None
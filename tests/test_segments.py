@@ -0,0 +1,94 @@
+from collections import Counter
+
+import numpy as np
+
+import segments
+from analyzer import default_analyzer
+from bm25 import BM25, B, K1
+
+
+def live_postings(index):
+    """term -> {post Id: freq} over the index's live documents."""
+    out = {}
+    for tids, docids, freqs in index.iter_postings():
+        for tid, post_id, freq in zip(tids.tolist(), index.doc_ids[docids].tolist(), freqs.tolist()):
+            out.setdefault(index.terms.term(tid), {})[post_id] = freq
+    return out
+
+
+def apply_updates(expected, added, deleted):
+    """Brute-force postings after replacing/adding `added` (post Id -> text) and deleting `deleted`."""
+    gone = set(deleted) | set(added)
+    result = {}
+    for term, docs in expected.items():
+        kept = {post_id: freq for post_id, freq in docs.items() if post_id not in gone}
+        if kept:
+            result[term] = kept
+    for post_id, text in added.items():
+        if post_id in deleted:
+            continue
+        for term, freq in Counter(default_analyzer.analyze(text)).items():
+            result.setdefault(term, {})[post_id] = freq
+    return result
+
+
+def brute_force_bm25(expected, live_ids, terms):
+    """post Id -> BM25 score over the live posts, as a fresh build of them would score them."""
+    lengths = Counter(dict.fromkeys(live_ids, 0))
+    for docs in expected.values():
+        lengths.update(docs)
+    n, avg = len(lengths), np.mean(list(lengths.values()))
+    scores = Counter()
+    for term in terms:
+        docs = expected.get(term, {})
+        idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+        for post_id, freq in docs.items():
+            norm = np.float32(K1 * (1 - B + B * lengths[post_id] / avg))
+            scores[post_id] += idf * freq * (K1 + 1) / (freq + float(norm))
+    return scores
+
+
+def assert_live_statistics(index, expected, live_ids):
+    """doc_freq and BM25 scores count live docs only, as in a fresh build of them."""
+    for term in ["dark", "souls", "elden", "newword", "playstation"]:
+        assert index.doc_freq(term) == len(expected.get(term, {}))
+    terms = ["dark", "souls", "boss", "newword"]
+    docids, scores = BM25(index).scores(terms)
+    got = dict(zip(index.doc_ids[docids].tolist(), scores.tolist()))
+    want = brute_force_bm25(expected, live_ids, terms)
+    assert got.keys() == want.keys()
+    assert np.allclose([got[p] for p in want], list(want.values()), rtol=1e-9)
+
+
+def test_tombstones_and_merges(posts, posts_path, expected_postings, tmp_path, monkeypatch):
+    segments_dir = str(tmp_path / "segments")
+    segments.create_segments(posts_path, segments_dir)
+    index = segments.open_segments(posts_path, segments_dir)
+    expected = expected_postings
+    assert live_postings(index) == expected
+
+    added = {1: "elden ring edited post", 5000: "brand new quest newword", 5002: "dark souls boss"}
+    deleted = [3, 7, 5002, 999999]
+    index.add_documents(list(added), list(added.values()), merge=False)
+    assert index.delete(deleted) == 3
+    expected = apply_updates(expected, added, deleted)
+    live_ids = ({row["Id"] for row in posts} | set(added)) - set(deleted)
+    assert len(index.segments) == 2
+    assert live_postings(index) == expected
+    # Query-level views agree: tombstoned docs never come back
+    docids, _ = index.postings("dark")
+    assert 5002 not in index.doc_ids[docids].tolist() and 3 not in index.doc_ids[docids].tolist()
+    assert index.doc_freq("newword") == 1
+    assert_live_statistics(index, expected, live_ids)
+
+    # Merging drops the tombstoned docs for good and keeps every live posting
+    monkeypatch.setattr(segments, "MAX_SEGMENTS", 1)
+    monkeypatch.setattr(segments, "MERGE_FACTOR", 2)
+    index.maybe_merge()
+    assert len(index.segments) == 1
+    assert not index.segments[0].deleted.any()
+    assert index.n_docs == len(np.unique(index.doc_ids)) == 600 - 2 + 1
+    assert live_postings(index) == expected
+    assert_live_statistics(index, expected, live_ids)
+    reopened = segments.open_segments(posts_path, segments_dir)
+    assert live_postings(reopened) == expected
@@ -0,0 +1,44 @@
+from collections import Counter
+
+import numpy as np
+
+from analyzer import keyword_analyzer
+from inverted_index import IndexBuilder
+from roaring import ARRAY_MAX, CHUNK
+from tag_index import TagIndex, open_tag_index
+
+
+def brute_force_facets(tag_lists, docids, n):
+    counts = Counter(tag for d in docids for tag in tag_lists[d])
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+
+def test_facets_match_brute_force(posts, posts_path):
+    tags = open_tag_index(posts_path)
+    tag_lists = [keyword_analyzer.analyze(row.get("Tags")) for row in posts]
+    everything = range(len(posts))
+    assert tags.top(5) == brute_force_facets(tag_lists, everything, 5)
+    assert tags.facets(None, 100) == brute_force_facets(tag_lists, everything, 100)
+    rng = np.random.default_rng(3)
+    for size in (0, 1, 50, 400):
+        docids = np.sort(rng.choice(len(posts), size, replace=False))
+        assert tags.facets(docids, 4) == brute_force_facets(tag_lists, docids, 4)
+        assert tags.facets(tags.docids_for(tags.doc_ids[docids]), 4) == brute_force_facets(tag_lists, docids, 4)
+    expected = [d for d, row_tags in enumerate(tag_lists) if "dark-souls" in row_tags]
+    assert np.array_equal(tags.bitmap("Dark-Souls").to_array(), expected)
+
+
+def test_dense_chunks_match_brute_force():
+    # Enough posts that the common tags fill dense chunks (more than ARRAY_MAX docs in a 64K range)
+    rng = np.random.default_rng(4)
+    n_docs = CHUNK + 5000
+    vocabulary = np.array(["common", "half", "rare", "rarer"])
+    tag_lists = [list(vocabulary[rng.random(4) < [0.9, 0.5, 0.02, 0.001]]) for _ in range(n_docs)]
+    builder = IndexBuilder(keyword_analyzer)
+    texts = ["|".join(row_tags) for row_tags in tag_lists]
+    builder.add_batch(list(range(n_docs)), list(keyword_analyzer.analyze_many(texts, builder.vocabulary)))
+    tags = TagIndex(builder.build())
+    assert sum("half" in row_tags for row_tags in tag_lists) > 2 * ARRAY_MAX
+    for size in (10, 3000, n_docs // 2):
+        docids = np.sort(rng.choice(n_docs, size, replace=False))
+        assert tags.facets(docids, 4) == brute_force_facets(tag_lists, docids, 4)